@@ -0,0 +1,12 @@
+#!/bin/sh
+# Compare the benchmarks against the stored baseline, failing on regressions.
+# Run with --save after an intended change to store a new baseline.
+storage=tests/benchmarks/baselines
+if [ "$1" = "--save" ]; then
+    shift
+    exec py.test tests/benchmarks --benchmark-only \
+        --benchmark-storage="$storage" --benchmark-save=baseline "$@"
+fi
+exec py.test tests/benchmarks --benchmark-only \
+    --benchmark-storage="$storage" --benchmark-compare \
+    --benchmark-compare-fail=min:35% "$@"
@@ -37,5 +37,4 @@ def check_methods():
 
 
 def update_docs():
-    with open(docs_path, 'wb') as f:
-        f.write(uber.documentation().data)
+    uber.documentation().save_to(docs_path)
@@ -10,6 +10,9 @@ setup(
     long_description=open('README.rst').read(),
     packages=find_packages(exclude=['tests']),
     install_requires=open('requirements.txt').read().strip().split('\n'),
+    extras_require={
+        'aio': ['aiohttp>=3.3'],
+    },
     url='https://github.com/jasonkeene/python-ubersmith',
     license='MIT License',
     keywords=['ubersmith'],
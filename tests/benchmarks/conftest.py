@@ -0,0 +1,6 @@
+collect_ignore_glob = []
+try:
+    import pytest_benchmark  # noqa
+except ImportError:
+    # benchmarks need pytest-benchmark, see requirements-dev.txt
+    collect_ignore_glob.append('test_*.py')
@@ -0,0 +1,155 @@
+"""Realistic response data and arguments for the benchmarks."""
+import json
+
+CLIENTS = 5000
+
+
+def envelope(data):
+    """Return data wrapped in a successful response body."""
+    return json.dumps({
+        'status': True,
+        'error_code': None,
+        'error_message': '',
+        'data': data,
+    }).encode('utf-8')
+
+
+def client(i):
+    return {
+        'clientid': str(i),
+        'first': u'First {0}'.format(i),
+        'last': u'Last {0}'.format(i),
+        'company': u'Company {0} é'.format(i),
+        'email': 'client{0}@example.com'.format(i),
+        'address': '{0} Main St'.format(i),
+        'city': 'Springfield',
+        'state': 'IL',
+        'zip': '62701',
+        'country': 'US',
+        'phone': '555-{0:04d}'.format(i % 10000),
+        'active': '1',
+        'balance': '{0}.00'.format(i),
+        'created': '1324051200',
+        'latest_inv': '1393459200',
+        'login_failures': '0',
+        'discount': '0',
+        'tax_exempt': '0',
+        'listed_company': u'Company {0}'.format(i),
+        'datesend': '1',
+        'grace_due': '0',
+        'access': u'a:3:{s:4:"view";s:1:"1";s:4:"edit";s:1:"0";'
+                  u's:6:"delete";s:1:"0";}',
+    }
+
+
+def client_list_data(clients=CLIENTS):
+    return dict((str(i), client(i)) for i in range(1, clients + 1))
+
+
+def device(i):
+    return {
+        'dev': str(i),
+        'clientid': str(1000 + i % 500),
+        'label': 'server{0}.example.com'.format(i),
+        'dev_desc': 'server{0}.example.com'.format(i),
+        'type': 'Dedicated Server',
+        'type_id': '12',
+        'devtype_group': 'Servers',
+        'devtype_group_id': '2',
+        'parent': '0',
+        'location': 'dlfra.dflr.dflc.dflz.eqxtry:{0}'.format(i % 42),
+        'rack_id': str(i % 40),
+        'row_id': '1',
+        'cage_id': '1',
+        'zone_id': '1',
+        'fac_id': '1',
+        'owner': str(2000 + i),
+        'owner_type': 'PACKAGE',
+        'active': '1',
+        'disabled': '0',
+        'up': '4',
+        'warn': '0',
+        'down': '1',
+        'total': '5',
+        'height': '2',
+        'width': '19',
+        'depth': '30',
+    }
+
+
+def device_list_data(devices=1000):
+    return dict((str(i), device(i)) for i in range(1, devices + 1))
+
+
+def order_get_data(steps=50):
+    return {
+        'hash': '286fe-6a593',
+        'order_id': '1281',
+        'signature': '',
+        'progress': dict((str(i), {
+            'ts': str(1312304629 + i * 60),
+            'order_step_id': str(30 + i),
+            'admin': 'admin',
+            'notes': 'Step {0} done'.format(i),
+        }) for i in range(steps)),
+        'activity': '1312304629',
+        'total': '1,234.56',
+        'priority': '1',
+        'info': {
+            'coupon_ids': None,
+            'coupon_credits': None,
+            'taxes': None,
+        },
+        'order_status': '30',
+        'client_id': '1005',
+        'listed_company': '',
+        'order_form_id': '0',
+        'order_queue_id': '8',
+        'opportunity_id': '0',
+        'ts': '1312304629',
+        'owner': '',
+    }
+
+
+def order_create_info(packs=20):
+    """Nested order.create info with service packs, options and metadata."""
+    return {
+        'client_id': 1005,
+        'pack': dict((i, {
+            'plan_id': 100 + i,
+            'quantity': 1,
+            'desserv': u'Server {0} é'.format(i),
+            'options': [{
+                'option_id': 10 * i + j,
+                'value': 'opt{0}'.format(j),
+                'meta': {'sku': 'SKU-{0}-{1}'.format(i, j),
+                         'tags': ['a', 'b']},
+            } for j in range(5)],
+        }) for i in range(packs)),
+        'contact': {
+            'first': 'Johnny',
+            'last': 'Ubersmith',
+            'address': {'street': ['353 Broadway', 'Suite 1'],
+                        'city': 'Troy', 'zip': '12180'},
+        },
+    }
+
+
+def invoice(i):
+    return {
+        'comment': None,
+        'invid': str(i),
+        'amount_unpaid': '0.00',
+        'paid': '1',
+        'datepaid': str(1311800378 + i),
+        'amount': '{0}.00'.format(100 + i % 1000),
+        'date': str(1311799605 + i),
+        'reason': None,
+        'clientid': str(1000 + i % 500),
+        'due': str(1311912000 + i),
+        'after_tni': '1',
+    }
+
+
+def invoice_list_data(invoices=5000):
+    return dict((str(i), invoice(i)) for i in range(1, invoices + 1))
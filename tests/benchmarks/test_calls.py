@@ -0,0 +1,86 @@
+"""Overhead of calls around the request: dispatch, cleaning and access."""
+import pytest
+
+from ubersmith.api import BaseResponse, DictResponse, RequestHandler
+from ubersmith.calls import client, device
+
+from .payloads import (
+    client_list_data,
+    device_list_data,
+    envelope,
+    invoice_list_data,
+)
+
+
+try:
+    import tracemalloc
+except ImportError:  # pragma: no cover
+    tracemalloc = None
+
+
+def peak_memory(func):
+    """Return the bytes allocated at the peak of func()."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+# method -> (call class, payload builder, records)
+CLEANED = {
+    'client.list': (client.ListCall, client_list_data, 1000),
+    'client.invoice_list': (client.InvoiceList, invoice_list_data, 5000),
+    'device.list': (device.ListCall, device_list_data, 5000),
+}
+
+
+@pytest.mark.parametrize('copy_data', [False, True])
+@pytest.mark.parametrize('method', sorted(CLEANED))
+def test_base_call_clean(benchmark, method, copy_data, make_response):
+    """Cleaning a decoded response, with and without copying it first."""
+    call_class, build, records = CLEANED[method]
+    h = RequestHandler('', copy_data=copy_data)
+    decoded = h._process_response(
+        make_response(content=envelope(build(records))), h.json_decoder)
+    decoded.data  # decoded once up front, only cleaning is measured
+
+    def clean():
+        call = call_class({}, h)
+        call.response = decoded
+        call.clean()
+        return call.response
+    if tracemalloc is not None:
+        benchmark.extra_info['peak_memory'] = peak_memory(clean)
+    result = benchmark.pedantic(clean, rounds=5)
+    assert isinstance(result, DictResponse)
+    assert len(result) == records
+
+
+def test_dict_response_access(benchmark):
+    resp = BaseResponse(None)
+    resp = DictResponse.from_cleaned(resp, client_list_data(1000))
+
+    def access():
+        for key in resp:
+            resp[key]['email']
+            resp.get(key)
+            key in resp
+        return len(resp)
+    assert benchmark(access) == 1000
+
+
+def test_proxy_first_access(benchmark):
+    """Looking up a call function on a fresh handler."""
+    result = benchmark(lambda: RequestHandler('').client.get)
+    assert callable(result)
+
+
+def test_proxy_dispatch(benchmark, make_response):
+    """A whole call through the handler's proxy, minus the network."""
+    h = RequestHandler('')
+    response = make_response({'clientid': '1001', 'first': 'J'})
+    h._send_request = lambda method, data: response
+    result = benchmark(h.client.get, client_id=1001)
+    assert result['clientid'] == 1001
@@ -0,0 +1,44 @@
+"""Cleaning realistic response data with the calls' cleaners."""
+import pytest
+
+from ubersmith.calls import client, device, order
+
+from .payloads import client_list_data, device_list_data, order_get_data
+
+
+def bench_clean(benchmark, cleaner, data, rounds=10):
+    return benchmark.pedantic(cleaner, args=(data,), rounds=rounds)
+
+
+def test_client_list(benchmark):
+    result = bench_clean(benchmark, client.ListCall.cleaner,
+                         client_list_data(1000))
+    assert len(result) == 1000
+    assert result[1]['clientid'] == 1
+
+
+def test_device_list(benchmark):
+    result = bench_clean(benchmark, device.ListCall.cleaner,
+                         device_list_data(1000))
+    assert len(result) == 1000
+    assert result[1]['dev'] == 1
+
+
+def test_order_get(benchmark):
+    result = bench_clean(benchmark, order.GetCall.cleaner, order_get_data(),
+                         rounds=100)
+    assert result['order_id'] == 1281
+    assert len(result['progress']) == 50
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_client_list_sparse_read(benchmark, lazy):
+    """Cleaning 5000 clients and reading two fields of each."""
+    cleaner = client.ListCall.cleaner
+    data = client_list_data(5000)
+
+    def read():
+        cleaned = cleaner(data, lazy=lazy)
+        return [(c['email'], c['balance']) for c in cleaned.values()]
+    result = benchmark.pedantic(read, rounds=5)
+    assert len(result) == 5000
@@ -0,0 +1,55 @@
+"""Decoding a multi-megabyte client.list response.
+
+Run with: py.test tests/benchmarks --benchmark-only
+
+"""
+import pytest
+
+from ubersmith.api import RequestHandler
+
+from .payloads import CLIENTS, client_list_data, envelope
+
+
+def client_list_payload(clients=CLIENTS):
+    return envelope(client_list_data(clients))
+
+
+@pytest.fixture(scope='module')
+def payload():
+    return client_list_payload()
+
+
+def test_payload_is_multi_megabyte(payload):
+    assert len(payload) > 2 * 1024 * 1024
+
+
+def test_decode_per_access_baseline(benchmark, payload, make_response):
+    """What every client.list paid before the decoded body was memoized."""
+    response = make_response(content=payload)
+    # _process_response read the body 3 times then clean read it again
+    benchmark.pedantic(lambda: [response.json() for _ in range(4)],
+                       rounds=5)
+
+
+@pytest.mark.parametrize('decoder', [None, 'json', 'orjson', 'ujson'])
+def test_decode_once(benchmark, payload, decoder, make_response):
+    if decoder is not None:
+        pytest.importorskip(decoder)
+    h = RequestHandler('', json_decoder=decoder)
+    response = make_response(content=payload)
+
+    def process():
+        resp = h._process_response(response, h.json_decoder)
+        return resp.data
+    result = benchmark.pedantic(process, rounds=5)
+    assert len(result) == CLIENTS
+
+
+@pytest.mark.parametrize('decoder', [None, 'orjson'])
+def test_client_list(benchmark, payload, decoder, make_response):
+    if decoder is not None:
+        pytest.importorskip(decoder)
+    h = RequestHandler('', json_decoder=decoder)
+    h._send_request = lambda method, data: make_response(content=payload)
+    result = benchmark.pedantic(h.client.list, rounds=3)
+    assert len(result) == CLIENTS
@@ -0,0 +1,60 @@
+"""Throughput and resilience against a local FakeUbersmith."""
+import pytest
+
+from ubersmith.api import RequestHandler
+from ubersmith.batch import map_calls
+from ubersmith.retry import RetryPolicy
+from ubersmith.testing import FakeUbersmith
+
+
+@pytest.fixture(scope='module')
+def server():
+    with FakeUbersmith(clients=10000, seed=0) as server:
+        yield server
+
+
+@pytest.fixture
+def fake(server):
+    server.token_rate = server.error_rate = 0.0
+    server.latency = 0.0
+    return server
+
+
+def test_round_trip(benchmark, fake):
+    h = RequestHandler(fake.url)
+    result = benchmark(h.client.get, client_id=1001)
+    assert result['clientid'] == 1001
+
+
+def test_concurrent_round_trips(benchmark, fake):
+    h = RequestHandler(fake.url, pool_maxsize=8)
+    fake.latency = 0.005
+    kwargs = [{'client_id': i} for i in range(1, 65)]
+    results = benchmark.pedantic(
+        lambda: list(map_calls(h, 'client.get', kwargs, max_workers=8)),
+        rounds=5)
+    assert len(results) == 64
+    assert all(r.ok for r in results)
+
+
+def test_client_list(benchmark, fake):
+    h = RequestHandler(fake.url)
+    result = benchmark.pedantic(h.client.list, rounds=3)
+    assert len(result) == 10000
+
+
+def test_stream_client_list(benchmark, fake):
+    h = RequestHandler(fake.url)
+    count = benchmark.pedantic(
+        lambda: sum(1 for _ in h.stream_request('client.list')), rounds=3)
+    assert count == 10000
+
+
+def test_retried_faults(benchmark, fake):
+    """A tenth of the attempts fail with a token update or a 503."""
+    h = RequestHandler(fake.url, retry_policy=RetryPolicy(
+        max_attempts=10, backoff=0.001, jitter=0))
+    fake.token_rate = fake.error_rate = 0.05
+    fake.error_status = 503
+    result = benchmark(h.client.get, client_id=1001)
+    assert result['clientid'] == 1001
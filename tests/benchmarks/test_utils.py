@@ -0,0 +1,23 @@
+"""Encoding request arguments."""
+from ubersmith.utils import append_qs, to_nested_php_args, urlencode_unicode
+
+from .payloads import order_create_info
+
+
+def test_to_nested_php_args(benchmark):
+    info = order_create_info()
+    result = benchmark(to_nested_php_args, {'info': info})
+    assert result['info[pack][0][options][4][meta][tags][1]'] == 'b'
+
+
+def test_urlencode_unicode(benchmark):
+    args = to_nested_php_args({'info': order_create_info()})
+    result = benchmark(urlencode_unicode, args)
+    assert 'info%5Bclient_id%5D=1005' in result
+
+
+def test_append_qs(benchmark):
+    url = 'http://ubersmith.example.com/api/2.0/?method=order.create'
+    query = {'client_id': 1005, 'order_queue_id': 8, 'comment': u'é'}
+    result = benchmark(append_qs, url, query)
+    assert result.startswith(url + '&')
@@ -0,0 +1,73 @@
+import json
+import sys
+
+from mock import Mock
+import pytest
+import requests
+from six import text_type
+
+from ubersmith.api import RequestHandler
+
+
+collect_ignore = []
+if sys.version_info < (3, 7):
+    # asyncio support uses async generators and asyncio.get_running_loop
+    collect_ignore.append('test_aio.py')
+
+
+def pytest_configure(config):
+    # benchmarks are slow, plain runs skip them unless asked for with
+    # --benchmark-only as bin/benchmark.sh does
+    if (config.pluginmanager.hasplugin('benchmark') and
+            not config.getoption('benchmark_only')):
+        config.option.benchmark_skip = True
+
+
+def _make_response(data='ok', status=True, error_code=None, error_message='',
+                   status_code=200, content_type='application/json',
+                   content=None):
+    """Return a requests response with an ubersmith JSON body.
+
+        data, status, error_code, error_message: members of the body
+        status_code: HTTP status of the response
+        content_type: content-type header of the response
+        content: bytes or text sent instead of the JSON body
+
+    """
+    if content is None:
+        content = json.dumps({
+            'status': status,
+            'error_code': error_code,
+            'error_message': error_message,
+            'data': data,
+        })
+    if isinstance(content, text_type):
+        content = content.encode('utf-8')
+    response = requests.models.Response()
+    response.status_code = status_code
+    response.headers['content-type'] = content_type
+    response.encoding = 'utf-8'
+    response._content = content
+    response._content_consumed = True
+    return response
+
+
+def _make_handler(*responses, **kwargs):
+    """Return a RequestHandler whose session posts return responses.
+
+    Exceptions among the responses are raised by the post instead.
+
+    """
+    session = Mock()
+    session.post.side_effect = list(responses)
+    return RequestHandler('', session=session, **kwargs)
+
+
+@pytest.fixture
+def make_response():
+    return _make_response
+
+
+@pytest.fixture
+def make_handler():
+    return _make_handler
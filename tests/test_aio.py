@@ -0,0 +1,414 @@
+import asyncio
+import hashlib
+
+from mock import Mock, patch
+import pytest
+
+from ubersmith.aio import (
+    AsyncBatch,
+    AsyncCall,
+    AsyncRateLimiter,
+    AsyncRequestHandler,
+)
+from ubersmith.api import DictResponse, FileResponse
+from ubersmith.cache import ResponseCache
+from ubersmith.pool import PoolStats
+from ubersmith.ratelimit import RateLimiter
+from ubersmith.testing import FakeUbersmith
+from ubersmith.tracing import InMemoryTracer
+from ubersmith.exceptions import (
+    MaintenanceResponse,
+    UpdatingTokenResponse,
+    ValidationError,
+)
+from ubersmith.multipart import FileField
+
+from . import test_multipart
+
+# the upload test server
+base_url = test_multipart.base_url
+
+# the handler sends requests with aiohttp, see the aio extra
+pytest.importorskip('aiohttp')
+
+
+def returning(*responses):
+    responses = list(responses)
+
+    async def send_request(method, data):
+        return responses.pop(0)
+    return send_request
+
+
+class DescribeAsyncRequestHandler:
+    @pytest.fixture
+    def response(self, make_response):
+        return make_response({'clientid': '1', 'active': '1'})
+
+    @pytest.fixture
+    def token_response(self, make_response):
+        return make_response(content_type='text/html; charset=UTF-8',
+                             content='<title>Updating Token...</title>')
+
+    def it_awaits_call_functions(self, response):
+        h = AsyncRequestHandler('')
+        h._send_request = returning(response)
+        result = asyncio.run(h.client.get(client_id=1))
+        assert isinstance(result, DictResponse)
+        assert result['clientid'] == 1
+        assert result['active'] is True
+
+    def it_binds_async_calls_on_proxies(self):
+        h = AsyncRequestHandler('')
+        assert isinstance(h.client.get, AsyncCall)
+        assert h.client.get.request_handler is h
+
+    def it_does_not_proxy_calls_that_are_not_call_functions(self):
+        import ubersmith.uber
+        h = AsyncRequestHandler('')
+        ubersmith.uber.rando_callable = lambda: None
+        try:
+            with pytest.raises(AttributeError):
+                h.uber.rando_callable
+        finally:
+            del ubersmith.uber.rando_callable
+
+    def it_validates_required_fields(self):
+        h = AsyncRequestHandler('')
+        h._send_request = Mock()
+        with pytest.raises(ValidationError):
+            asyncio.run(h.client.get())
+        assert not h._send_request.called
+
+    def it_handles_updating_token(self, response, token_response):
+        h = AsyncRequestHandler('')
+        h._send_request = returning(token_response, token_response, response)
+
+        async def sleep(seconds):
+            pass
+        with patch('ubersmith.aio.asyncio.sleep', sleep):
+            result = asyncio.run(h.process_request('client.get'))
+        assert result.data == response.json()['data']
+
+    def it_reports_metrics(self, response, token_response):
+        from ubersmith.metrics import MetricsCollector
+        h = AsyncRequestHandler('', metrics=MetricsCollector())
+        h._send_request = returning(token_response, response)
+
+        async def sleep(seconds):
+            pass
+        with patch('ubersmith.aio.asyncio.sleep', sleep):
+            asyncio.run(h.process_request('client.get'))
+        assert h.metrics.requests == {('client.get', 'ok'): 1}
+        assert h.metrics.retries == {
+            ('client.get', 'UpdatingTokenResponse'): 1}
+
+    def it_raises_updating_token_after_3_tries(self, token_response):
+        h = AsyncRequestHandler('')
+        h._send_request = returning(*[token_response] * 3)
+
+        async def sleep(seconds):
+            pass
+        with patch('ubersmith.aio.asyncio.sleep', sleep):
+            with pytest.raises(UpdatingTokenResponse):
+                asyncio.run(h.process_request('client.get'))
+
+    def it_raises_maintenance_response(self, make_response):
+        h = AsyncRequestHandler('')
+        h._send_request = returning(make_response(
+            '', status=False, error_code=1,
+            error_message='We are currently undergoing maintenance, '
+                          'please check back shortly.'))
+        with pytest.raises(MaintenanceResponse):
+            asyncio.run(h.uber.method_list())
+
+    def it_returns_file_responses(self, make_response):
+        h = AsyncRequestHandler('')
+        h._send_request = returning(make_response(
+            content_type='application/pdf', content=b'bytes here'))
+        result = asyncio.run(h.uber.documentation())
+        assert isinstance(result, FileResponse)
+        assert result.data == b'bytes here'
+
+    def it_traces_concurrent_calls(self, response):
+        tracer = InMemoryTracer()
+        h = AsyncRequestHandler('', tracer=tracer)
+
+        async def post(url, kwargs, stream=False):
+            await asyncio.sleep(0)
+            return response
+        h._post = post
+
+        async def main():
+            await asyncio.gather(h.client.get(client_id=1),
+                                 h.client.get(client_id=2))
+        asyncio.run(main())
+        calls = tracer.find('ubersmith.call')
+        assert len(calls) == 2
+        for call in calls:
+            request, = [s for s in tracer.children(call)
+                        if s.name == 'ubersmith.request']
+            assert [s.name for s in tracer.children(request)] == [
+                'ubersmith.encode', 'ubersmith.send', 'ubersmith.decode']
+
+
+class DescribeAsyncUploads:
+    content = b'0123456789' * 100000
+
+    def it_streams_files_with_a_length(self, base_url, tmpdir):
+        path = tmpdir.join('big.bin')
+        path.write_binary(self.content)
+        callback = Mock()
+
+        async def upload():
+            async with AsyncRequestHandler(
+                    base_url, upload_callback=callback) as h:
+                return await h.process_request('uber.file_add', {
+                    'name': 'big',
+                    'file': FileField(str(path)),
+                })
+        resp = asyncio.run(upload())
+        assert resp.data == {
+            'name': hashlib.sha256(b'big').hexdigest(),
+            'file': hashlib.sha256(self.content).hexdigest(),
+            'chunked': False,
+        }
+        sent, total = callback.call_args[0]
+        assert sent == total > len(self.content)
+        assert callback.call_count > 1
+
+    def it_streams_generators_chunked(self, base_url):
+        chunks = (self.content[i:i + 4096]
+                  for i in range(0, len(self.content), 4096))
+
+        async def upload():
+            async with AsyncRequestHandler(base_url) as h:
+                return await h.process_request('client.avatar_set', {
+                    'client_id': 1,
+                    'avatar': chunks,
+                })
+        resp = asyncio.run(upload())
+        assert resp.data['avatar'] == hashlib.sha256(self.content).hexdigest()
+        assert resp.data['chunked'] is True
+
+
+class DescribeAsyncPooling:
+    def it_warms_up_connections(self):
+        async def main(url):
+            async with AsyncRequestHandler(url, pool_maxsize=4) as h:
+                assert await h.warm_up(10) == 4
+                assert h.pool_stats() == PoolStats(
+                    pools=1, connections=4, in_use=0, idle=4, requests=0,
+                    waits=0)
+                await asyncio.gather(h.client.get(client_id=1),
+                                     h.client.get(client_id=2))
+                return h.pool_stats()
+        with FakeUbersmith(clients=2) as server:
+            stats = asyncio.run(main(server.url))
+        assert stats.connections == 4
+        assert stats.requests == 2
+
+    def it_stops_warming_up_on_connection_errors(self):
+        async def main():
+            async with AsyncRequestHandler('http://127.0.0.1:1/') as h:
+                assert await h.warm_up(2) == 0
+                return h.pool_stats()
+        assert asyncio.run(main()).connections == 0
+
+    def it_has_no_stats_for_provided_sessions(self):
+        h = AsyncRequestHandler('http://ubersmith/', session=Mock())
+        with pytest.raises(TypeError):
+            h.pool_stats()
+
+
+class DescribeAsyncStreaming:
+    def collect(self, url, **kwargs):
+        async def main():
+            async with AsyncRequestHandler(url, **kwargs) as h:
+                items = h.client.list.iter()
+                return [item async for item in items], h.pool_stats()
+        return asyncio.run(main())
+
+    def it_streams_cleaned_items(self):
+        with FakeUbersmith(clients=300) as server:
+            items, stats = self.collect(server.url)
+        assert [k for k, v in items] == list(range(1, 301))
+        assert items[0][1]['clientid'] == 1
+        assert items[0][1]['active'] is True
+        assert stats.in_use == 0
+
+    def it_retries_before_streaming(self):
+        with FakeUbersmith(clients=3) as server:
+            server.inject('token')
+
+            async def sleep(seconds):
+                pass
+            with patch('ubersmith.aio.asyncio.sleep', sleep):
+                items, stats = self.collect(server.url)
+        assert len(items) == 3
+        assert server.calls['client.list'] == 2
+
+    def it_raises_errors_before_streaming(self):
+        with FakeUbersmith() as server:
+            server.inject('maintenance')
+            with pytest.raises(MaintenanceResponse):
+                self.collect(server.url)
+
+    def it_validates_before_requesting(self):
+        h = AsyncRequestHandler('')
+
+        async def main():
+            return [item async for item in h.client.get.iter()]
+        with pytest.raises(ValidationError):
+            asyncio.run(main())
+
+
+class DescribeAsyncMap:
+    @pytest.fixture
+    def handler(self, make_response):
+        h = AsyncRequestHandler('')
+        h.in_flight = h.peak = 0
+
+        async def send_request(method, data):
+            if data['client_id'] == 3:
+                response = make_response('', status=False, error_code=1,
+                                         error_message='Invalid client_id.')
+            else:
+                response = make_response({'clientid': data['client_id']})
+            h.in_flight += 1
+            h.peak = max(h.peak, h.in_flight)
+            # later calls finish first
+            await asyncio.sleep(0.05 / int(data['client_id']))
+            h.in_flight -= 1
+            return response
+        h._send_request = send_request
+        return h
+
+    def collect(self, results):
+        async def main():
+            return [result async for result in results]
+        return asyncio.run(main())
+
+    def it_maps_calls_with_bounded_concurrency(self, handler):
+        kwargs = [{'client_id': i} for i in range(1, 11)]
+        results = self.collect(handler.map('client.get', kwargs,
+                                           max_workers=3))
+        assert [r.index for r in results] == list(range(10))
+        assert handler.peak == 3
+        assert results[0].result == {'clientid': 1}
+        assert results[0].method == 'client.get'
+        assert not results[2].ok
+        assert results[2].error.error_message == 'Invalid client_id.'
+
+    def it_yields_results_as_they_complete(self, handler):
+        import ubersmith.client
+        kwargs = [{'client_id': i} for i in range(1, 5)]
+        results = self.collect(handler.map(ubersmith.client.get, kwargs,
+                                           ordered=False))
+        assert [r.index for r in results] == [3, 2, 1, 0]
+
+    def it_runs_batches(self, handler):
+        batch = handler.batch(max_workers=2)
+        assert isinstance(batch, AsyncBatch)
+        assert batch.add('client.get', client_id=1) == 0
+        batch.add('client.get', client_id=3)
+        results = asyncio.run(batch.results())
+        assert results[0].result == {'clientid': 1}
+        assert results[1].error is not None
+
+
+class DescribeAsyncRateLimiter:
+    def it_waits_without_blocking_the_loop(self):
+        limiter = AsyncRateLimiter(rate=1, burst=1)
+        sleeps = []
+
+        async def sleep(seconds):
+            sleeps.append(seconds)
+
+        async def acquire():
+            await limiter.acquire('client.get')
+            await limiter.acquire('client.get')
+        with patch('ubersmith.aio.asyncio.sleep', sleep):
+            asyncio.run(acquire())
+        assert len(sleeps) == 1
+        assert 0.9 < sleeps[0] <= 1
+
+    def it_throttles_handler_requests(self, make_response):
+        h = AsyncRequestHandler('', rate_limiter=RateLimiter(rate=1, burst=1))
+        h._send_request = returning(*[make_response(1)] * 2)
+        sleeps = []
+
+        async def sleep(seconds):
+            sleeps.append(seconds)
+
+        async def requests():
+            await h.process_request('uber.method_list')
+            await h.process_request('uber.method_list')
+        with patch('ubersmith.aio.asyncio.sleep', sleep):
+            asyncio.run(requests())
+        assert len(sleeps) == 1
+
+
+class DescribeAsyncCoalescing:
+    def it_coalesces_identical_reads(self, make_response):
+        h = AsyncRequestHandler('', coalesce=True)
+        calls, responses = [], []
+
+        async def send_request(method, data):
+            calls.append(method)
+            await asyncio.sleep(0)
+            response = make_response({'clientid': '1'})
+            response.json = Mock(wraps=response.json)
+            responses.append(response)
+            return responses[-1]
+        h._send_request = send_request
+
+        async def gather():
+            return await asyncio.gather(
+                h.client.get(client_id=1),
+                h.client.get(client_id=1),
+                h.client.update(client_id=1),
+            )
+        results = asyncio.run(gather())
+        assert calls == ['client.get', 'client.update']
+        assert results[0] == results[1] == {'clientid': 1}
+        assert results[0] is not results[1]
+        assert h.single_flight.stats() == (1, 1, 0)
+        # only the follower decodes the shared response again
+        assert responses[0].json.call_count == 2
+
+    def it_shares_exceptions(self):
+        h = AsyncRequestHandler('', coalesce=True)
+
+        async def send_request(method, data):
+            await asyncio.sleep(0)
+            raise KeyError('boom')
+        h._send_request = send_request
+
+        async def gather():
+            return await asyncio.gather(
+                h.client.get(client_id=1),
+                h.client.get(client_id=1),
+                return_exceptions=True,
+            )
+        results = asyncio.run(gather())
+        assert all(isinstance(r, KeyError) for r in results)
+
+
+class DescribeAsyncCaching:
+    def it_answers_reads_from_the_cache(self, make_response):
+        h = AsyncRequestHandler('', cache=ResponseCache(default_ttl=60))
+        calls = []
+
+        async def send_request(method, data):
+            calls.append(method)
+            return make_response({'clientid': '1'})
+        h._send_request = send_request
+
+        async def requests():
+            await h.client.get(client_id=1)
+            await h.client.get(client_id=1)
+            await h.client.update(client_id=1)
+            return await h.client.get(client_id=1)
+        assert asyncio.run(requests()) == {'clientid': 1}
+        assert calls == ['client.get', 'client.update', 'client.get']
@@ -0,0 +1,94 @@
+import threading
+import time
+
+from mock import Mock
+import pytest
+
+from ubersmith import client
+from ubersmith.api import RequestHandler
+from ubersmith.batch import Batch, BatchResult
+from ubersmith.exceptions import ResponseError, ValidationError
+
+
+@pytest.fixture
+def handler(make_response):
+    h = RequestHandler('')
+
+    def send_request(method, data):
+        client_id = int(data['client_id'])
+        # make later calls finish first
+        time.sleep((10 - client_id) * 0.002)
+        if client_id == 3:
+            return make_response('', status=False, error_code=2,
+                                 error_message='Invalid client_id')
+        return make_response({'clientid': str(client_id)})
+    h._send_request = send_request
+    return h
+
+
+class DescribeMap:
+    def it_yields_results_in_input_order(self, handler):
+        results = list(handler.map('client.get',
+                                   ({'client_id': i} for i in range(10)),
+                                   max_workers=4))
+        assert [r.index for r in results] == list(range(10))
+        assert [r.result['clientid'] for r in results if r.ok] == \
+            [0, 1, 2, 4, 5, 6, 7, 8, 9]
+
+    def it_yields_results_as_completed(self, handler):
+        results = list(handler.map('client.get',
+                                   [{'client_id': i} for i in range(10)],
+                                   max_workers=10, ordered=False))
+        assert sorted(r.index for r in results) == list(range(10))
+        assert [r.index for r in results] != list(range(10))
+
+    def it_reports_per_item_errors(self, handler):
+        results = list(handler.map('client.get',
+                                   [{'client_id': 3}, {}, {'client_id': 4}]))
+        assert isinstance(results[0].error, ResponseError)
+        assert isinstance(results[1].error, ValidationError)
+        assert results[2].ok
+        assert results[2].method == 'client.get'
+        assert results[2].kwargs == {'client_id': 4}
+
+    def it_accepts_call_functions(self, handler):
+        results = list(handler.map(client.get, [{'client_id': 1}]))
+        assert results[0].result['clientid'] == 1
+
+    def it_bounds_calls_in_flight(self, handler):
+        lock = threading.Lock()
+        counts = {'current': 0, 'max': 0}
+        send_request = handler._send_request
+
+        def counting_send_request(method, data):
+            with lock:
+                counts['current'] += 1
+                counts['max'] = max(counts['max'], counts['current'])
+            try:
+                return send_request(method, data)
+            finally:
+                with lock:
+                    counts['current'] -= 1
+        handler._send_request = counting_send_request
+        list(handler.map('client.get', [{'client_id': i} for i in range(10)],
+                         max_workers=2))
+        assert counts['max'] <= 2
+
+    def it_raises_unexpected_errors(self):
+        h = RequestHandler('')
+        h._send_request = Mock(side_effect=KeyError('boom'))
+        with pytest.raises(KeyError):
+            list(h.map('client.get', [{'client_id': 1}]))
+
+
+class DescribeBatch:
+    def it_runs_mixed_calls(self, handler):
+        batch = handler.batch(max_workers=2)
+        assert isinstance(batch, Batch)
+        assert batch.add('client.get', client_id=1) == 0
+        assert batch.add('client.service_list', client_id=2) == 1
+        assert len(batch) == 2
+        results = batch.results()
+        assert [r.method for r in results] == [
+            'client.get', 'client.service_list']
+        assert all(isinstance(r, BatchResult) and r.ok for r in results)
@@ -0,0 +1,124 @@
+from mock import Mock, patch
+import pytest
+import requests
+
+from ubersmith import breaker as breaker_module
+from ubersmith.api import RequestHandler
+from ubersmith.breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from ubersmith.exceptions import (
+    CircuitOpenError,
+    MaintenanceResponse,
+    ResponseError,
+)
+from ubersmith.retry import NO_RETRY
+
+
+def fail(breaker, exc=MaintenanceResponse):
+    with pytest.raises(exc):
+        with breaker:
+            raise exc()
+
+
+def succeed(breaker):
+    with breaker:
+        pass
+
+
+@pytest.fixture
+def clock():
+    with patch.object(breaker_module, 'time') as time:
+        time.time.return_value = 1000.0
+        yield time.time
+
+
+class DescribeCircuitBreaker:
+    def it_opens_after_consecutive_failures(self, clock):
+        breaker = CircuitBreaker(failure_threshold=3)
+        fail(breaker)
+        fail(breaker)
+        succeed(breaker)
+        fail(breaker)
+        fail(breaker, requests.Timeout)
+        assert breaker.state == CLOSED
+        fail(breaker, requests.ConnectionError)
+        assert breaker.state == OPEN
+
+    def it_counts_other_errors_as_successes(self, clock):
+        breaker = CircuitBreaker(failure_threshold=2)
+        fail(breaker)
+        fail(breaker, ResponseError)
+        fail(breaker)
+        assert breaker.state == CLOSED
+
+    def it_fails_fast_while_open(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        fail(breaker)
+        clock.return_value = 1010.0
+        with pytest.raises(CircuitOpenError) as e:
+            breaker.before_request()
+        assert e.value.retry_after == 20
+        assert breaker.stats().rejected == 1
+
+    def it_lets_a_single_probe_through_when_half_open(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        fail(breaker)
+        clock.return_value = 1031.0
+        breaker.before_request()
+        assert breaker.state == HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_request()
+        breaker.record_success()
+        assert breaker.state == CLOSED
+
+    def it_reopens_when_the_probe_fails(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        fail(breaker)
+        clock.return_value = 1031.0
+        fail(breaker)
+        assert breaker.state == OPEN
+        assert breaker.stats().opened == 2
+        assert breaker.stats().opened_at == 1031.0
+
+    def it_notifies_listeners_of_transitions(self, clock):
+        transitions = []
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.add_listener(lambda old, new, b: transitions.append((old, new)))
+        fail(breaker)
+        clock.return_value = 1031.0
+        succeed(breaker)
+        assert transitions == [
+            (CLOSED, OPEN),
+            (OPEN, HALF_OPEN),
+            (HALF_OPEN, CLOSED),
+        ]
+
+    def it_resets(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1)
+        fail(breaker)
+        breaker.reset()
+        assert breaker.state == CLOSED
+        succeed(breaker)
+
+
+class DescribeRequestHandlerCircuitBreaker:
+    def it_fails_fast_without_sending_requests(self):
+        maintenance = Mock()
+        maintenance.headers = {'content-type': 'application/json'}
+        maintenance.text = u''
+        maintenance.json.return_value = {
+            'status': False,
+            'data': '',
+            'error_message': 'We are currently undergoing maintenance, '
+                             'please check back shortly.',
+            'error_code': 1,
+        }
+        breaker = CircuitBreaker(failure_threshold=2)
+        h = RequestHandler('', retry_policy=NO_RETRY, circuit_breaker=breaker)
+        h._send_request = Mock(return_value=maintenance)
+        for _ in range(2):
+            with pytest.raises(MaintenanceResponse):
+                h.process_request('client.get')
+        with pytest.raises(CircuitOpenError):
+            h.process_request('client.get')
+        assert h._send_request.call_count == 2
+        assert breaker.stats().failures == 2
@@ -0,0 +1,148 @@
+from mock import Mock, patch
+import pytest
+
+from ubersmith import cache as cache_module
+from ubersmith.api import RequestHandler
+from ubersmith.cache import CacheStats, ResponseCache
+from ubersmith.exceptions import ResponseError
+from ubersmith.utils import request_key
+
+
+class DescribeResponseCache:
+    def it_looks_up_ttls_by_method_then_namespace(self):
+        cache = ResponseCache(ttls={'client.get': 10, 'client': 20},
+                              default_ttl=30)
+        assert cache.ttl('client.get') == 10
+        assert cache.ttl('client.list') == 20
+        assert cache.ttl('device.list') == 30
+        assert ResponseCache().ttl('client.get') is None
+
+    def it_does_not_store_methods_without_ttl(self):
+        cache = ResponseCache(ttls={'client.get': 10})
+        cache.set(request_key('client.list'), 'list')
+        assert cache.get(request_key('client.list')) is None
+        assert cache.stats().size == 0
+
+    def it_expires_entries(self):
+        cache = ResponseCache(default_ttl=10)
+        key = request_key('client.get', {'client_id': 1})
+        with patch.object(cache_module, 'time') as time:
+            time.time.return_value = 100
+            cache.set(key, 'value')
+            time.time.return_value = 109
+            assert cache.get(key) == 'value'
+            time.time.return_value = 110
+            assert cache.get(key) is None
+        assert cache.stats() == CacheStats(1, 1, 0, 1, 0, 0)
+
+    def it_evicts_least_recently_used(self):
+        cache = ResponseCache(default_ttl=10, maxsize=2)
+        a, b, c = [request_key('client.get', {'client_id': i})
+                   for i in range(3)]
+        cache.set(a, 'a')
+        cache.set(b, 'b')
+        cache.get(a)
+        cache.set(c, 'c')
+        assert cache.get(b) is None
+        assert cache.get(a) == 'a'
+        assert cache.get(c) == 'c'
+        assert cache.stats().evictions == 1
+
+    def it_invalidates_entries_a_write_may_change(self):
+        cache = ResponseCache(default_ttl=10)
+        keys = {
+            'get1': request_key('client.get', {'client_id': 1}),
+            'get2': request_key('client.get', {'client_id': 2}),
+            'list': request_key('client.list'),
+            'contacts2': request_key('client.contact_list',
+                                     {'client_id': 2}),
+            'device': request_key('device.get', {'device_id': 1}),
+        }
+        for key in keys.values():
+            cache.set(key, 'value')
+        cache.invalidate(request_key('client.update', {'client_id': 1}))
+        assert cache.get(keys['get1']) is None
+        assert cache.get(keys['list']) is None
+        assert cache.get(keys['get2']) == 'value'
+        assert cache.get(keys['contacts2']) == 'value'
+        assert cache.get(keys['device']) == 'value'
+        assert cache.stats().invalidations == 2
+
+    def it_invalidates_the_namespace_for_writes_without_ids(self):
+        cache = ResponseCache(default_ttl=10)
+        cache.set(request_key('client.get', {'client_id': 1}), 'value')
+        cache.set(request_key('device.list'), 'value')
+        cache.invalidate(request_key('client.add', {'first': 'Joe'}))
+        assert cache.stats().size == 1
+
+
+class DescribeRequestHandlerCaching:
+    @pytest.fixture
+    def handler(self):
+        h = RequestHandler('', cache=ResponseCache(ttls={'client': 60}))
+
+        def send_request(method, data, stream=False):
+            response = Mock()
+            response.headers = {'content-type': 'application/json'}
+            response.text = u''
+            response.json.return_value = {
+                'status': True,
+                'error_code': None,
+                'error_message': '',
+                'data': {'clientid': '1', 'method': method},
+            }
+            return response
+        h._send_request = Mock(side_effect=send_request)
+        return h
+
+    def it_answers_reads_from_the_cache(self, handler):
+        first = handler.client.get(client_id=1)
+        second = handler.client.get(client_id='1')
+        assert handler._send_request.call_count == 1
+        assert first == second == {'clientid': 1, 'method': 'client.get'}
+        # callers get independent copies
+        first['clientid'] = 2
+        assert second['clientid'] == 1
+        assert handler.cache.stats() == CacheStats(1, 1, 0, 0, 0, 1)
+
+    def it_does_not_cache_methods_without_ttl(self, handler):
+        handler.device.get(device_id=1)
+        handler.device.get(device_id=1)
+        assert handler._send_request.call_count == 2
+        assert handler.cache.stats() == CacheStats(0, 0, 0, 0, 0, 0)
+
+    def it_invalidates_on_writes(self, handler):
+        handler.client.get(client_id=1)
+        handler.client.update(client_id=1)
+        handler.client.get(client_id=1)
+        assert handler._send_request.call_count == 3
+
+    def it_invalidates_on_failed_writes(self, handler):
+        handler.client.get(client_id=1)
+        handler._send_request.side_effect = ResponseError
+        with pytest.raises(ResponseError):
+            handler.client.update(client_id=1)
+        assert handler.cache.stats().size == 0
+
+    def it_does_not_cache_errors(self, handler):
+        send_request = handler._send_request.side_effect
+        handler._send_request.side_effect = ResponseError
+        with pytest.raises(ResponseError):
+            handler.client.get(client_id=1)
+        handler._send_request.side_effect = send_request
+        handler.client.get(client_id=1)
+        handler.client.get(client_id=1)
+        assert handler._send_request.call_count == 2
+
+    def it_is_disabled_by_default(self):
+        assert RequestHandler('').cache is None
+
+    def it_does_not_cache_streamed_responses(self, handler):
+        handler.process_request('client.avatar_get', {'client_id': 1},
+                                stream=True)
+        handler.process_request('client.avatar_get', {'client_id': 1},
+                                stream=True)
+        assert handler._send_request.call_count == 2
+        handler._send_request.assert_called_with(
+            'client.avatar_get', {'client_id': 1}, stream=True)
+        assert handler.cache.stats().size == 0
@@ -10,7 +10,7 @@ from ubersmith.api import METHODS, BaseResponse
 from ubersmith.calls import generate_generic_calls
 from ubersmith.clean import _CLEANERS
 from ubersmith.exceptions import ValidationError
-from ubersmith import uber, order
+from ubersmith import client, uber, order
 
 
 def setup_module(module):
@@ -88,6 +88,89 @@ def test_group_call():
     assert dict(order.list.handler(handler)()) == {1: {"test": "blah"}}
 
 
+def test_cleaning_leaves_response_json_alone():
+    from ubersmith.calls.client import ListCall
+    data = {"1": {"clientid": "1", "balance": "1.50", "info": {"a": "1"}}}
+    handler = Mock()
+    handler.process_request.return_value = make_base_response(data)
+    resp = ListCall({}, handler).render()
+    assert resp[1]['clientid'] == 1
+    assert resp.json['data'] == {
+        "1": {"clientid": "1", "balance": "1.50", "info": {"a": "1"}}}
+    # only what the cleaner didn't touch is shared
+    assert resp[1]['info'] is resp.json['data']['1']['info']
+
+
+def test_calls_copy_data_when_asked():
+    from ubersmith.calls.client import ListCall
+
+    class CopyingListCall(ListCall):
+        copy_data = True
+
+    data = {"1": {"clientid": "1", "info": {"a": "1"}}}
+    handler = Mock()
+    handler.process_request.return_value = make_base_response(data)
+    resp = CopyingListCall({}, handler).render()
+    resp[1]['info']['a'] = '2'
+    assert resp.json['data']['1']['info'] == {"a": "1"}
+
+
+def test_calls_copy_data_if_the_handler_does():
+    from ubersmith.api import RequestHandler
+    from ubersmith.calls.client import ListCall
+    h = RequestHandler('', copy_data=True)
+    h.process_request = lambda *args, **kwargs: make_base_response(
+        {"1": {"clientid": "1", "info": {"a": "1"}}})
+    resp = ListCall({}, h).render()
+    resp[1]['info']['a'] = '2'
+    assert resp.json['data']['1']['info'] == {"a": "1"}
+    call = ListCall({}, h)
+    call.copy_data = False
+    resp = call.render()
+    assert resp[1]['info'] is resp.json['data']['1']['info']
+
+
+def test_calls_without_cleaners_copy_the_top_level():
+    from ubersmith.calls import BaseCall
+    handler = Mock()
+    handler.process_request.return_value = make_base_response(
+        {"a": {"b": "1"}})
+    resp = BaseCall({}, handler).render()
+    resp['c'] = '2'
+    assert resp.json['data'] == {"a": {"b": "1"}}
+
+
+def test_calls_clean_lazily_if_the_handler_does():
+    from ubersmith.api import RequestHandler
+    from ubersmith.calls.client import GetCall, ListCall
+    from ubersmith.clean import LazyRecord
+    h = RequestHandler('', lazy=True)
+    h.process_request = lambda *args, **kwargs: make_base_response(
+        {"1": {"clientid": "1", "balance": "1.50"}})
+    resp = ListCall({}, h).render()
+    assert isinstance(resp[1], LazyRecord)
+    assert resp == {1: {"clientid": 1, "balance": Decimal('1.50')}}
+    h.process_request = lambda *args, **kwargs: make_base_response(
+        {"clientid": "1", "balance": "1.50"})
+    resp = GetCall({'client_id': 1}, h).render()
+    assert isinstance(resp.data, LazyRecord)
+    assert resp['clientid'] == 1
+    assert dict(resp.items()) == {"clientid": 1, "balance": Decimal('1.50')}
+
+
+def test_lazy_responses_serialize_as_dicts():
+    from ubersmith.api import RequestHandler
+    from ubersmith.calls.client import ListCall
+    data = {"1": {"clientid": "1", "active": "1"}}
+    h = RequestHandler('', lazy=True)
+    h.process_request = lambda *args, **kwargs: make_base_response(data)
+    resp = ListCall({}, h).render()
+    with pytest.raises(TypeError):
+        json.dumps(resp.data)
+    assert json.loads(json.dumps(resp.__json__())) == {
+        "1": {"clientid": 1, "active": True}}
+
+
 def test_file_call():
     handler = Mock()
     response = Mock()
@@ -96,6 +179,22 @@ def test_file_call():
     handler.process_request.return_value = BaseResponse(response)
     uber_file = uber.documentation.handler(handler)()
     assert uber_file.data == 'bytes here'
+    assert handler.process_request.call_args[1]['stream'] is True
+
+
+@pytest.mark.parametrize('format, stream', [
+    (None, False),
+    ('json', False),
+    ('pdf', True),
+])
+def test_invoice_get_streams_files(format, stream):
+    handler = Mock()
+    handler.process_request.return_value = make_base_response({})
+    kwargs = {'invoice_id': 1}
+    if format is not None:
+        kwargs['format'] = format
+    client.invoice_get.handler(handler)(**kwargs)
+    assert handler.process_request.call_args[1]['stream'] is stream
 
 
 def test_calls_validates_required_fields():
@@ -1,9 +1,10 @@
 import datetime
 from decimal import Decimal
+import json
 
 import pytest
 
-from ubersmith.clean import clean
+from ubersmith.clean import LazyRecord, clean, unlazy
 
 
 class DescribeClean:
@@ -157,3 +158,146 @@ class DescribeClean:
     def it_cleans_numerical_values_with_none_as_none(self):
         assert clean('int')(None) is None
         assert clean('decimal')(None) is None
+
+    def it_cleans_items_like_the_whole_dict(self):
+        cleaner = clean(dict, keys='int', values=clean(dict, values={
+            'active': bool,
+            'balance': 'decimal',
+        }))
+        data = {
+            '1': {'active': '1', 'balance': '1.50'},
+            '2': {'active': '', 'balance': '2'},
+        }
+        items = dict(cleaner.clean_item(k, dict(v)) for k, v in data.items())
+        assert items == cleaner(data)
+
+    def it_cleans_specific_items(self):
+        cleaner = clean(dict, keys={'a': str.upper}, values={'A': int})
+        assert cleaner.clean_item('a', '1') == ('A', 1)
+        assert cleaner.clean_item('b', '1') == ('b', '1')
+
+    def it_cleans_list_items(self):
+        assert clean(list, values=str).clean_item(0, 1) == (0, '1')
+        assert clean(list, values={1: str}).clean_item(0, 1) == (0, 1)
+
+    def it_compiles_to_a_function(self):
+        cleaner = clean(dict, keys='int', values=clean(dict, values={
+            'id': 'int',
+            'progress': clean(list, values={0: 'int'}),
+        }))
+        compiled = cleaner.compile()
+        assert not isinstance(compiled, clean)
+        data = {'1': {'id': '1', 'progress': ['2', '3']}, '2': {}}
+        assert compiled(data) == cleaner(data) == {
+            1: {'id': 1, 'progress': [2, '3']},
+            2: {},
+        }
+
+    def it_compiles_plain_cleaners_to_themselves(self):
+        assert clean(dict).compile() is dict
+        assert clean(list).compile() is list
+        assert clean('int').compile()('1,000') == 1000
+
+    def it_does_not_change_the_data_it_cleans(self):
+        cleaner = clean(dict, keys='int', values=clean(dict, values={
+            'id': 'int',
+        }))
+        data = {'1': {'id': '1'}}
+        assert cleaner(data) == {1: {'id': 1}}
+        assert data == {'1': {'id': '1'}}
+
+    def it_cleans_empty_lists_as_dicts(self):
+        # ubersmith sends [] for empty lists
+        assert clean(dict, keys='int', values={'a': int})([]) == {}
+
+    def it_silences_key_errors_of_nested_cleaners(self):
+        cleaner = clean(dict, values={
+            'info': clean(dict, values={'id': int}, raises=True),
+            'count': int,
+        })
+        assert cleaner({'info': {}, 'count': '2'}) == {'info': {},
+                                                       'count': 2}
+
+
+class DescribeLazyRecord:
+    def cleaner(self, calls=None):
+        def count(val):
+            if calls is not None:
+                calls.append(val)
+            return int(val)
+        return clean(dict, keys='int', values=clean(dict, values={
+            'id': count,
+            'balance': 'decimal',
+            'info': clean(dict, values={'ts': 'timestamp'}),
+        }))
+
+    def data(self):
+        return {
+            '1': {'id': '1', 'balance': '1.50', 'name': 'a',
+                  'info': {'ts': '0'}},
+            '2': {'id': '2', 'balance': '', 'name': 'b'},
+        }
+
+    def it_equals_the_eagerly_cleaned_dict(self):
+        cleaner = self.cleaner()
+        lazy = cleaner(self.data(), lazy=True)
+        assert type(lazy) is dict
+        assert isinstance(lazy[1], LazyRecord)
+        assert isinstance(lazy[1]['info'], LazyRecord)
+        assert lazy == cleaner(self.data())
+        assert dict(lazy[1]) == cleaner(self.data())[1]
+        assert sorted(lazy[1]) == ['balance', 'id', 'info', 'name']
+        assert len(lazy[2]) == 3
+        assert 'info' not in lazy[2]
+        assert lazy[2].get('info') is None
+        assert lazy[2].get('balance', 'x') is None
+
+    def it_cleans_fields_once_when_read(self):
+        calls = []
+        record = self.cleaner(calls)(self.data(), lazy=True)[1]
+        assert calls == []
+        assert record['name'] == 'a'
+        assert calls == []
+        assert record['id'] == 1
+        assert record['id'] == 1
+        assert calls == ['1']
+
+    def it_leaves_the_data_alone(self):
+        data = self.data()
+        record = self.cleaner()(data, lazy=True)[1]
+        record['id'] = 5
+        record['new'] = 'x'
+        del record['balance']
+        assert dict(record) == {
+            'id': 5, 'name': 'a', 'new': 'x',
+            'info': {'ts': datetime.datetime.fromtimestamp(0)},
+        }
+        assert data == self.data()
+
+    def it_cleans_top_level_records(self):
+        record = clean(dict, values={'id': 'int'})({'id': '3'}, lazy=True)
+        assert isinstance(record, LazyRecord)
+        assert record == {'id': 3}
+        assert repr(record) == "{'id': 3}"
+        assert record.copy() == {'id': 3}
+        assert type(record.copy()) is dict
+
+    def it_turns_records_into_dicts(self):
+        data = self.cleaner()(self.data(), lazy=True)
+        records = unlazy({'records': [data[1]]})
+        assert type(records['records'][0]) is dict
+        assert type(records['records'][0]['info']) is dict
+        assert records == {'records': [self.cleaner()(self.data())[1]]}
+        assert json.dumps(unlazy(data[2])) == json.dumps(dict(data[2]))
+        assert type(data[1].__json__()['info']) is dict
+
+    def it_raises_key_errors_if_asked(self):
+        cleaner = clean(dict, values={'not_there': int}, raises=True)
+        with pytest.raises(KeyError):
+            cleaner({}, lazy=True)
+
+    def it_silences_key_errors_of_nested_cleaners(self):
+        record = clean(dict, values={
+            'info': clean(dict, values={'id': int}, raises=True),
+        })({'info': {}}, lazy=True)
+        assert record['info'] == {}
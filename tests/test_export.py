@@ -0,0 +1,133 @@
+import hashlib
+import json
+import threading
+
+from mock import Mock
+import pytest
+
+from ubersmith.api import RequestHandler
+from ubersmith.export import (
+    ApiExporter,
+    ExportPartition,
+    id_ranges,
+    offset_windows,
+)
+
+
+def csv_rows(data):
+    return u''.join(u'{0}\n'.format(i) for i in range(
+        int(data.get('offset', 0)),
+        int(data.get('offset', 0)) + int(data.get('limit', 3)))).encode()
+
+
+def make_handler(fail_offsets=()):
+    h = RequestHandler('')
+
+    def send_request(method, data, stream=False):
+        assert method == 'uber.api_export'
+        assert stream
+        if int(data.get('offset', 0)) in fail_offsets:
+            raise IOError('connection lost')
+        response = Mock()
+        response.headers = {'content-type': 'text/csv'}
+        body = csv_rows(data)
+        response.iter_content.side_effect = lambda n: iter(
+            [body[:2], body[2:]])
+        return response
+    h._send_request = Mock(side_effect=send_request)
+    return h
+
+
+class DescribePartitions:
+    def it_splits_offsets_into_windows(self):
+        assert offset_windows(25, 10) == [
+            {'offset': 0, 'limit': 10},
+            {'offset': 10, 'limit': 10},
+            {'offset': 20, 'limit': 10},
+        ]
+
+    def it_splits_ids_into_ranges(self):
+        assert id_ranges(1, 25, 10, 'min_id', 'max_id') == [
+            {'min_id': 1, 'max_id': 10},
+            {'min_id': 11, 'max_id': 20},
+            {'min_id': 21, 'max_id': 25},
+        ]
+
+    def it_rejects_bad_sizes(self):
+        with pytest.raises(ValueError):
+            offset_windows(10, 0)
+
+
+class DescribeApiExporter:
+    def it_writes_every_partition(self, tmpdir):
+        h = make_handler()
+        exporter = ApiExporter('tickets', str(tmpdir),
+                               offset_windows(9, 3), h, order_by='id')
+        partitions = exporter.run()
+        assert [p.index for p in partitions] == [0, 1, 2]
+        body = csv_rows({'offset': 3, 'limit': 3})
+        assert partitions[1] == ExportPartition(
+            1, {'offset': 3, 'limit': 3}, str(tmpdir.join('tickets.00001.csv')),
+            len(body), hashlib.sha256(body).hexdigest())
+        assert tmpdir.join('tickets.00002.csv').read_binary() == b'6\n7\n8\n'
+        data = h._send_request.call_args[0][1]
+        assert data['table'] == 'tickets'
+        assert data['order_by'] == 'id'
+
+    def it_exports_whole_tables_by_default(self, tmpdir):
+        exporter = ApiExporter('client', str(tmpdir), request_handler=
+                               make_handler(), gzip=True)
+        partition, = exporter.run()
+        assert partition.path == str(tmpdir.join('client.00000.csv.gz'))
+
+    def it_resumes_from_the_checkpoint(self, tmpdir):
+        h = make_handler(fail_offsets=[6])
+        exporter = ApiExporter('tickets', str(tmpdir),
+                               offset_windows(12, 3), h, max_workers=1)
+        with pytest.raises(IOError):
+            exporter.run()
+        assert not tmpdir.join('tickets.00002.csv.part').check()
+        assert exporter.pending()[0] == 2
+        checkpoint = json.loads(tmpdir.join('tickets.checkpoint.json').read())
+        assert {'0', '1'} <= set(checkpoint['completed'])
+
+        h = make_handler()
+        exporter = ApiExporter('tickets', str(tmpdir),
+                               offset_windows(12, 3), h)
+        assert [p.index for p in exporter.run()] == [0, 1, 2, 3]
+        assert 0 not in [c[0][1]['offset'] for c in
+                         h._send_request.call_args_list]
+        assert exporter.pending() == []
+
+    def it_downloads_changed_files_again(self, tmpdir):
+        windows = offset_windows(6, 3)
+        ApiExporter('tickets', str(tmpdir), windows, make_handler()).run()
+        tmpdir.join('tickets.00000.csv').write_binary(b'0\n')
+        h = make_handler()
+        ApiExporter('tickets', str(tmpdir), windows, h).run()
+        assert h._send_request.call_count == 1
+        assert tmpdir.join('tickets.00000.csv').read_binary() == b'0\n1\n2\n'
+
+    def it_refuses_other_exports_checkpoints(self, tmpdir):
+        ApiExporter('tickets', str(tmpdir), offset_windows(6, 3),
+                    make_handler()).run()
+        with pytest.raises(ValueError):
+            ApiExporter('tickets', str(tmpdir), offset_windows(6, 2),
+                        make_handler()).run()
+
+    def it_downloads_partitions_concurrently(self, tmpdir):
+        h = make_handler()
+        send_request = h._send_request.side_effect
+        started = []
+        all_started = threading.Event()
+
+        def wait_for_others(method, data, stream=False):
+            started.append(data['offset'])
+            if len(started) == 3:
+                all_started.set()
+            assert all_started.wait(5)
+            return send_request(method, data, stream)
+        h._send_request.side_effect = wait_for_others
+        exporter = ApiExporter('tickets', str(tmpdir), offset_windows(9, 3),
+                               h, max_workers=3)
+        assert len(exporter.run()) == 3
@@ -1,7 +1,9 @@
+import io
 import json
 
 from mock import Mock, patch
 import pytest
+import requests
 from six import text_type
 
 import ubersmith.uber
@@ -92,6 +94,14 @@ class DescribeRequestHandler:
         h._send_request = Mock(return_value=response)
         assert self.test_data == h.process_request('uber.method_list').data
 
+    def it_decodes_responses_with_json_decoder(self, response):
+        decoder = Mock(side_effect=json.loads)
+        h = RequestHandler('', json_decoder=decoder)
+        h._send_request = Mock(return_value=response)
+        assert h.uber.method_list().data == self.test_data
+        decoder.assert_called_once_with(response.content)
+        assert not response.json.called
+
     def it_handles_updating_token(self, response, token_response):
         returns = [
             token_response,
@@ -117,6 +127,31 @@ class DescribeRequestHandler:
             time.sleep = lambda x: None
             assert self.test_data == h.process_request('uber.method_list').data
 
+    def streamed_html(self, body):
+        response = requests.Response()
+        response.status_code = 200
+        response.headers['content-type'] = 'text/html'
+        response.raw = io.BytesIO(body)
+        return response
+
+    def it_only_peeks_at_streamed_html(self, make_handler):
+        body = b'<html>' + b'x' * 1000000 + b'</html>'
+        response = self.streamed_html(body)
+        h = make_handler(response)
+        resp = h.process_request('uber.documentation', stream=True)
+        assert response.raw.tell() < len(body)
+        assert resp.response.content == body
+
+    def it_handles_updating_token_when_streaming(self, make_handler,
+                                                 make_response):
+        h = make_handler(
+            self.streamed_html(b'<title>Updating Token...</title>'),
+            make_response(content_type='application/pdf', content=b'%PDF'))
+        with patch('ubersmith.api.time') as time:
+            time.sleep = lambda x: None
+            resp = h.process_request('uber.documentation', stream=True)
+        assert resp.response.content == b'%PDF'
+
     def it_raises_updating_token_after_3_tries(self, response, token_response):
         returns = [
             token_response,
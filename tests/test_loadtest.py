@@ -0,0 +1,126 @@
+import json
+import socket
+
+import pytest
+
+from ubersmith.api import RequestHandler
+from ubersmith.loadtest import (
+    LoadTest,
+    LoadTestResult,
+    MixEntry,
+    compare,
+    format_result,
+    load_mix,
+    main,
+)
+from ubersmith.retry import RetryPolicy
+from ubersmith.testing import FakeUbersmith
+
+
+@pytest.fixture
+def server():
+    with FakeUbersmith(clients=100, devices=100, orders=100) as server:
+        yield server
+
+
+def result(**kwargs):
+    fields = dict(requests=100, errors={}, retries=0, duration=1.0,
+                  throughput=100.0, p50=.01, p95=.02, p99=.03,
+                  error_rate=0.0, retry_rate=0.0, peak_rss=1000)
+    fields.update(kwargs)
+    return LoadTestResult(**fields)
+
+
+class DescribeLoadTest:
+    def it_runs_the_mix(self, server):
+        h = RequestHandler(server.url)
+        mix = [MixEntry('client.get', 3, {'client_id': [1, 2]}),
+               MixEntry('device.list', 1, {'limit': 10})]
+        r = LoadTest(h, mix, concurrency=4, requests=40, seed=1).run()
+        assert r.requests == 40
+        assert sum(server.calls.values()) == 40
+        assert server.calls['client.get'] > server.calls['device.list']
+        assert r.errors == {}
+        assert 0 < r.p50 <= r.p95 <= r.p99
+        assert r.throughput > 0
+        assert h.metrics is None
+
+    def it_counts_errors_and_retries(self, server):
+        h = RequestHandler(server.url, retry_policy=RetryPolicy(
+            max_attempts=2, backoff=0.001, jitter=0))
+        server.inject('token')
+        server.inject('maintenance', 2)
+        mix = [MixEntry('client.get', args={'client_id': 1})]
+        r = LoadTest(h, mix, concurrency=1, requests=10).run()
+        assert r.requests == 10
+        assert r.retries == 1
+        # maintenance isn't retried by default
+        assert r.errors == {'MaintenanceResponse': 2}
+        assert r.error_rate == 0.2
+        assert r.retry_rate == 0.1
+
+    def it_counts_connection_errors(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        h = RequestHandler('http://127.0.0.1:{0}/'.format(port))
+        mix = [MixEntry('client.count')]
+        r = LoadTest(h, mix, concurrency=2, requests=6).run()
+        assert r.requests == 6
+        assert r.errors == {'ConnectionError': 6}
+        assert r.error_rate == 1.0
+        assert r.p50 > 0
+
+    def it_paces_calls_at_a_rate(self, server):
+        h = RequestHandler(server.url)
+        mix = [MixEntry('client.count')]
+        r = LoadTest(h, mix, concurrency=4, rate=50, duration=0.4).run()
+        assert r.requests == 20
+        assert r.duration >= 0.38
+
+
+class DescribeCompare:
+    def it_passes_within_tolerance(self):
+        baseline = result()._asdict()
+        assert compare(result(throughput=80.0, p99=.037), baseline) == []
+
+    def it_reports_regressions(self):
+        baseline = result()._asdict()
+        regressions = compare(
+            result(throughput=70.0, p95=.03, peak_rss=2000,
+                   error_rate=0.05), baseline)
+        assert [r.split()[0] for r in regressions] == [
+            'throughput', 'p95', 'peak_rss', 'error_rate']
+
+    def it_formats_results(self):
+        text = format_result(result(errors={'ServerErrorResponse': 2},
+                                    error_rate=.02))
+        assert 'p95 20.0ms' in text
+        assert 'errors      2.00%  ServerErrorResponse: 2' in text
+
+
+class DescribeMain:
+    def it_loads_mixes(self, tmpdir):
+        path = tmpdir.join('mix.json')
+        path.write(json.dumps([{'method': 'client.get', 'weight': 5,
+                                'args': {'client_id': [1, 2]}},
+                               {'method': 'client.count'}]))
+        assert load_mix(str(path)) == [
+            MixEntry('client.get', 5, {'client_id': [1, 2]}),
+            MixEntry('client.count', 1, {}),
+        ]
+
+    def it_fails_on_regressions(self, tmpdir, capsys):
+        saved = str(tmpdir.join('run.json'))
+        assert main(['--fake', '--requests', '20', '--concurrency', '2',
+                     '--save', saved]) == 0
+        with open(saved) as f:
+            assert json.load(f)['requests'] == 20
+
+        baseline = str(tmpdir.join('baseline.json'))
+        with open(baseline, 'w') as f:
+            json.dump(result(throughput=1e9)._asdict(), f)
+        assert main(['--fake', '--requests', '20', '--baseline',
+                     baseline]) == 1
+        assert 'REGRESSION: throughput' in capsys.readouterr().out
@@ -0,0 +1,117 @@
+from mock import Mock
+import pytest
+
+from ubersmith.calls.device import ListCall
+from ubersmith.exceptions import MaintenanceResponse, UpdatingTokenResponse
+from ubersmith.metrics import MetricsCollector, MetricsHook
+from ubersmith.retry import RetryPolicy
+
+
+MAINTENANCE = (u'We are currently undergoing maintenance, please check back '
+               u'shortly.')
+
+
+@pytest.fixture
+def metrics():
+    return MetricsCollector(buckets=[0.1, 1])
+
+
+@pytest.fixture
+def token_response(make_response):
+    return make_response(content_type='text/html', content=u'Updating Token')
+
+
+@pytest.fixture
+def maintenance_response(make_response):
+    return make_response('', status=False, error_code=1,
+                         error_message=MAINTENANCE)
+
+
+class DescribeMetricsHook:
+    def it_does_nothing(self):
+        hook = MetricsHook()
+        hook.on_request('client.get', 0.1, None, 1, 2)
+        hook.on_attempt_failed('client.get', ValueError(), None)
+        hook.on_clean('client.get', 0.1)
+
+
+class DescribeMetricsCollector:
+    def it_renders_prometheus_text(self, metrics):
+        metrics.on_request('client.get', 0.05, None, 10, 100)
+        metrics.on_request('client.get', 0.5, ValueError(), None, None)
+        metrics.on_request('device.list', 2.0, None, 10, None)
+        text = metrics.render()
+        assert '# TYPE ubersmith_requests_total counter\n' in text
+        assert 'ubersmith_requests_total{method="client.get",outcome="ok"} 1' \
+            in text
+        assert 'ubersmith_requests_total{method="client.get",' \
+            'outcome="ValueError"} 1' in text
+        assert '# TYPE ubersmith_request_duration_seconds histogram\n' in text
+        for le, count in [('0.1', 1), ('1.0', 2), ('+Inf', 2)]:
+            assert 'ubersmith_request_duration_seconds_bucket{' \
+                'le="' + le + '",method="client.get"} ' + str(count) in text
+        assert 'ubersmith_request_duration_seconds_count{' \
+            'method="device.list"} 1' in text
+        assert 'ubersmith_request_duration_seconds_sum{' \
+            'method="client.get"} 0.55' in text
+        assert 'ubersmith_response_bytes_total{method="client.get"} 100' \
+            in text
+        assert text.endswith('\n')
+
+    def it_escapes_labels(self, metrics):
+        metrics.on_clean('a"b\\c', 0.01)
+        assert 'method="a\\"b\\\\c"' in metrics.render()
+
+    def it_resets(self, metrics):
+        metrics.on_request('client.get', 0.05, None, 10, 100)
+        metrics.reset()
+        assert 'client.get' not in metrics.render()
+
+
+class DescribeRequestHandlerMetrics:
+    def it_records_requests(self, metrics, make_handler, make_response):
+        response = make_response()
+        response.request = Mock(body=b'client_id=1')
+        h = make_handler(response, metrics=metrics)
+        h.process_request('client.get', {'client_id': 1})
+        assert metrics.requests == {('client.get', 'ok'): 1}
+        assert metrics.latency['client.get'].counts[0] == 1
+        assert metrics.request_bytes == {'client.get': 11}
+        assert metrics.response_bytes == {'client.get': len(response.content)}
+
+    def it_records_failed_requests(self, metrics, make_handler,
+                                   maintenance_response):
+        h = make_handler(maintenance_response, metrics=metrics)
+        with pytest.raises(MaintenanceResponse):
+            h.process_request('client.get')
+        assert metrics.requests == {('client.get', 'MaintenanceResponse'): 1}
+        assert metrics.maintenance == {'client.get': 1}
+        assert metrics.retries == {}
+
+    def it_records_retries_and_token_waits(self, metrics, make_handler,
+                                           make_response, token_response,
+                                           maintenance_response):
+        h = make_handler(token_response, maintenance_response,
+                         make_response(), metrics=metrics,
+                         retry_policy=RetryPolicy(backoff=0.001, jitter=0,
+                                                  maintenance=True))
+        h.process_request('client.get')
+        assert metrics.retries == {
+            ('client.get', 'UpdatingTokenResponse'): 1,
+            ('client.get', 'MaintenanceResponse'): 1,
+        }
+        assert metrics.token_wait == {'client.get': 0.001}
+        assert metrics.maintenance == {'client.get': 1}
+        assert metrics.requests == {('client.get', 'ok'): 1}
+
+    def it_records_cleaning(self, metrics, make_handler, make_response):
+        h = make_handler(make_response({'22': {'dev': '22'}}),
+                         metrics=metrics)
+        ListCall({}, h).render()
+        assert metrics.clean_time['device.list'].counts[0] == 1
+
+    def it_works_without_metrics(self, make_handler, token_response):
+        h = make_handler(token_response,
+                         retry_policy=RetryPolicy(max_attempts=1))
+        with pytest.raises(UpdatingTokenResponse):
+            h.process_request('client.get')
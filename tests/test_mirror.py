@@ -0,0 +1,150 @@
+import datetime
+import json
+import sqlite3
+import time
+
+from mock import Mock, patch
+import pytest
+
+from ubersmith.api import RequestHandler
+from ubersmith.mirror import Mirror, MirrorTable
+
+CLIENTS = {
+    '1001': {'clientid': '1001', 'email': 'a@example.com', 'active': '1',
+             'login': 'a', 'created': '1312304618', 'balance': '1.50'},
+    '1002': {'clientid': '1002', 'email': 'b@example.com', 'active': '0',
+             'login': 'b', 'created': '1312304618', 'balance': '0.00'},
+}
+DEVICES = {
+    '22': {'dev': '22', 'clientid': '1001', 'rack_id': '1', 'type_id': '12',
+           'parent': '0', 'height': '2'},
+    '23': {'dev': '23', 'clientid': '1001', 'rack_id': '2', 'type_id': '12',
+           'parent': '22', 'height': '1'},
+    '24': {'dev': '24', 'clientid': '1002', 'rack_id': '2', 'type_id': '3',
+           'parent': '0', 'height': '1'},
+}
+SERVICES = {
+    '1001': {'243': {'packid': '243', 'clientid': '1001', 'plan_id': '5'}},
+    '1002': {'244': {'packid': '244', 'clientid': '1002', 'plan_id': '5'}},
+}
+
+
+@pytest.fixture
+def handler():
+    h = RequestHandler('')
+
+    def send_request(method, data, stream=False):
+        data = {
+            'client.list': CLIENTS,
+            'device.list': DEVICES,
+            'client.service_list': SERVICES.get(data.get('client_id'), {}),
+        }[method]
+        resp_json = {
+            'status': True,
+            'error_code': None,
+            'error_message': '',
+            'data': data,
+        }
+        body = json.dumps(resp_json).encode('utf-8')
+        response = Mock()
+        response.headers = {'content-type': 'application/json'}
+        response.json.return_value = resp_json
+        response.text = body.decode('utf-8')
+        response.iter_content.side_effect = lambda n: iter([body])
+        return response
+    h._send_request = Mock(side_effect=send_request)
+    return h
+
+
+@pytest.fixture
+def mirror(handler):
+    mirror = Mirror(':memory:', {
+        'clients': MirrorTable('client.list', ['clientid', 'email', 'active']),
+        'devices': MirrorTable('device.list', ['clientid', 'rack_id']),
+        'services': MirrorTable('client.service_list', ['plan_id'],
+                                per_client='client_id'),
+    }, handler)
+    mirror.refresh()
+    yield mirror
+    mirror.close()
+
+
+class DescribeMirror:
+    def it_returns_records_like_the_live_call(self, mirror, handler):
+        live = handler.client.list()
+        assert mirror.find('clients') == dict(live)
+        client = mirror.get('clients', 1001)
+        assert client['clientid'] == 1001
+        assert client['created'] == datetime.datetime.fromtimestamp(
+            1312304618)
+
+    def it_finds_records_by_indexed_fields(self, mirror):
+        assert sorted(mirror.find('devices', clientid=1001)) == [22, 23]
+        assert sorted(mirror.find('devices', clientid=1001, rack_id=2)) == \
+            [23]
+        assert sorted(mirror.find('devices', rack_id=[1, 2])) == [22, 23, 24]
+        assert list(mirror.find('clients', email='b@example.com')) == [1002]
+
+    def it_rejects_unindexed_fields(self, mirror):
+        with pytest.raises(ValueError):
+            mirror.find('devices', type_id=12)
+
+    def it_calls_per_client_methods_for_every_client(self, mirror, handler):
+        assert sorted(mirror.find('services', plan_id='5')) == ['243', '244']
+        client_ids = sorted(
+            c[0][1]['client_id'] for c in handler._send_request.call_args_list
+            if c[0][0] == 'client.service_list')
+        assert client_ids == ['1001', '1002']
+
+    def it_misses_unknown_keys(self, mirror):
+        assert mirror.get('devices', 99) is None
+
+    def it_replaces_rows_on_refresh(self, mirror):
+        del DEVICES['24']
+        try:
+            mirror.refresh(['devices'])
+        finally:
+            DEVICES['24'] = {'dev': '24', 'clientid': '1002', 'rack_id': '2',
+                             'type_id': '3', 'parent': '0', 'height': '1'}
+        assert sorted(mirror.find('devices')) == [22, 23]
+        assert mirror.refreshed('devices') <= time.time()
+
+    def it_refuses_lookups_before_the_first_refresh(self, handler):
+        mirror = Mirror(':memory:', request_handler=handler)
+        with pytest.raises(LookupError):
+            mirror.find('devices')
+
+    def it_refreshes_in_the_background(self, mirror, handler):
+        calls = handler._send_request.call_count
+        mirror.start(interval=0.01)
+        try:
+            for _ in range(500):
+                if handler._send_request.call_count > calls + 4:
+                    break
+                time.sleep(0.01)
+        finally:
+            mirror.stop()
+        assert handler._send_request.call_count > calls + 4
+        assert mirror.last_error is None
+
+    def it_keeps_rows_when_a_refresh_fails(self, mirror, handler):
+        handler._send_request.side_effect = IOError('connection lost')
+        mirror.start(interval=10)
+        try:
+            for _ in range(500):
+                if mirror.last_error is not None:
+                    break
+                time.sleep(0.01)
+        finally:
+            mirror.stop()
+        assert isinstance(mirror.last_error, IOError)
+        assert len(mirror.find('devices')) == 3
+
+    def it_keeps_rows_when_storing_a_refresh_fails(self, mirror):
+        # a cleaned value sqlite can't store fails the insert
+        call = Mock()
+        call.clean_item.return_value = ('22', {'clientid': object()})
+        with patch.object(mirror, '_call', return_value=call):
+            with pytest.raises(sqlite3.Error):
+                mirror.refresh(['devices'])
+        assert sorted(mirror.find('devices')) == [22, 23, 24]
@@ -0,0 +1,223 @@
+from email.parser import BytesParser
+import hashlib
+import io
+import json
+import threading
+
+from mock import Mock
+import pytest
+from six.moves import BaseHTTPServer, socketserver
+from urllib3.filepost import encode_multipart_formdata
+
+from ubersmith.api import RequestHandler
+from ubersmith.multipart import FileField, MultipartEncoder, is_file_value
+
+
+def read_all(encoder, size=7):
+    return b''.join(iter(lambda: encoder.read(size), b''))
+
+
+class DescribeFileField:
+    def it_reads_paths(self, tmpdir):
+        path = tmpdir.join('backup.tar.gz')
+        path.write_binary(b'x' * 10)
+        field = FileField(str(path))
+        assert field.filename == 'backup.tar.gz'
+        assert field.content_type == 'application/x-tar'
+        assert field.length == 10
+        assert b''.join(field.iter_chunks(3)) == b'x' * 10
+
+    def it_rewinds_file_objects(self):
+        f = io.BytesIO(b'skip-data')
+        f.seek(5)
+        field = FileField(f, filename='data.txt')
+        assert field.length == 4
+        assert b''.join(field.iter_chunks()) == b'data'
+        assert b''.join(field.iter_chunks()) == b'data'
+
+    def it_reads_generators_once(self):
+        field = FileField(c for c in [b'a', b'b'])
+        assert field.length is None
+        assert field.content_type == 'application/octet-stream'
+        assert b''.join(field.iter_chunks()) == b'ab'
+        with pytest.raises(ValueError):
+            list(field.iter_chunks())
+
+    def it_detects_file_values(self):
+        assert is_file_value(io.BytesIO())
+        assert is_file_value(FileField(io.BytesIO()))
+        assert is_file_value(c for c in [b''])
+        assert not is_file_value('/etc/hosts')
+        assert not is_file_value([b''])
+
+
+class DescribeMultipartEncoder:
+    def it_encodes_like_urllib3(self):
+        encoder = MultipartEncoder(
+            {'b': 2, 'a': u'é'},
+            {'file': FileField(io.BytesIO(b'data'), filename='a "b".txt')},
+            boundary='boundary')
+        expected, content_type = encode_multipart_formdata([
+            ('a', u'é'),
+            ('b', '2'),
+            ('file', ('a "b".txt', b'data', 'text/plain')),
+        ], boundary='boundary')
+        assert read_all(encoder) == expected
+        assert encoder.content_type == content_type
+        assert encoder.len == len(expected)
+
+    def it_has_no_length_for_generators(self):
+        encoder = MultipartEncoder({}, {'file': (c for c in [b'a'])})
+        assert not hasattr(encoder, 'len')
+        assert encoder.total is None
+        assert b'\r\n\r\na\r\n' in b''.join(encoder)
+
+    def it_reports_progress(self):
+        progress = []
+        encoder = MultipartEncoder(
+            {}, {'file': io.BytesIO(b'x' * 100)},
+            callback=lambda sent, total: progress.append((sent, total)))
+        body = read_all(encoder, 50)
+        assert progress[-1] == (len(body), len(body))
+        assert [sent for sent, _ in progress] == sorted(
+            sent for sent, _ in progress)
+
+    def it_reads_everything_without_a_size(self):
+        encoder = MultipartEncoder({'a': 1}, {}, boundary='b')
+        assert encoder.read() == \
+            b'--b\r\nContent-Disposition: form-data; name="a"\r\n\r\n1\r\n' \
+            b'--b--\r\n'
+        assert encoder.read() == b''
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn,
+                           BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class _UploadHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _read_chunked(self):
+        body = b''
+        while True:
+            size = int(self.rfile.readline().strip(), 16)
+            if not size:
+                self.rfile.readline()
+                return body
+            body += self.rfile.read(size)
+            self.rfile.readline()
+
+    def do_POST(self):
+        if self.headers.get('transfer-encoding') == 'chunked':
+            body = self._read_chunked()
+        else:
+            body = self.rfile.read(int(self.headers['content-length']))
+        message = BytesParser().parsebytes(
+            b'Content-Type: ' + self.headers['content-type'].encode() +
+            b'\r\n\r\n' + body)
+        data = dict(
+            (part.get_param('name', header='content-disposition'),
+             hashlib.sha256(part.get_payload(decode=True)).hexdigest())
+            for part in message.get_payload())
+        data['chunked'] = 'content-length' not in self.headers
+        out = json.dumps({
+            'status': True,
+            'error_code': None,
+            'error_message': '',
+            'data': data,
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('content-type', 'application/json')
+        self.send_header('content-length', str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    server = _ThreadingHTTPServer(('127.0.0.1', 0), _UploadHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield 'http://127.0.0.1:{0}/api/2.0/'.format(server.server_port)
+    server.shutdown()
+    server.server_close()
+
+
+class DescribeRequestHandlerUploads:
+    content = b'0123456789' * 100000
+
+    def it_streams_files_with_a_length(self, base_url, tmpdir):
+        path = tmpdir.join('big.bin')
+        path.write_binary(self.content)
+        callback = Mock()
+        h = RequestHandler(base_url, upload_callback=callback)
+        resp = h.process_request('uber.file_add', {
+            'name': 'big',
+            'file': FileField(str(path)),
+        })
+        assert resp.data == {
+            'name': hashlib.sha256(b'big').hexdigest(),
+            'file': hashlib.sha256(self.content).hexdigest(),
+            'chunked': False,
+        }
+        sent, total = callback.call_args[0]
+        assert sent == total > len(self.content)
+        assert callback.call_count > 1
+
+    def it_streams_generators_chunked(self, base_url):
+        h = RequestHandler(base_url)
+        chunks = (self.content[i:i + 4096]
+                  for i in range(0, len(self.content), 4096))
+        resp = h.process_request('client.avatar_set', {
+            'client_id': 1,
+            'avatar': chunks,
+        })
+        assert resp.data['avatar'] == hashlib.sha256(self.content).hexdigest()
+        assert resp.data['chunked'] is True
+
+    def token_then_ok(self, bodies):
+        def post(url, data=None, **kwargs):
+            bodies.append(data.read())
+            response = Mock()
+            response.status_code = 200
+            if len(bodies) == 1:
+                response.headers = {'content-type': 'text/html'}
+                response.text = u'<html>Updating Token</html>'
+            else:
+                response.headers = {'content-type': 'application/json'}
+                response.text = u''
+                response.json.return_value = {
+                    'status': True, 'error_code': None,
+                    'error_message': '', 'data': True}
+            return response
+        session = Mock()
+        session.post.side_effect = post
+        return session
+
+    def it_sends_the_whole_file_when_retried(self, monkeypatch):
+        monkeypatch.setattr('time.sleep', lambda seconds: None)
+        bodies = []
+        h = RequestHandler('', session=self.token_then_ok(bodies))
+        assert h.process_request('uber.file_add', {
+            'name': 'big',
+            'file': io.BytesIO(self.content),
+        }).data is True
+        assert len(bodies) == 2
+        assert len(bodies[0]) == len(bodies[1])
+        assert self.content in bodies[0]
+        assert self.content in bodies[1]
+
+    def it_refuses_to_retry_generators(self, monkeypatch):
+        monkeypatch.setattr('time.sleep', lambda seconds: None)
+        bodies = []
+        h = RequestHandler('', session=self.token_then_ok(bodies))
+        with pytest.raises(ValueError):
+            h.process_request('uber.file_add', {
+                'file': (chunk for chunk in [self.content]),
+            })
+        assert len(bodies) == 1
@@ -0,0 +1,109 @@
+import threading
+
+from mock import Mock
+import pytest
+
+from ubersmith.api import RequestHandler
+from ubersmith.exceptions import ValidationError
+from ubersmith.paging import paginate
+from ubersmith.calls.order import ListCall
+from ubersmith.calls.support import TicketPostListCall
+
+
+def make_handler(total):
+    """Return a handler whose order.list has total orders."""
+    h = RequestHandler('')
+    requested = []
+
+    def send_request(method, data):
+        offset, limit = int(data['offset']), int(data['limit'])
+        requested.append(offset)
+        response = Mock()
+        response.headers = {'content-type': 'application/json'}
+        response.text = u''
+        response.json.return_value = {
+            'status': True,
+            'error_code': None,
+            'error_message': '',
+            'data': dict((str(i), {'order_id': str(i)})
+                         for i in range(offset, min(offset + limit, total))),
+        }
+        return response
+    h._send_request = Mock(side_effect=send_request)
+    h.requested = requested
+    return h
+
+
+class DescribePages:
+    @pytest.mark.parametrize('prefetch', [True, False])
+    def it_yields_every_cleaned_record(self, prefetch):
+        h = make_handler(25)
+        records = list(h.order.list.pages(limit=10, prefetch=prefetch))
+        assert [k for k, _ in records] == list(range(25))
+        assert records[3] == (3, {'order_id': 3})
+        assert h.requested == [0, 10, 20]
+
+    def it_stops_on_an_empty_page(self):
+        h = make_handler(20)
+        assert len(list(h.order.list.pages(limit=10))) == 20
+        assert h.requested == [0, 10, 20]
+
+    def it_starts_from_an_offset(self):
+        h = make_handler(25)
+        records = list(h.order.list.pages(limit=10, offset=15))
+        assert [k for k, _ in records] == list(range(15, 25))
+
+    def it_sends_other_arguments_with_every_page(self):
+        h = make_handler(15)
+        list(h.order.list.pages(limit=10, client_id=1))
+        for call in h._send_request.call_args_list:
+            assert call[0][1]['client_id'] == 1
+
+    def it_stops_when_the_limit_is_ignored(self):
+        h = make_handler(5)
+        send_request = h._send_request.side_effect
+        h._send_request.side_effect = lambda method, data: send_request(
+            method, dict(data, limit=100))
+        assert len(list(h.order.list.pages(limit=2))) == 5
+        assert h.requested == [0]
+
+    def it_stops_when_the_offset_is_ignored(self):
+        h = make_handler(25)
+        send_request = h._send_request.side_effect
+        h._send_request.side_effect = lambda method, data: send_request(
+            method, dict(data, offset=0))
+        records = list(h.order.list.pages(limit=10))
+        assert [k for k, _ in records] == list(range(10))
+        assert h.requested == [0, 0]
+
+    def it_prefetches_the_next_page(self):
+        h = make_handler(20)
+        send_request = h._send_request.side_effect
+        prefetched = threading.Event()
+
+        def notify(method, data):
+            response = send_request(method, data)
+            if data['offset'] == 10:
+                prefetched.set()
+            return response
+        h._send_request.side_effect = notify
+        pages = h.order.list.pages(limit=10)
+        next(pages)
+        # the second page arrives while the first is still being consumed
+        assert prefetched.wait(5)
+        assert len(list(pages)) == 19
+
+    def it_validates_before_requesting(self):
+        h = make_handler(0)
+        with pytest.raises(ValidationError):
+            paginate(TicketPostListCall, {}, h)
+        assert not h._send_request.called
+
+    def it_rejects_calls_without_paging(self):
+        h = make_handler(0)
+        with pytest.raises(TypeError):
+            h.client.get.pages(client_id=1)
+
+    def it_rejects_bad_limits(self):
+        with pytest.raises(ValueError):
+            paginate(ListCall, limit=0)
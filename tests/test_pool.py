@@ -0,0 +1,97 @@
+import json
+import threading
+
+from mock import Mock
+import pytest
+from six.moves import BaseHTTPServer, socketserver
+
+import ubersmith
+import ubersmith.api
+from ubersmith.api import RequestHandler
+from ubersmith.pool import PooledAdapter, PoolStats
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn,
+                           BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('content-length', 0)))
+        body = json.dumps({
+            'status': True,
+            'error_code': None,
+            'error_message': '',
+            'data': 1,
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('content-type', 'application/json')
+        self.send_header('content-length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def base_url():
+    server = _ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield 'http://127.0.0.1:{0}/api/2.0/'.format(server.server_port)
+    server.shutdown()
+    server.server_close()
+
+
+class DescribePooling:
+    def it_mounts_a_sized_pooled_adapter(self):
+        h = RequestHandler('http://ubersmith/', pool_maxsize=32,
+                           pool_block=True)
+        adapter = h.session.get_adapter(h.base_url)
+        assert isinstance(adapter, PooledAdapter)
+        assert adapter._pool_maxsize == 32
+        assert adapter._pool_block is True
+
+    def it_can_disable_keep_alive(self):
+        h = RequestHandler('http://ubersmith/', keep_alive=False)
+        assert h.session.headers['Connection'] == 'close'
+
+    def it_reuses_connections(self, base_url):
+        h = RequestHandler(base_url)
+        for _ in range(3):
+            assert h.process_request('uber.method_list').data == 1
+        assert h.pool_stats() == PoolStats(
+            pools=1, connections=1, in_use=0, idle=1, requests=3, waits=0)
+
+    def it_warms_up_connections(self, base_url):
+        h = RequestHandler(base_url, pool_maxsize=4)
+        assert h.warm_up(10) == 4
+        stats = h.pool_stats()
+        assert stats.connections == 4
+        assert stats.idle == 4
+        assert stats.in_use == 0
+        h.process_request('uber.method_list')
+        assert h.pool_stats().connections == 4
+
+    def it_stops_warming_up_on_connection_errors(self):
+        h = RequestHandler('http://127.0.0.1:1/')
+        assert h.warm_up(2) == 0
+        assert h.pool_stats().in_use == 0
+
+    def it_has_no_stats_for_provided_sessions(self):
+        h = RequestHandler('http://ubersmith/', session=Mock())
+        with pytest.raises(TypeError):
+            h.pool_stats()
+
+
+def it_warms_up_on_init(base_url):
+    try:
+        h = ubersmith.init(base_url, warm_up=2, pool_maxsize=2)
+        assert h.pool_stats().idle == 2
+    finally:
+        ubersmith.api._DEFAULT_REQUEST_HANDLER = None
@@ -0,0 +1,84 @@
+import pytest
+
+from ubersmith.calls.client import ListCall as ClientListCall
+from ubersmith.calls.device import ListCall
+from ubersmith.profiling import (
+    ProfileReport,
+    ProfilingTracer,
+    Timings,
+    profile,
+)
+from ubersmith.retry import RetryPolicy
+from ubersmith.tracing import NO_OP_TRACER, InMemoryTracer
+
+
+def devices(n):
+    return dict((str(i), {'dev': str(i), 'label': 'x' * 100})
+                for i in range(n))
+
+
+class DescribeProfilingTracer:
+    def it_attaches_timings_to_responses(self, make_handler, make_response):
+        response = make_response(devices(10))
+        h = make_handler(response, tracer=ProfilingTracer())
+        result = ListCall({}, h).render()
+        timings = result.timings
+        assert timings.method == 'device.list'
+        assert timings.bytes_received == len(response.content)
+        assert timings.peak_memory is None
+        for field in ('queue_wait', 'encode', 'network', 'decode', 'copy',
+                      'clean'):
+            assert 0 <= getattr(timings, field) <= timings.total
+
+    def it_counts_retry_waits(self, make_handler, make_response):
+        h = make_handler(make_response('', status_code=503), make_response({}),
+                         tracer=ProfilingTracer(),
+                         retry_policy=RetryPolicy(backoff=0.02, jitter=0))
+        assert ListCall({}, h).render().timings.queue_wait >= 0.02
+
+    def it_traces_peak_memory(self, make_handler, make_response):
+        h = make_handler(make_response(devices(1000)),
+                         tracer=ProfilingTracer(memory=True))
+        peak = ListCall({}, h).render().timings.peak_memory
+        assert peak > 100 * 1000
+
+    def it_passes_spans_on(self, make_handler, make_response):
+        tracer = InMemoryTracer()
+        h = make_handler(make_response({}),
+                         tracer=ProfilingTracer(tracer))
+        h.uber.method_list()
+        assert 'ubersmith.send' in [s.name for s in tracer.spans]
+
+    def it_leaves_unprofiled_responses_alone(self, make_handler,
+                                             make_response):
+        h = make_handler(make_response({}))
+        assert ListCall({}, h).render().timings is None
+
+
+class DescribeProfile:
+    def it_reports_calls_in_the_block(self, make_handler, make_response):
+        h = make_handler(make_response(devices(10)), make_response({}),
+                         make_response({}))
+        with profile(h) as report:
+            ListCall({}, h).render()
+            ListCall({'client_id': 1}, h).render()
+            ClientListCall({}, h).render()
+        assert h.tracer is NO_OP_TRACER
+        assert [t.method for t in report.timings] == [
+            'device.list', 'device.list', 'client.list']
+        summary = report.summary(sort_by='calls')
+        assert [(p.method, p.calls) for p in summary] == [
+            ('device.list', 2), ('client.list', 1)]
+        assert summary[0].total == pytest.approx(
+            sum(t.total for t in report.timings[:2]))
+
+    def it_renders_a_table(self):
+        report = ProfileReport()
+        report.add(Timings('client.get', 0.5, 0, 0, 0.4, 100, 0.05, 0.01,
+                           0.04, None))
+        report.add(Timings('device.list', 2.0, 0, 0, 1.0, 9000, 0.5, 0.2,
+                           0.3, 2048))
+        lines = report.render().splitlines()
+        assert lines[0].split()[:3] == ['method', 'calls', 'total']
+        assert lines[1].split()[:3] == ['device.list', '1', '2000.0']
+        assert lines[2].split()[-1] == '-'
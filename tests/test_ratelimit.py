@@ -0,0 +1,102 @@
+import threading
+
+from mock import Mock, patch
+import pytest
+
+from ubersmith import ratelimit
+from ubersmith.api import RequestHandler
+from ubersmith.exceptions import RateLimitExceeded
+from ubersmith.ratelimit import RateLimiter, TokenBucket
+
+
+@pytest.fixture
+def clock():
+    with patch.object(ratelimit, 'time') as time:
+        time.time.return_value = 1000.0
+        time.sleep.side_effect = lambda seconds: setattr(
+            time.time, 'return_value', time.time.return_value + seconds)
+        yield time
+
+
+class DescribeTokenBucket:
+    def it_refills_at_rate_up_to_burst(self, clock):
+        bucket = TokenBucket(2, burst=4)
+        for _ in range(4):
+            assert bucket.wait_time(1000.0) == 0
+            bucket.take()
+        assert bucket.wait_time(1000.0) == 0.5
+        assert bucket.wait_time(1000.5) == 0
+        assert bucket.wait_time(1010.0) == 0
+        assert bucket.tokens == 4
+
+    def it_rejects_non_positive_rates(self):
+        with pytest.raises(ValueError):
+            TokenBucket(0)
+
+
+class DescribeRateLimiter:
+    def it_waits_for_the_global_budget(self, clock):
+        limiter = RateLimiter(rate=2, burst=1)
+        assert limiter.acquire('client.get') == 0
+        assert limiter.acquire('uber.method_list') == 0.5
+        assert limiter.acquire('uber.method_list') == 0.5
+        assert clock.time.return_value == 1001.0
+
+    def it_queues_reservations(self, clock):
+        limiter = RateLimiter(rate=1, burst=1)
+        assert [limiter.reserve('client.get') for _ in range(3)] == [0, 1, 2]
+
+    def it_limits_namespaces_and_kinds(self, clock):
+        limiter = RateLimiter(limits={
+            'client:write': 1,
+            'uber': 10,
+            'device.reboot': (1, 2),
+        })
+        assert limiter.reserve('client.update') == 0
+        assert limiter.reserve('client.update') == 1
+        # reads don't share the write budget
+        assert limiter.reserve('client.get') == 0
+        assert limiter.reserve('client.get') == 0
+        assert limiter.reserve('uber.method_list') == 0
+        assert limiter.reserve('device.reboot') == 0
+        assert limiter.reserve('device.reboot') == 0
+        assert limiter.reserve('device.reboot') == 1
+
+    def it_raises_when_not_blocking(self, clock):
+        limiter = RateLimiter(rate=1, block=False)
+        limiter.acquire('client.get')
+        with pytest.raises(RateLimitExceeded) as e:
+            limiter.acquire('client.get')
+        assert e.value.retry_after == 1
+        clock.time.return_value += 1
+        limiter.acquire('client.get')
+
+    def it_raises_past_max_wait(self, clock):
+        limiter = RateLimiter(rate=1, max_wait=1.5)
+        limiter.reserve('client.get')
+        limiter.reserve('client.get')
+        with pytest.raises(RateLimitExceeded):
+            limiter.reserve('client.get')
+
+    def it_is_thread_safe(self, clock):
+        limiter = RateLimiter(rate=1, burst=1)
+        waits = []
+
+        def reserve():
+            for _ in range(50):
+                waits.append(limiter.reserve('client.get'))
+        threads = [threading.Thread(target=reserve) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert sorted(waits) == list(range(200))
+
+
+def test_handler_acquires_before_sending():
+    limiter = Mock()
+    h = RequestHandler('', rate_limiter=limiter)
+    h._send_request = Mock(side_effect=KeyError)
+    with pytest.raises(KeyError):
+        h.process_request('client.get')
+    limiter.acquire.assert_called_once_with('client.get')
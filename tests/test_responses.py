@@ -1,7 +1,17 @@
+import hashlib
+import io
+import json
+
 from mock import Mock
 import pytest
 
-from ubersmith.api import DictResponse, IntResponse
+from ubersmith.api import (
+    BaseResponse,
+    DictResponse,
+    FileResponse,
+    IntResponse,
+    SavedFile,
+)
 
 
 class DescribeDictResponse:
@@ -219,3 +229,70 @@ class DescribeIntResponse:
 
     def it_has_bit_length(self, response):
         assert response.bit_length() == 4
+
+
+class DescribeBaseResponse:
+    def it_decodes_json_once(self):
+        resp = Mock()
+        resp.json.return_value = {'data': {'key': 'value'}}
+        response = DictResponse(resp)
+        assert response.json is response.json
+        assert response['key'] == 'value'
+        assert resp.json.call_count == 1
+
+    def it_decodes_with_a_decoder(self):
+        resp = Mock()
+        resp.content = b'{"data": 1}'
+        decoder = Mock(side_effect=json.loads)
+        response = IntResponse(resp, decoder)
+        assert response == 1
+        assert response + 1 == 2
+        decoder.assert_called_once_with(b'{"data": 1}')
+        assert not resp.json.called
+
+    def it_keeps_decoded_json_when_cleaned(self):
+        resp = Mock()
+        resp.json.return_value = {'data': '1'}
+        response = BaseResponse(resp)
+        response.json
+        cleaned = IntResponse.from_cleaned(response, 1)
+        assert cleaned.json is response.json
+        assert resp.json.call_count == 1
+
+
+class DescribeFileResponse:
+    @pytest.fixture
+    def response(self):
+        resp = Mock()
+        resp.headers = {'content-disposition': 'inline; filename="doc.pdf"'}
+        resp.iter_content.side_effect = lambda n: iter(
+            [b'%PDF', b'', b'-1.4', b'\n'])
+        return FileResponse(resp)
+
+    def it_iterates_chunks(self, response):
+        assert list(response.iter_chunks(4)) == [b'%PDF', b'-1.4', b'\n']
+        response.response.iter_content.assert_called_once_with(4)
+        assert response.response.close.called
+
+    def it_saves_to_paths(self, response, tmpdir):
+        path = str(tmpdir.join(response.filename))
+        saved = response.save_to(path, checksum='sha256')
+        assert saved == SavedFile(
+            9, hashlib.sha256(b'%PDF-1.4\n').hexdigest())
+        with open(path, 'rb') as f:
+            assert f.read() == b'%PDF-1.4\n'
+
+    def it_saves_to_file_objects(self, response):
+        f = io.BytesIO()
+        assert response.save_to(f) == SavedFile(9, None)
+        assert f.getvalue() == b'%PDF-1.4\n'
+
+    def it_removes_partial_files(self, response, tmpdir):
+        def chunks(n):
+            yield b'%PDF'
+            raise IOError('connection lost')
+        response.response.iter_content.side_effect = chunks
+        path = str(tmpdir.join('doc.pdf'))
+        with pytest.raises(IOError):
+            response.save_to(path)
+        assert not tmpdir.join('doc.pdf').check()
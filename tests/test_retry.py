@@ -0,0 +1,137 @@
+from mock import patch
+import pytest
+import requests
+
+from ubersmith import api, retry
+from ubersmith.api import READ_METHODS
+from ubersmith.calls import BaseCall
+from ubersmith.exceptions import (
+    MaintenanceResponse,
+    ResponseError,
+    ServerErrorResponse,
+    UpdatingTokenResponse,
+)
+from ubersmith.retry import NO_RETRY, RetryPolicy
+
+
+class DescribeRetryPolicy:
+    def it_classifies_failures(self):
+        policy = RetryPolicy()
+        assert policy.classify(UpdatingTokenResponse()) == 'token'
+        assert policy.classify(MaintenanceResponse()) == 'maintenance'
+        assert policy.classify(
+            ServerErrorResponse(status_code=502)) == 'server_error'
+        assert policy.classify(ServerErrorResponse(status_code=501)) is None
+        assert policy.classify(requests.ConnectTimeout()) == 'connect_timeout'
+        assert policy.classify(requests.ReadTimeout()) == 'timeout'
+        assert policy.classify(requests.ConnectionError()) == 'connection'
+        assert policy.classify(ResponseError()) is None
+        assert policy.classify(ValueError()) is None
+
+    def it_classifies_extra_exceptions(self):
+        policy = RetryPolicy(exceptions=[ValueError])
+        assert policy.classify(ValueError()) == 'exception'
+
+    def it_backs_off_exponentially(self):
+        policy = RetryPolicy(backoff=1, multiplier=3, max_backoff=5, jitter=0)
+        assert [policy.delay('timeout', i) for i in (1, 2, 3)] == [1, 3, 5]
+
+    def it_backs_off_per_kind(self):
+        policy = RetryPolicy(backoff=1, jitter=0, backoffs={'token': 2})
+        assert policy.delay('token', 1) == 2
+        assert policy.delay('timeout', 1) == 1
+
+    def it_jitters(self):
+        policy = RetryPolicy(backoff=1, jitter=0.5)
+        delays = set(policy.delay('timeout', 1) for _ in range(20))
+        assert len(delays) > 1
+        assert all(0.5 <= d <= 1 for d in delays)
+
+    def it_only_retries_safe_methods_after_delivery(self):
+        policy = RetryPolicy()
+        assert policy.should_retry('timeout', 'client.get')
+        assert not policy.should_retry('timeout', 'client.update')
+        assert policy.should_retry('token', 'client.update')
+        assert policy.should_retry('connect_timeout', 'client.update')
+
+    def it_does_not_retry_maintenance_by_default(self):
+        assert not RetryPolicy().should_retry('maintenance', 'client.get')
+        assert RetryPolicy(maintenance=True).should_retry(
+            'maintenance', 'client.get')
+
+    def it_accepts_safe_methods(self):
+        policy = RetryPolicy(safe_methods=['client.update'])
+        assert policy.should_retry('timeout', 'client.update')
+        assert not policy.should_retry('timeout', 'client.get')
+
+    def it_gives_up_after_max_attempts(self):
+        state = RetryPolicy(max_attempts=3).start('client.get')
+        error = requests.ReadTimeout()
+        assert state.backoff(error) is not None
+        assert state.backoff(error) is not None
+        assert state.backoff(error) is None
+        assert state.retries == 2
+
+    def it_gives_up_past_the_elapsed_budget(self):
+        state = RetryPolicy(max_elapsed=10, jitter=0).start('client.get')
+        with patch.object(retry, 'time') as time:
+            time.time.return_value = state.started + 9.8
+            assert state.backoff(requests.ReadTimeout()) is None
+
+
+def test_read_methods():
+    assert 'client.get' in READ_METHODS
+    assert 'uber.documentation' in READ_METHODS
+    assert 'client.update' not in READ_METHODS
+    assert 'order.create' not in READ_METHODS
+
+
+class DescribeRequestHandlerRetries:
+    @pytest.fixture
+    def sleeps(self):
+        sleeps = []
+        with patch.object(api, 'time') as time:
+            time.sleep = sleeps.append
+            yield sleeps
+
+    def it_retries_server_errors_for_read_methods(self, sleeps, make_handler,
+                                                  make_response):
+        h = make_handler(make_response(status_code=502),
+                         make_response(status_code=503), make_response(),
+                         retry_policy=RetryPolicy(jitter=0))
+        assert h.process_request('client.get').data == 'ok'
+        assert sleeps == [0.5, 1.0]
+
+    def it_raises_server_errors_for_write_methods(self, sleeps, make_handler,
+                                                  make_response):
+        h = make_handler(make_response(status_code=502), make_response())
+        with pytest.raises(ServerErrorResponse) as e:
+            h.process_request('client.update')
+        assert e.value.status_code == 502
+        assert sleeps == []
+
+    def it_retries_connection_errors(self, sleeps, make_handler,
+                                     make_response):
+        h = make_handler(requests.ConnectionError(), make_response())
+        assert h.process_request('device.list').data == 'ok'
+        assert len(sleeps) == 1
+
+    def it_retries_updating_token_for_write_methods(self, sleeps,
+                                                    make_handler,
+                                                    make_response):
+        token = make_response(content_type='text/html',
+                              content=u'Updating Token')
+        h = make_handler(token, make_response())
+        assert h.process_request('client.update').data == 'ok'
+        assert len(sleeps) == 1
+
+    def it_uses_the_call_classes_policy(self, sleeps, make_handler,
+                                        make_response):
+        class NoRetryCall(BaseCall):
+            method = 'client.get'
+            retry_policy = NO_RETRY
+
+        h = make_handler(make_response(status_code=502), make_response())
+        with pytest.raises(ServerErrorResponse):
+            NoRetryCall({}, h).render()
+        assert sleeps == []
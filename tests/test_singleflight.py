@@ -0,0 +1,143 @@
+import threading
+
+from mock import Mock
+import pytest
+
+from ubersmith.api import RequestHandler
+from ubersmith.singleflight import CoalesceStats, SingleFlight
+
+
+class DescribeSingleFlight:
+    def it_shares_the_leaders_result(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def func():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return 'result'
+
+        results = []
+        leader = threading.Thread(
+            target=lambda: results.append(flight.do('key', func)))
+        leader.start()
+        started.wait()
+        followers = [threading.Thread(
+            target=lambda: results.append(flight.do('key', func)))
+            for _ in range(3)]
+        for t in followers:
+            t.start()
+        while flight.stats().coalesced < 3:
+            pass
+        release.set()
+        for t in [leader] + followers:
+            t.join()
+        assert results == ['result'] * 4
+        assert len(calls) == 1
+        assert flight.stats() == CoalesceStats(1, 3, 0)
+
+    def it_shares_the_leaders_exception(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def func():
+            started.set()
+            release.wait()
+            raise KeyError('boom')
+
+        errors = []
+
+        def do():
+            try:
+                flight.do('key', func)
+            except KeyError as e:
+                errors.append(e)
+        threads = [threading.Thread(target=do)]
+        threads[0].start()
+        started.wait()
+        threads.append(threading.Thread(target=do))
+        threads[1].start()
+        while flight.stats().coalesced < 1:
+            pass
+        release.set()
+        for t in threads:
+            t.join()
+        assert len(errors) == 2
+        assert errors[0] is errors[1]
+
+    def it_does_not_share_finished_calls(self):
+        flight = SingleFlight()
+        assert flight.do('key', lambda: 1) == 1
+        assert flight.do('key', lambda: 2) == 2
+        assert flight.stats() == CoalesceStats(2, 0, 0)
+
+
+class DescribeRequestHandlerCoalescing:
+    @pytest.fixture
+    def handler(self):
+        h = RequestHandler('', coalesce=True)
+        release = threading.Event()
+
+        def send_request(method, data):
+            release.wait()
+            response = Mock()
+            response.headers = {'content-type': 'application/json'}
+            response.text = u''
+            response.json.return_value = {
+                'status': True,
+                'error_code': None,
+                'error_message': '',
+                'data': {'clientid': '1', 'method': method},
+            }
+            h.responses.append(response)
+            return response
+        h.responses = []
+        h._send_request = Mock(side_effect=send_request)
+        h.release = release
+        return h
+
+    def run_concurrently(self, handler, funcs):
+        results = [None] * len(funcs)
+
+        def run(i):
+            results[i] = funcs[i]()
+        threads = [threading.Thread(target=run, args=(i,))
+                   for i in range(len(funcs))]
+        for t in threads:
+            t.start()
+        while handler._send_request.call_count < 1 or \
+                handler.single_flight.stats().coalesced < len(funcs) - 1:
+            pass
+        handler.release.set()
+        for t in threads:
+            t.join()
+        return results
+
+    def it_coalesces_identical_reads(self, handler):
+        results = self.run_concurrently(handler, [
+            lambda: handler.client.get(client_id=1),
+            lambda: handler.client.get(client_id='1'),
+            lambda: handler.client.get(client_id=1),
+        ])
+        assert handler._send_request.call_count == 1
+        assert results[0] == {'clientid': 1, 'method': 'client.get'}
+        assert results[0] == results[1] == results[2]
+        # callers get independent copies
+        results[0]['clientid'] = 2
+        assert results[1]['clientid'] == 1
+        # only followers decode the shared response again
+        assert handler.responses[0].json.call_count == 3
+
+    def it_does_not_coalesce_writes(self, handler):
+        handler.release.set()
+        handler.client.update(client_id=1)
+        handler.client.update(client_id=1)
+        assert handler._send_request.call_count == 2
+        assert handler.single_flight.stats().leaders == 0
+
+    def it_is_disabled_by_default(self):
+        assert RequestHandler('').single_flight is None
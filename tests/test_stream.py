@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+import json
+
+from mock import Mock
+import pytest
+
+from ubersmith.api import RequestHandler
+from ubersmith.exceptions import MaintenanceResponse, ResponseError
+from ubersmith.stream import ResponseStream
+
+
+def chunked(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+def body(data, **envelope):
+    resp_json = {
+        'status': True,
+        'error_code': None,
+        'error_message': '',
+    }
+    resp_json.update(envelope)
+    # data comes last like it does from ubersmith
+    text = json.dumps(resp_json)[:-1] + ', "data": ' + json.dumps(data) + '}'
+    return text.encode('utf-8')
+
+
+class DescribeResponseStream:
+    @pytest.mark.parametrize('size', [1, 2, 7, 1024])
+    def it_yields_items_across_chunks(self, size):
+        data = dict((str(i), {'name': u'cliënt {0}'.format(i), 'n': i * 1001})
+                    for i in range(20))
+        stream = ResponseStream(chunked(body(data), size))
+        assert stream.read_envelope() == {
+            'status': True,
+            'error_code': None,
+            'error_message': '',
+        }
+        assert list(stream) == sorted(data.items(), key=lambda i: int(i[0]))
+
+    @pytest.mark.parametrize('size', [1, 2, 3])
+    def it_yields_numbers_split_across_chunks(self, size):
+        data = [1.5, -2.25e10, 3E-2, 10, -7, 0.125]
+        stream = ResponseStream(chunked(json.dumps({'data': data}).encode(),
+                                        size))
+        assert list(stream) == list(enumerate(data))
+
+    def it_yields_array_items_with_indexes(self):
+        stream = ResponseStream([b'{"data": [10, 20, 30]}'])
+        assert list(stream) == [(0, 10), (1, 20), (2, 30)]
+
+    def it_collects_members_after_the_data(self):
+        stream = ResponseStream(chunked(
+            b'{"data": {"1": 1}, "status": true, "total": 12345}', 3))
+        assert stream.read_envelope() == {}
+        assert list(stream) == [('1', 1)]
+        assert stream.envelope == {'status': True, 'total': 12345}
+
+    def it_does_not_stream_scalar_data(self):
+        stream = ResponseStream([b'{"status": false, "data": ""}'])
+        assert list(stream) == []
+        assert stream.envelope == {'status': False, 'data': ''}
+
+    def it_handles_empty_data(self):
+        assert list(ResponseStream([b'{"data": {}}'])) == []
+        assert list(ResponseStream([b' { } '])) == []
+
+    def it_raises_on_truncated_bodies(self):
+        stream = ResponseStream([b'{"data": {"1": {"a": 1}, "2": {"a"'])
+        with pytest.raises(ValueError):
+            list(stream)
+
+    def it_raises_on_bodies_that_are_not_objects(self):
+        with pytest.raises(ValueError):
+            ResponseStream([b'[1, 2]']).read_envelope()
+
+
+class DescribeFedResponseStream:
+    @pytest.mark.parametrize('size', [1, 2, 7, 1024])
+    def it_yields_items_as_chunks_are_fed(self, size):
+        data = dict((str(i), {'name': u'cliënt {0}'.format(i), 'n': i * 1001})
+                    for i in range(20))
+        stream = ResponseStream(None)
+        envelope, items = None, []
+        for chunk in chunked(body(data, total=20), size):
+            stream.feed(chunk)
+            if envelope is None:
+                envelope = stream.try_read_envelope()
+            items.extend(stream.parsed())
+        # done at the closing brace, without waiting for the end
+        assert stream.done
+        assert envelope['status'] is True
+        assert items == sorted(data.items(), key=lambda i: int(i[0]))
+        assert stream.envelope['total'] == 20
+
+    def it_waits_for_numbers_that_may_continue(self):
+        stream = ResponseStream(None)
+        stream.feed(b'{"data": [12')
+        assert list(stream.parsed()) == []
+        stream.feed(b'34, 5')
+        assert list(stream.parsed()) == [(0, 1234)]
+        stream.feed(b']}')
+        assert list(stream.parsed()) == [(1, 5)]
+        assert stream.done
+
+    @pytest.mark.parametrize('size', [1, 2, 3])
+    def it_yields_numbers_split_across_fed_chunks(self, size):
+        data = [1.5, -2.25e10, 3E-2, 10, -7, 0.125]
+        stream = ResponseStream(None)
+        items = []
+        for chunk in chunked(json.dumps({'data': data}).encode(), size):
+            stream.feed(chunk)
+            items.extend(stream.parsed())
+        assert stream.done
+        assert items == list(enumerate(data))
+
+    def it_raises_on_truncated_bodies(self):
+        stream = ResponseStream(None)
+        stream.feed(b'{"data": {"1": {"a": 1}, "2": {"a"')
+        assert list(stream.parsed()) == [('1', {'a': 1})]
+        stream.feed_eof()
+        with pytest.raises(ValueError):
+            list(stream.parsed())
+
+
+class DescribeRequestHandlerStreaming:
+    def it_streams_cleaned_items(self, make_response):
+        h = RequestHandler('')
+        response = make_response(content=body({
+            '1': {'clientid': '1', 'active': '1', 'balance': '1,000.50'},
+            '2': {'clientid': '2', 'active': '0', 'balance': ''},
+        }))
+        response.close = Mock()
+        h._send_request = Mock(return_value=response)
+        items = h.client.list.iter()
+        assert next(items) == (1, {
+            'clientid': 1, 'active': True, 'balance': 1000.5})
+        assert next(items)[0] == 2
+        with pytest.raises(StopIteration):
+            next(items)
+        h._send_request.assert_called_once_with('client.list', {},
+                                                stream=True)
+        assert response.close.called
+
+    def it_streams_generic_calls(self, make_response):
+        h = RequestHandler('')
+        h._send_request = Mock(return_value=make_response(
+            content=body({'1': {'subject': 'help'}})))
+        assert list(h.support.ticket_list.iter()) == [
+            ('1', {'subject': 'help'})]
+
+    def it_raises_errors_before_streaming(self, make_response):
+        h = RequestHandler('')
+        response = make_response(content=body(
+            '', status=False, error_code=1, error_message='We are currently '
+            'undergoing maintenance, please check back shortly.'))
+        response.close = Mock()
+        h._send_request = Mock(return_value=response)
+        with pytest.raises(MaintenanceResponse):
+            h.client.list.iter()
+        assert response.close.called
+
+    def it_raises_errors_after_the_data(self, make_response):
+        h = RequestHandler('')
+        h._send_request = Mock(return_value=make_response(
+            content=b'{"data": {"1": {}}, "status": false, "error_code": 5}'))
+        items = h.stream_request('client.list')
+        assert next(items) == ('1', {})
+        with pytest.raises(ResponseError):
+            next(items)
+
+    def it_only_streams_json(self, make_response):
+        h = RequestHandler('')
+        h._send_request = Mock(return_value=make_response(
+            content_type='application/pdf', content=b'%PDF'))
+        with pytest.raises(ResponseError):
+            h.stream_request('client.invoice_get', {'invoice_id': 1})
+
+    def it_rejects_cleaners_that_need_the_whole_response(self,
+                                                         make_response):
+        h = RequestHandler('')
+        h._send_request = Mock(return_value=make_response(content=body(1)))
+        with pytest.raises(TypeError):
+            h.client.invoice_count.iter(client_id=1)
+        assert not h._send_request.called
@@ -0,0 +1,159 @@
+import datetime
+
+from mock import Mock
+import pytest
+
+from ubersmith.api import RequestHandler
+from ubersmith.sync import ChangeSet, SyncEngine, SyncSource
+
+
+class FakeTickets(object):
+    """Serves support.ticket_list from a dict, filtering by begin."""
+
+    def __init__(self):
+        self.tickets = {}
+        self.requests = []
+
+    def add(self, ticket_id, timestamp, subject='Server Question'):
+        self.tickets[str(ticket_id)] = {
+            'ticket_id': str(ticket_id),
+            'timestamp': str(timestamp),
+            'subject': subject,
+        }
+
+    def send_request(self, method, data):
+        self.requests.append(dict(data))
+        tickets = sorted(
+            (t for t in self.tickets.values()
+             if int(t['timestamp']) > int(data.get('begin', 0))),
+            key=lambda t: int(t['ticket_id']))
+        page = tickets[int(data['offset']):][:int(data['limit'])]
+        response = Mock()
+        response.headers = {'content-type': 'application/json'}
+        response.text = u''
+        response.json.return_value = {
+            'status': True,
+            'error_code': None,
+            'error_message': '',
+            'data': dict((t['ticket_id'], dict(t)) for t in page),
+        }
+        return response
+
+
+@pytest.fixture
+def fake():
+    fake = FakeTickets()
+    fake.add(1, 100)
+    fake.add(2, 200)
+    return fake
+
+
+def make_engine(fake, **kwargs):
+    h = RequestHandler('')
+    h._send_request = fake.send_request
+    sink = Mock()
+    sources = {'tickets': SyncSource('support.ticket_list', 'timestamp',
+                                     'begin', {'type': 'ClientAll'})}
+    return SyncEngine(sink, sources, h, **kwargs), sink
+
+
+class DescribeSyncEngine:
+    def it_inserts_everything_at_first(self, fake):
+        engine, sink = make_engine(fake)
+        changes, = engine.sync()
+        assert sorted(changes.inserted) == ['1', '2']
+        assert changes.full
+        sink.assert_called_once_with(changes)
+        assert engine.mark('tickets') == 200
+        assert fake.requests[0]['type'] == 'ClientAll'
+        assert 'begin' not in fake.requests[0]
+
+    def it_fetches_past_the_mark(self, fake):
+        engine, sink = make_engine(fake)
+        engine.sync()
+        fake.add(3, 300)
+        changes, = engine.sync()
+        assert fake.requests[-1]['begin'] == 199
+        assert list(changes.inserted) == ['3']
+        assert not changes.updated and not changes.full
+        assert engine.mark('tickets') == 300
+
+    def it_skips_the_sink_without_changes(self, fake):
+        engine, sink = make_engine(fake)
+        engine.sync()
+        changes, = engine.sync()
+        assert not changes.changed
+        assert sink.call_count == 1
+
+    def it_detects_updates_and_deletions_on_full_syncs(self, fake):
+        engine, sink = make_engine(fake, full_every=2)
+        engine.sync()
+        fake.add(1, 100, subject='Re: Server Question')
+        del fake.tickets['2']
+        changes, = engine.sync()
+        assert changes == ChangeSet('tickets', {}, {
+            '1': fake.tickets['1'],
+        }, ['2'], True)
+        assert 'begin' not in fake.requests[-1]
+
+    def it_compares_hashes_without_a_filter(self, fake):
+        engine, sink = make_engine(fake)
+        engine.sources['tickets'] = SyncSource('support.ticket_list')
+        engine.sync()
+        fake.add(2, 200, subject='Changed')
+        changes, = engine.sync()
+        assert list(changes.updated) == ['2']
+        assert changes.full
+        assert engine.mark('tickets') is None
+
+    def it_keeps_state_between_runs(self, fake, tmpdir):
+        path = str(tmpdir.join('state.json'))
+        make_engine(fake, state_path=path)[0].sync()
+        fake.add(3, 300)
+        engine, sink = make_engine(fake, state_path=path)
+        changes, = engine.sync()
+        assert list(changes.inserted) == ['3']
+        assert fake.requests[-1]['begin'] == 199
+
+    def it_emits_changes_again_if_the_sink_fails(self, fake):
+        engine, sink = make_engine(fake)
+        sink.side_effect = IOError
+        with pytest.raises(IOError):
+            engine.sync()
+        sink.side_effect = None
+        changes, = engine.sync()
+        assert sorted(changes.inserted) == ['1', '2']
+
+    def it_syncs_cleaned_records(self):
+        h = RequestHandler('')
+        response = Mock()
+        response.headers = {'content-type': 'application/json'}
+        response.text = u''
+        response.json.return_value = {
+            'status': True, 'error_code': None, 'error_message': '',
+            'data': {'1280': {'order_id': '1280', 'ts': '1312304618',
+                              'total': '1.50'}},
+        }
+        h._send_request = Mock(return_value=response)
+        engine = SyncEngine(Mock(), request_handler=h)
+        changes = engine.sync_source('orders')
+        assert changes.inserted[1280]['order_id'] == 1280
+        assert engine.mark('orders') == 1312304618
+
+    def it_syncs_lazily_cleaned_records_as_dicts(self):
+        h = RequestHandler('', lazy=True)
+        response = Mock()
+        response.headers = {'content-type': 'application/json'}
+        response.text = u''
+        response.json.return_value = {
+            'status': True, 'error_code': None, 'error_message': '',
+            'data': {'1280': {'order_id': '1280', 'ts': '1312304618',
+                              'total': '1.50'}},
+        }
+        h._send_request = Mock(return_value=response)
+        engine = SyncEngine(Mock(), request_handler=h)
+        changes = engine.sync_source('orders')
+        assert type(changes.inserted[1280]) is dict
+        assert changes.inserted[1280]['ts'] == \
+            datetime.datetime.fromtimestamp(1312304618)
+        assert not engine.sync_source('orders').changed
@@ -0,0 +1,120 @@
+import time
+
+import pytest
+import requests
+
+from ubersmith.api import RequestHandler
+from ubersmith.calls.client import GetCall, ListCall
+from ubersmith.exceptions import (
+    MaintenanceResponse,
+    ResponseError,
+    ServerErrorResponse,
+    UpdatingTokenResponse,
+)
+from ubersmith.retry import RetryPolicy
+from ubersmith.testing import FakeList, FakeUbersmith
+
+
+@pytest.fixture
+def server():
+    with FakeUbersmith(clients=25, devices=10, orders=5) as server:
+        yield server
+
+
+@pytest.fixture
+def handler(server):
+    return RequestHandler(server.url,
+                          retry_policy=RetryPolicy(max_attempts=1))
+
+
+class DescribeFakeUbersmith:
+    def it_serves_generated_records(self, handler):
+        client = GetCall({'client_id': 3}, handler).render()
+        assert client['clientid'] == 3
+        assert client['email'] == 'client3@example.com'
+        assert handler.process_request('client.count').data == 25
+        order = handler.process_request('order.get', {'order_id': 5}).data
+        assert len(order['progress']) == 5
+
+    def it_pages_lists(self, handler):
+        clients = ListCall({'offset': 20, 'limit': 10}, handler).render()
+        assert sorted(clients) == [21, 22, 23, 24, 25]
+        orders = handler.process_request('order.list').data
+        assert sorted(orders) == ['1', '2', '3', '4', '5']
+        assert 'progress' not in orders['1']
+
+    def it_streams_lists(self, handler):
+        devices = list(handler.stream_request('device.list'))
+        assert [key for key, _ in devices] == [str(i) for i in range(1, 11)]
+        assert devices[0][1]['clientid'] == '2'
+
+    def it_reports_ubersmith_errors(self, handler):
+        with pytest.raises(ResponseError) as e:
+            handler.process_request('client.get', {'client_id': 26})
+        assert e.value.error_message == 'Invalid client_id specified.'
+        with pytest.raises(ResponseError) as e:
+            handler.process_request('support.ticket_list')
+        assert e.value.error_code == 3
+
+    def it_serves_extra_methods(self):
+        methods = {
+            'client.service_list': lambda args: FakeList(
+                3, lambda i: (str(i), {'packid': str(i),
+                                       'clientid': args['client_id']})),
+        }
+        with FakeUbersmith(methods=methods) as server:
+            h = RequestHandler(server.url)
+            services = h.process_request('client.service_list',
+                                         {'client_id': 1001}).data
+        assert services['2'] == {'packid': '2', 'clientid': '1001'}
+
+    def it_injects_faults(self, server, handler):
+        server.inject('token')
+        server.inject('maintenance')
+        server.inject('error', 2)
+        with pytest.raises(UpdatingTokenResponse):
+            handler.process_request('client.count')
+        with pytest.raises(MaintenanceResponse):
+            handler.process_request('client.count')
+        with pytest.raises(ServerErrorResponse) as e:
+            handler.process_request('client.count')
+        assert e.value.status_code == 500
+        server.error_status = 503
+        with pytest.raises(ServerErrorResponse) as e:
+            handler.process_request('client.count')
+        assert e.value.status_code == 503
+        assert handler.process_request('client.count').data == 25
+        assert server.faults == {'token': 1, 'maintenance': 1, 'error': 2}
+        assert server.calls == {'client.count': 5}
+        with pytest.raises(ValueError):
+            server.inject('timeout')
+
+    def it_injects_faults_at_rates(self):
+        with FakeUbersmith(token_rate=0.5, seed=1) as server:
+            h = RequestHandler(server.url,
+                               retry_policy=RetryPolicy(max_attempts=1))
+            for _ in range(40):
+                try:
+                    h.process_request('client.count')
+                except UpdatingTokenResponse:
+                    pass
+        assert 5 < server.faults['token'] < 35
+
+    def it_adds_latency(self, server, handler):
+        server.latency = 0.1
+        started = time.time()
+        handler.process_request('client.count')
+        assert time.time() - started >= 0.1
+
+    def it_requires_auth(self):
+        with FakeUbersmith(username='admin', password='secret') as server:
+            h = RequestHandler(server.url, 'admin', 'secret')
+            assert h.process_request('uber.check_login').data is True
+            response = requests.post(server.url + '?method=client.count')
+        assert response.status_code == 401
+
+    def it_stops(self, server):
+        server.stop()
+        with pytest.raises(requests.ConnectionError):
+            requests.post(server.url + '?method=client.count')
+        server.stop()
@@ -0,0 +1,77 @@
+import pytest
+
+from ubersmith.calls.device import ListCall
+from ubersmith.calls.support import TicketPostListCall
+from ubersmith.exceptions import ResponseError, ValidationError
+from ubersmith.tracing import NO_OP_TRACER, InMemoryTracer
+
+
+@pytest.fixture
+def tracer():
+    return InMemoryTracer()
+
+
+class DescribeInMemoryTracer:
+    def it_nests_spans(self, tracer):
+        with tracer.start_as_current_span('outer', {'a': 1}) as outer:
+            outer.set_attribute('b', 2)
+            with tracer.start_as_current_span('inner'):
+                pass
+        inner, outer = tracer.spans
+        assert inner.parent_id == outer.span_id
+        assert outer.parent_id is None
+        assert outer.attributes == {'a': 1, 'b': 2}
+        assert tracer.children(outer) == [inner]
+        assert outer.duration >= inner.duration >= 0
+
+    def it_records_errors(self, tracer):
+        with pytest.raises(ValueError):
+            with tracer.start_as_current_span('failing'):
+                raise ValueError
+        span, = tracer.find('failing')
+        assert isinstance(span.error, ValueError)
+
+    def it_clears(self, tracer):
+        with tracer.start_as_current_span('span'):
+            pass
+        tracer.clear()
+        assert tracer.spans == []
+
+
+class DescribeNoOpTracer:
+    def it_records_nothing(self):
+        with NO_OP_TRACER.start_as_current_span('span') as span:
+            span.set_attribute('a', 1)
+            span.record_exception(ValueError())
+
+
+class DescribeCallTracing:
+    def it_traces_every_phase(self, tracer, make_handler, make_response):
+        h = make_handler(make_response({'22': {'dev': '22'}}), tracer=tracer)
+        ListCall({'client_id': 1}, h).render()
+        call, = tracer.find('ubersmith.call')
+        assert [s.name for s in tracer.children(call)] == [
+            'ubersmith.validate', 'ubersmith.request', 'ubersmith.clean']
+        request, = tracer.find('ubersmith.request')
+        assert [s.name for s in tracer.children(request)] == [
+            'ubersmith.encode', 'ubersmith.send', 'ubersmith.decode']
+        clean, = tracer.find('ubersmith.clean')
+        assert tracer.children(clean) == []
+        assert set(s.attributes['ubersmith.method'] for s in tracer.spans) \
+            == set(['device.list'])
+
+    def it_traces_failed_calls(self, tracer, make_handler, make_response):
+        h = make_handler(make_response('', status=False, error_code=2,
+                                       error_message='Invalid device_id'),
+                         tracer=tracer)
+        with pytest.raises(ResponseError):
+            ListCall({}, h).render()
+        for name in 'ubersmith.call', 'ubersmith.request', 'ubersmith.decode':
+            assert isinstance(tracer.find(name)[0].error, ResponseError)
+
+    def it_traces_invalid_calls(self, tracer, make_handler):
+        h = make_handler(tracer=tracer)
+        with pytest.raises(ValidationError):
+            TicketPostListCall({}, h).render()
+        assert [s.name for s in tracer.spans] == [
+            'ubersmith.validate', 'ubersmith.call']
@@ -1,3 +1,6 @@
+import datetime
+import json
+
 import pytest
 
 from ubersmith.utils import (
@@ -5,6 +8,10 @@ from ubersmith.utils import (
     urlencode_unicode,
     to_nested_php_args,
     get_filename,
+    get_json_decoder,
+    request_key,
+    resolve_call,
+    to_unix,
 )
 
 
@@ -146,3 +153,62 @@ class DescribeGetFilename:
     ])
     def it_returns_none_if_disposition_is_malformed(self, disposition):
         assert get_filename(disposition) is None
+
+
+class DescribeRequestKey:
+    def it_matches_requests_with_the_same_arguments(self):
+        assert request_key('client.get', {'client_id': 1, 'a': 'b'}) == \
+            request_key('client.get', {'a': 'b', 'client_id': '1'})
+
+    def it_differs_by_method_and_arguments(self):
+        key = request_key('client.get', {'client_id': 1})
+        assert key != request_key('client.get', {'client_id': 2})
+        assert key != request_key('device.get', {'client_id': 1})
+
+    def it_flattens_nested_arguments(self):
+        key = request_key('order.create', {'info': {'a': [1, 2]}})
+        assert key == ('order.create', (('info[a][0]', '1'),
+                                        ('info[a][1]', '2')))
+        assert hash(key)
+
+    def it_handles_no_arguments(self):
+        assert request_key('uber.method_list') == request_key(
+            'uber.method_list', {})
+
+
+class DescribeResolveCall:
+    def it_resolves_method_strings_on_the_handler(self):
+        from ubersmith.api import RequestHandler
+        h = RequestHandler('')
+        assert resolve_call(h, 'client.get') is h.client.get
+
+    def it_binds_call_functions(self):
+        from ubersmith.api import RequestHandler
+        import ubersmith.client
+        h = RequestHandler('')
+        call_func = resolve_call(h, ubersmith.client.get)
+        assert call_func.request_handler is h
+        assert call_func.call_class is ubersmith.client.get.call_class
+
+
+class DescribeToUnix:
+    def it_converts_cleaned_timestamps(self):
+        ts = datetime.datetime.fromtimestamp(1312304618)
+        assert to_unix(ts) == 1312304618
+
+
+class DescribeGetJsonDecoder:
+    def it_imports_decoders_by_name(self):
+        assert get_json_decoder('json') is json.loads
+
+    def it_passes_callables_and_none_through(self):
+        assert get_json_decoder(None) is None
+        assert get_json_decoder(json.loads) is json.loads
+
+    def it_rejects_missing_modules(self):
+        with pytest.raises(ValueError):
+            get_json_decoder('not_a_json_module')
+
+    def it_rejects_other_values(self):
+        with pytest.raises(TypeError):
+            get_json_decoder(1)
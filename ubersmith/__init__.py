@@ -31,8 +31,17 @@ __all__ = [
 ]
 
 
-def init(base_url, username=None, password=None, verify=True):
-    """Initialize ubersmith API module with HTTP request handler."""
-    handler = RequestHandler(base_url, username, password, verify)
+def init(base_url, username=None, password=None, verify=True, warm_up=0,
+         **kwargs):
+    """Initialize ubersmith API module with HTTP request handler.
+
+    Extra keyword arguments (pool_maxsize, keep_alive, ...) are passed to
+    RequestHandler.  If warm_up is given that many connections are opened
+    to base_url straight away.
+
+    """
+    handler = RequestHandler(base_url, username, password, verify, **kwargs)
+    if warm_up:
+        handler.warm_up(warm_up)
     set_default_request_handler(handler)
     return handler
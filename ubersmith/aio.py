@@ -0,0 +1,669 @@
+"""Asyncio request handling.
+
+Requires Python 3.7+ and aiohttp, installed with the aio extra.  This module is not imported by the
+ubersmith package so the rest of the library keeps working without them.
+
+    from ubersmith.aio import AsyncRequestHandler
+    h = AsyncRequestHandler('http://ubersmith/api/2.0/', 'user', 'pass')
+    client = await h.client.get(client_id=1)
+
+"""
+import asyncio
+from collections import deque
+from contextlib import contextmanager
+import json
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from ubersmith.api import (
+    _TOKEN_PEEK_SIZE,
+    RequestHandler,
+    _Leader,
+    _ProxyModule,
+)
+from ubersmith.batch import (
+    DEFAULT_MAX_WORKERS,
+    Batch,
+    BatchResult,
+    _method_name,
+)
+from ubersmith.compat import nullcontext
+from ubersmith.exceptions import ResponseError, UbersmithError, ValidationError
+from ubersmith.multipart import MultipartEncoder, wrap_files
+from ubersmith.pool import DEFAULT_POOLSIZE, PoolStats
+from ubersmith.ratelimit import RateLimiter
+from ubersmith.singleflight import SingleFlight
+from ubersmith.stream import DEFAULT_CHUNK_SIZE, ResponseStream
+from ubersmith.utils import append_qs, resolve_call
+
+try:
+    import aiohttp
+    from yarl import URL
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+_NO_AIOHTTP = ("aiohttp is required to send requests asynchronously, "
+               "install it with pip install ubersmith[aio].")
+
+__all__ = [
+    'AsyncBatch',
+    'AsyncCall',
+    'AsyncRateLimiter',
+    'AsyncRequestHandler',
+    'AsyncSingleFlight',
+]
+
+
+async def _acquire(rate_limiter, method):
+    wait = rate_limiter.reserve(method)
+    if wait > 0:
+        await asyncio.sleep(wait)
+    return wait
+
+
+class AsyncRateLimiter(RateLimiter):
+    """RateLimiter whose acquire waits without blocking the event loop."""
+
+    async def acquire(self, method):
+        """Wait until a request for method is allowed."""
+        return await _acquire(self, method)
+
+
+async def _read_body(encoder):
+    """Yield the body of a MultipartEncoder, read off the event loop."""
+    loop = asyncio.get_running_loop()
+    while True:
+        chunk = await loop.run_in_executor(None, encoder.read,
+                                           encoder.chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+@contextmanager
+def _requests_errors():
+    """Raise aiohttp errors as requests' so retry policies apply."""
+    if aiohttp is None:  # pragma: no cover
+        raise ImportError(_NO_AIOHTTP)
+    try:
+        yield
+    except aiohttp.ServerTimeoutError as e:
+        raise requests.Timeout(e)
+    except aiohttp.ClientConnectionError as e:
+        raise requests.ConnectionError(e)
+    except asyncio.TimeoutError as e:
+        raise requests.Timeout(e)
+
+
+class _AsyncResponse(object):
+    """Buffered aiohttp response that quacks like a requests response.
+
+    Streamed responses keep the aiohttp response as raw and are read with
+    read() or feed(), content is None until then.
+
+    """
+
+    def __init__(self, status_code, headers, content, encoding=None,
+                 raw=None):
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.encoding = encoding
+        self.raw = raw
+
+    async def read(self, size=-1):
+        """Read a streamed response's body into content, up to size bytes."""
+        with _requests_errors():
+            if size < 0:
+                self.content = await self.raw.read()
+            else:
+                self.content = await self.raw.content.read(size)
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', 'replace')
+
+    def json(self):
+        return json.loads(self.text)
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    async def feed(self, stream, chunk_size):
+        """Feed the next chunk of a streamed body to a ResponseStream."""
+        with _requests_errors():
+            chunk = await self.raw.content.read(chunk_size)
+        if chunk:
+            stream.feed(chunk)
+        else:
+            stream.feed_eof()
+
+    def close(self):
+        if self.raw is not None:
+            self.raw.release()
+
+
+class AsyncSingleFlight(SingleFlight):
+    """SingleFlight for coroutines running on one event loop."""
+
+    async def do(self, key, func):
+        """Return await func(), or the result of an in flight call for key."""
+        future = self._calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+            # don't let a cancelled follower cancel the shared future
+            return await asyncio.shield(future)
+
+        future = self._calls[key] = asyncio.get_event_loop().create_future()
+        self.leaders += 1
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # followers may not exist, don't log it as never retrieved
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+
+class AsyncCall(object):
+    """Awaitable counterpart to ubersmith.calls.GenericCall.
+
+    Runs the same validation and cleaning as the call class but awaits the
+    request on an AsyncRequestHandler.
+
+    """
+
+    def __init__(self, call_class, request_handler):
+        self.call_class = call_class
+        self.request_handler = request_handler
+
+    async def __call__(self, **kwargs):
+        call = self.call_class(kwargs, self.request_handler)
+        with call._span('ubersmith.call') as span:
+            with call._span('ubersmith.validate'):
+                valid = call.validate()
+            if not valid:
+                raise ValidationError
+            call.response = await self.request_handler.process_request(
+                call.method, call.request_data,
+                retry_policy=call.retry_policy, stream=call.stream)
+            call.clean()
+        call.attach_timings(span)
+        return call.response
+
+    async def iter(self, **kwargs):
+        """Yield the call's cleaned (key, value) pairs as they're read."""
+        call = self.call_class(kwargs, self.request_handler)
+        call._validate_iter()
+        items = self.request_handler.stream_request(
+            call.method, call.request_data, retry_policy=call.retry_policy)
+        async for key, value in items:
+            yield call.clean_item(key, value)
+
+
+def _resolve_async(request_handler, method):
+    """Return the AsyncCall for method bound to request_handler."""
+    if callable(method):
+        return AsyncCall(method.call_class, request_handler)
+    return resolve_call(request_handler, method)
+
+
+async def _run(index, call_func, kwargs, errors, semaphore):
+    async with semaphore:
+        try:
+            result = await call_func(**kwargs)
+        except errors as e:
+            return BatchResult(index, _method_name(call_func), kwargs, None, e)
+    return BatchResult(index, _method_name(call_func), kwargs, result, None)
+
+
+async def _execute(calls, max_workers, ordered, errors):
+    """Yield BatchResults for (index, call_func, kwargs) tuples.
+
+    Like ubersmith.batch's but on tasks, at most max_workers calls are in
+    flight and only a bounded window of tasks is created at a time.
+
+    """
+    calls = iter(calls)
+    window = max_workers * 2
+    semaphore = asyncio.Semaphore(max_workers)
+    pending = deque()
+    try:
+        while True:
+            for call in calls:
+                pending.append(asyncio.ensure_future(
+                    _run(*(call + (errors, semaphore)))))
+                if len(pending) >= window:
+                    break
+            if not pending:
+                break
+            if ordered:
+                yield await pending.popleft()
+            else:
+                done, _ = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.remove(task)
+                    yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class AsyncBatch(Batch):
+    """Collects calls to different methods and runs them concurrently.
+
+    The asyncio counterpart of ubersmith.batch.Batch, run() is an async
+    generator and results() a coroutine.
+
+    """
+
+    def add(self, method, **kwargs):
+        """Queue a call to method, return its index in the batch."""
+        self.calls.append((len(self.calls),
+                           _resolve_async(self.request_handler, method),
+                           kwargs))
+        return len(self.calls) - 1
+
+    def run(self, ordered=True):
+        """Yield a BatchResult for every queued call."""
+        return _execute(self.calls, self.max_workers, ordered, self.errors)
+
+    async def results(self):
+        """Run the batch and return all BatchResults in input order."""
+        return [result async for result in self.run()]
+
+
+class _AsyncProxyModule(_ProxyModule):
+    def _bind(self, call_func):
+        """Return an awaitable call bound to this proxy's handler."""
+        if not hasattr(call_func, 'call_class'):
+            raise AttributeError("'{0}' is not a call function".format(
+                getattr(call_func, '__name__', call_func)))
+        return AsyncCall(call_func.call_class, self.handler)
+
+
+def _idle(connector):
+    # aiohttp has no public api for the connections a connector holds
+    return sum(len(conns) for conns in connector._conns.values())
+
+
+class _PoolCounter(object):
+    """Counts connection pool usage from aiohttp's trace signals."""
+
+    def __init__(self):
+        self.hosts = set()
+        self.connections = 0
+        self.requests = 0
+        self.waits = 0
+
+    def trace_config(self):
+        config = aiohttp.TraceConfig()
+        config.on_request_start.append(self._on_request_start)
+        config.on_connection_create_end.append(self._on_connection_create)
+        config.on_connection_queued_start.append(self._on_queued)
+        return config
+
+    async def _on_request_start(self, session, context, params):
+        self.hosts.add((params.url.scheme, params.url.host, params.url.port))
+        self.requests += 1
+
+    async def _on_connection_create(self, session, context, params):
+        self.connections += 1
+
+    async def _on_queued(self, session, context, params):
+        self.waits += 1
+
+    def warmed_up(self, url, opened):
+        """Count connections opened by warming up, which aren't traced."""
+        self.hosts.add((url.scheme, url.host, url.port))
+        self.connections += opened
+
+    def stats(self, connector):
+        return PoolStats(
+            pools=len(self.hosts),
+            connections=self.connections,
+            in_use=len(connector._acquired),
+            idle=_idle(connector),
+            requests=self.requests,
+            waits=self.waits,
+        )
+
+
+class AsyncRequestHandler(RequestHandler):
+    """Handles HTTP requests and authentication on an asyncio event loop."""
+
+    proxy_class = _AsyncProxyModule
+
+    def __init__(self, base_url, username=None, password=None, verify=True,
+                 session=None, pool_connections=DEFAULT_POOLSIZE,
+                 pool_maxsize=DEFAULT_POOLSIZE, pool_block=True,
+                 keep_alive=True, retry_policy=None, circuit_breaker=None,
+                 rate_limiter=None, coalesce=False, cache=None,
+                 json_decoder=None, upload_callback=None, metrics=None,
+                 tracer=None, lazy=False, copy_data=False):
+        """Initialize HTTP request handler with optional authentication.
+
+            base_url: URL to send API requests
+            username: Username for API access
+            password: Password for API access
+            verify: Verify HTTPS certificate
+            session: aiohttp.ClientSession to send requests with, one is
+                     created on first use if not provided
+            pool_connections: Max connections over all hosts
+            pool_maxsize: Max connections to each host
+            pool_block: Accepted for compatibility, aiohttp always waits
+                        for a free connection
+            keep_alive: Reuse connections between requests
+            retry_policy: ubersmith.retry.RetryPolicy for failed requests
+            circuit_breaker: ubersmith.breaker.CircuitBreaker to fail fast
+                             while ubersmith is unavailable
+            rate_limiter: ubersmith.ratelimit.RateLimiter to throttle
+                          requests with, waits don't block the event loop
+            coalesce: Share one request between identical concurrent
+                      requests for READ_METHODS
+            cache: ubersmith.cache.ResponseCache to answer READ_METHODS
+                   from, writes invalidate its entries
+            json_decoder: Callable decoding response bytes or the name of
+                          a module with loads, e.g. 'orjson' or 'ujson'
+            upload_callback: Called with (bytes_sent, total) as file
+                             uploads are sent, total is None if unknown,
+                             from the thread files are read on
+            metrics: ubersmith.metrics.MetricsHook told about requests,
+                     failed attempts and cleaning
+            tracer: OpenTelemetry compatible tracer to trace call phases
+                    with, see ubersmith.tracing
+            lazy: Clean the fields of records in call responses when
+                  they're first read, see ubersmith.clean.LazyRecord
+            copy_data: Deep copy response data before cleaning it, so
+                       changing cleaned data never changes response.json
+
+        """
+        super(AsyncRequestHandler, self).__init__(
+            base_url, username, password, verify, session, pool_connections,
+            pool_maxsize, pool_block, keep_alive, retry_policy,
+            circuit_breaker, rate_limiter, coalesce, cache, json_decoder,
+            upload_callback=upload_callback, metrics=metrics, tracer=tracer, lazy=lazy, copy_data=copy_data)
+        self._pool_counter = None
+
+    def _create_session(self):
+        # aiohttp sessions need a running loop, create one on first request
+        return None
+
+    @staticmethod
+    def _create_single_flight():
+        return AsyncSingleFlight()
+
+    @property
+    def session(self):
+        if self._session is None:
+            if aiohttp is None:  # pragma: no cover
+                raise ImportError(_NO_AIOHTTP)
+            connector = aiohttp.TCPConnector(
+                limit=max(self.pool_connections, self.pool_maxsize),
+                limit_per_host=self.pool_maxsize,
+                force_close=not self.keep_alive)
+            self._pool_counter = _PoolCounter()
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                trace_configs=[self._pool_counter.trace_config()])
+        return self._session
+
+    def _ssl_kwargs(self):
+        return {} if self.verify else {'ssl': False}
+
+    async def warm_up(self, connections):
+        """Open connections to base_url ahead of the first requests.
+
+        Returns the number of connections that were opened, at most
+        pool_maxsize.
+
+        """
+        session, counter = self.session, self._counter()
+        idle = _idle(session.connector)
+        # same url and ssl as the requests so they reuse the connections
+        request = aiohttp.ClientRequest(
+            'POST', URL(self.base_url), loop=asyncio.get_running_loop(),
+            **self._ssl_kwargs())
+        opened = []
+        try:
+            for _ in range(min(connections, self.pool_maxsize)):
+                opened.append(await session.connector.connect(
+                    request, [], session.timeout))
+        except (OSError, aiohttp.ClientError, asyncio.TimeoutError):
+            # stop warming up, requests open connections as needed
+            pass
+        finally:
+            for conn in opened:
+                conn.release()
+        counter.warmed_up(request.url, max(len(opened) - idle, 0))
+        return len(opened)
+
+    def pool_stats(self):
+        """Return a ubersmith.pool.PoolStats snapshot of connection usage."""
+        return self._counter().stats(self.session.connector)
+
+    def _counter(self):
+        self.session  # creates the session and its counter on first use
+        if self._pool_counter is None:
+            raise TypeError("Session was not created by the request handler, "
+                            "it has no connection pool statistics.")
+        return self._pool_counter
+
+    async def stream_request(self, method, data=None, retry_policy=None,
+                             chunk_size=DEFAULT_CHUNK_SIZE):
+        """Process request, yielding (key, value) pairs of the response data.
+
+            method: Ubersmith API method string
+            data: dict of method arguments
+            retry_policy: RetryPolicy overriding the handler's for this call
+            chunk_size: bytes to read from the response at a time
+
+        The response is parsed as it's read so only one item of the data is
+        held in memory.  Responses aren't cached or coalesced.  Exhaust the
+        returned async generator or await its aclose() to release the
+        connection.
+
+        """
+        self._validate_request_method(method)
+        response, stream = await self._request(method, data, retry_policy,
+                                               chunk_size)
+        try:
+            while True:
+                for item in stream.parsed():
+                    yield item
+                if stream.done:
+                    break
+                await response.feed(stream, chunk_size)
+            # status may only come after the data
+            self._check_status(stream.envelope)
+        finally:
+            response.close()
+
+    def map(self, method, kwargs_iter, max_workers=DEFAULT_MAX_WORKERS,
+            ordered=True):
+        """Call method once per kwargs dict concurrently on this handler.
+
+            method: ubersmith method string or call function
+            kwargs_iter: iterable of dicts of call arguments
+            max_workers: number of calls in flight at once
+            ordered: yield results in input order, else as they complete
+
+        Returns an async generator of ubersmith.batch.BatchResult tuples,
+        per call errors are reported on the result instead of aborting the
+        batch.
+
+        """
+        call_func = _resolve_async(self, method)
+        calls = ((i, call_func, kwargs) for i, kwargs in enumerate(kwargs_iter))
+        return _execute(calls, max_workers, ordered, (UbersmithError,))
+
+    def batch(self, max_workers=DEFAULT_MAX_WORKERS):
+        """Return an AsyncBatch that runs calls on this handler."""
+        return AsyncBatch(self, max_workers)
+
+    async def close(self):
+        """Close the underlying aiohttp session."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def process_request(self, method, data=None, retry_policy=None,
+                              stream=False):
+        """Process request over HTTP to ubersmith instance.
+
+            method: Ubersmith API method string
+            data: dict of method arguments
+            retry_policy: RetryPolicy overriding the handler's for this call
+            stream: Accepted for compatibility, responses are always read
+                    whole but streamed files aren't cached or coalesced
+
+        """
+        # make sure requested method is valid
+        self._validate_request_method(method)
+
+        key, cache = self._read_plan(method, data, stream)
+        if key is None:
+            try:
+                return await self._request(method, data, retry_policy)
+            finally:
+                self._invalidate(method, data)
+        resp = self._cached(key, cache)
+        if resp is not None:
+            return resp
+        if self.single_flight is None:
+            resp = await self._request(method, data, retry_policy)
+        else:
+            leader = _Leader(lambda: self._request(method, data, retry_policy))
+            resp = self._share(await self.single_flight.do(key, leader),
+                               leader)
+        if cache is not None:
+            cache.set(key, resp.response)
+        return resp
+
+    async def _request(self, method, data, retry_policy, chunk_size=None):
+        """Send the request, retrying failed attempts.
+
+        If chunk_size is given the JSON body is parsed as it's read and a
+        (response, ubersmith.stream.ResponseStream) pair is returned.
+
+        """
+        with self._span('ubersmith.request', method):
+            if self.metrics is None:
+                return await self._retry_request(method, data, retry_policy,
+                                                 chunk_size)
+            return await self._measure_request(method, data, retry_policy,
+                                               chunk_size)
+
+    async def _measure_request(self, method, data, retry_policy, chunk_size):
+        started = time.time()
+        try:
+            result = await self._retry_request(method, data, retry_policy,
+                                               chunk_size)
+        except Exception as e:
+            self.metrics.on_request(method, time.time() - started, e, None,
+                                    None)
+            raise
+        self._report_request(method, started, result, False, chunk_size)
+        return result
+
+    async def _retry_request(self, method, data, retry_policy, chunk_size):
+        retry = (retry_policy or self.retry_policy).start(method)
+        # attempts share the FileFields, so retries send the whole file
+        data = wrap_files(data)
+        while True:
+            if self.rate_limiter is not None:
+                with self._span('ubersmith.wait', method):
+                    await _acquire(self.rate_limiter, method)
+            try:
+                with self.circuit_breaker or nullcontext():
+                    if chunk_size is not None:
+                        response = await self._send_request(method, data,
+                                                            stream=True)
+                        with self._span('ubersmith.decode', method):
+                            return await self._process_stream(response,
+                                                              chunk_size)
+                    response = await self._send_request(method, data)
+                    with self._span('ubersmith.decode', method):
+                        return self._process_response(response,
+                                                      self.json_decoder)
+            except Exception as e:
+                delay = self._backoff(retry, method, e)
+                if delay is None:
+                    raise
+            with self._span('ubersmith.wait', method):
+                await asyncio.sleep(delay)
+
+    async def _process_stream(self, response, chunk_size):
+        """Start parsing response and raise if ubersmith reported an error."""
+        try:
+            if response.headers.get('content-type') != 'application/json':
+                # can't be streamed either way, token pages are small so
+                # only the start is read
+                await response.read(_TOKEN_PEEK_SIZE)
+            self._check_http(response)
+            if response.headers.get('content-type') != 'application/json':
+                raise ResponseError("Only JSON responses can be streamed.")
+            stream = ResponseStream(None)
+            envelope = stream.try_read_envelope()
+            while envelope is None:
+                await response.feed(stream, chunk_size)
+                envelope = stream.try_read_envelope()
+            if 'status' in envelope:
+                self._check_status(envelope)
+        except Exception:
+            response.close()
+            raise
+        return response, stream
+
+    async def _send_request(self, method, data, stream=False):
+        url = append_qs(self.base_url, {'method': method})
+        with self._span('ubersmith.encode', method):
+            data, files, headers = self._encode_data(data)
+            if files:
+                # the same streamed body as the sync handler's
+                encoder = MultipartEncoder(data, files, self.upload_callback)
+                headers = {'Content-Type': encoder.content_type}
+                if encoder.total is not None:
+                    headers['Content-Length'] = str(encoder.total)
+                data = _read_body(encoder)
+        kwargs = {'data': data, 'headers': headers}
+        if self.username is not None:
+            kwargs['auth'] = aiohttp.BasicAuth(self.username,
+                                               self.password or '')
+        kwargs.update(self._ssl_kwargs())
+        with self._span('ubersmith.send', method) as span:
+            response = await self._post(url, kwargs, stream)
+            size = self._response_size(response, stream)
+            if size is not None:
+                span.set_attribute('ubersmith.response_bytes', size)
+            return response
+
+    async def _post(self, url, kwargs, stream=False):
+        with _requests_errors():
+            if stream:
+                # the body is read later, close() releases the connection
+                r = await self.session.post(url, **kwargs)
+                return _AsyncResponse(r.status, r.headers, None, r.charset,
+                                      raw=r)
+            async with self.session.post(url, **kwargs) as r:
+                content = await r.read()
+                return _AsyncResponse(r.status, r.headers, content,
+                                      r.charset)
@@ -1,24 +1,40 @@
 """Lower level API, configuration, and HTTP stuff."""
+from collections import namedtuple
+import hashlib
+import itertools
+import os
 import six
 import time
-from ubersmith.compat import total_ordering, file_type
+from ubersmith.compat import total_ordering, nullcontext
 
 import requests
 
+from ubersmith.batch import DEFAULT_MAX_WORKERS, Batch, map_calls
+from ubersmith.clean import unlazy
 from ubersmith.exceptions import (
     RequestError,
     ResponseError,
     UpdatingTokenResponse,
     MaintenanceResponse,
+    ServerErrorResponse,
 )
+from ubersmith.multipart import MultipartEncoder, is_file_value, wrap_files
+from ubersmith.pool import DEFAULT_POOLSIZE, PooledAdapter
+from ubersmith.retry import RetryPolicy
+from ubersmith.singleflight import SingleFlight
+from ubersmith.stream import DEFAULT_CHUNK_SIZE, ResponseStream
+from ubersmith.tracing import NO_OP_TRACER
 from ubersmith.utils import (
     append_qs,
     to_nested_php_args,
     get_filename,
+    get_json_decoder,
+    request_key,
 )
 
 __all__ = [
     'METHODS',
+    'READ_METHODS',
     'RequestHandler',
     'get_default_request_handler',
     'set_default_request_handler',
@@ -205,6 +221,44 @@ METHODS = {
     u'uber.username_exists': u'Check Whether a Username Exists',
 }
 
+_READ_SUFFIXES = (
+    '_available', '_count', '_detail', '_exists', '_get', '_graph', '_info',
+    '_list', '_lookup', '_payments', '_single', '_stats', '_unassigned',
+)
+
+"""Methods that only read data, these are safe to retry"""
+READ_METHODS = frozenset([
+    m for m in METHODS if ('_' + m.split('.', 1)[1]).endswith(_READ_SUFFIXES)
+] + [
+    u'client.latest_client',
+    u'uber.api_export',
+    u'uber.check_login',
+    u'uber.documentation',
+])
+
+# token pages are small, only this much of a streamed body is checked
+_TOKEN_PEEK_SIZE = 4096
+
+
+def _peek(response, size):
+    """Return up to size bytes from the start of a streamed response.
+
+    The bytes are put back in front of the rest of the body, iter_content
+    and content still return all of it.
+
+    """
+    chunks = response.iter_content(size)
+    prefix = next(chunks, b'')
+
+    def iter_content(chunk_size=1, decode_unicode=False):
+        body = itertools.chain([prefix], chunks)
+        if decode_unicode:
+            body = requests.utils.stream_decode_response_unicode(
+                body, response)
+        return body
+    response.iter_content = iter_content
+    return prefix
+
 
 class _ProxyModule(object):
     def __init__(self, handler, module):
@@ -215,93 +269,440 @@ class _ProxyModule(object):
         """Return the call with request_handler prefilled."""
         call_func = getattr(self.module, name)
         if callable(call_func):
-            call_p = call_func.handler(self.handler)
+            call_p = self._bind(call_func)
             # store partial on proxy so it doesn't have to be created again
             setattr(self, name, call_p)
             return call_p
         raise AttributeError("'{0}' object has no attribute '{1}'".format(
             type(self).__name__, name))
 
+    def _bind(self, call_func):
+        """Return call_func bound to this proxy's handler."""
+        return call_func.handler(self.handler)
+
+
+class _Leader(object):
+    """Makes a coalesced request and remembers if this caller made it."""
+
+    def __init__(self, request):
+        self.request = request
+        self.led = False
+
+    def __call__(self):
+        self.led = True
+        return self.request()
+
 
 class RequestHandler(object):
     """Handles HTTP requests and authentication."""
 
+    proxy_class = _ProxyModule  # wraps call modules accessed on the handler
+
     def __init__(self, base_url, username=None, password=None, verify=True,
-                 session=None):
+                 session=None, pool_connections=DEFAULT_POOLSIZE,
+                 pool_maxsize=DEFAULT_POOLSIZE, pool_block=False,
+                 keep_alive=True, retry_policy=None, circuit_breaker=None,
+                 rate_limiter=None, coalesce=False, cache=None,
+                 json_decoder=None, upload_callback=None, metrics=None,
+                 tracer=None, lazy=False, copy_data=False):
         """Initialize HTTP request handler with optional authentication.
 
             base_url: URL to send API requests
             username: Username for API access
             password: Password for API access
             verify: Verify HTTPS certificate
-            session: requests.Session to send requests with
+            session: requests.Session to send requests with, the pool
+                     options below are ignored if this is provided
+            pool_connections: Number of per host connection pools to keep
+            pool_maxsize: Max connections kept open to each host
+            pool_block: Wait for a free connection instead of opening
+                        extra ones when all pool_maxsize are in use
+            keep_alive: Reuse connections between requests
+            retry_policy: ubersmith.retry.RetryPolicy for failed requests
+            circuit_breaker: ubersmith.breaker.CircuitBreaker to fail fast
+                             while ubersmith is unavailable
+            rate_limiter: ubersmith.ratelimit.RateLimiter to throttle
+                          requests with
+            coalesce: Share one request between identical concurrent
+                      requests for READ_METHODS
+            cache: ubersmith.cache.ResponseCache to answer READ_METHODS
+                   from, writes invalidate its entries
+            json_decoder: Callable decoding response bytes or the name of
+                          a module with loads, e.g. 'orjson' or 'ujson'
+            upload_callback: Called with (bytes_sent, total) as file
+                             uploads are sent, total is None if unknown
+            metrics: ubersmith.metrics.MetricsHook told about requests,
+                     failed attempts and cleaning
+            tracer: OpenTelemetry compatible tracer to trace call phases
+                    with, see ubersmith.tracing
+            lazy: Clean the fields of records in call responses when
+                  they're first read, see ubersmith.clean.LazyRecord
+            copy_data: Deep copy response data before cleaning it, so
+                       changing cleaned data never changes response.json
 
         """
         self.base_url = base_url
         self.username = username
         self.password = password
         self.verify = verify
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker
+        self.rate_limiter = rate_limiter
+        self.single_flight = self._create_single_flight() if coalesce \
+            else None
+        self.cache = cache
+        self.json_decoder = get_json_decoder(json_decoder)
+        self.upload_callback = upload_callback
+        self.metrics = metrics
+        self.tracer = tracer or NO_OP_TRACER
+        self.lazy = lazy
+        self.copy_data = copy_data
 
         if session is None:
-            session = requests.session()
+            session = self._create_session()
         self._session = session
 
+    def _create_session(self):
+        """Return a new session to send requests with."""
+        session = requests.session()
+        adapter = PooledAdapter(pool_connections=self.pool_connections,
+                                pool_maxsize=self.pool_maxsize,
+                                pool_block=self.pool_block)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+
+    @staticmethod
+    def _create_single_flight():
+        return SingleFlight()
+
     @property
     def session(self):
         return self._session
 
-    def process_request(self, method, data=None):
+    def _pooled_adapter(self):
+        adapter = self.session.get_adapter(self.base_url)
+        if not isinstance(adapter, PooledAdapter):
+            raise TypeError("Session was not created by the request handler, "
+                            "it has no connection pool statistics.")
+        return adapter
+
+    def warm_up(self, connections):
+        """Open connections to base_url ahead of the first requests.
+
+        Returns the number of connections that were opened, at most
+        pool_maxsize.
+
+        """
+        # resolve verify the same way session.post does so the warmed up
+        # connections land in the pool requests will be sent over
+        settings = self.session.merge_environment_settings(
+            self.base_url, {}, None, self.verify, None)
+        return self._pooled_adapter().warm_up(self.base_url, connections,
+                                              settings['verify'])
+
+    def pool_stats(self):
+        """Return a ubersmith.pool.PoolStats snapshot of connection usage."""
+        return self._pooled_adapter().stats()
+
+    def map(self, method, kwargs_iter, max_workers=DEFAULT_MAX_WORKERS,
+            ordered=True):
+        """Call method once per kwargs dict concurrently on this handler.
+
+            method: ubersmith method string or call function
+            kwargs_iter: iterable of dicts of call arguments
+            max_workers: number of calls in flight at once
+            ordered: yield results in input order, else as they complete
+
+        Yields ubersmith.batch.BatchResult tuples, per call errors are
+        reported on the result instead of aborting the batch.
+
+        """
+        return map_calls(self, method, kwargs_iter, max_workers, ordered)
+
+    def batch(self, max_workers=DEFAULT_MAX_WORKERS):
+        """Return a ubersmith.batch.Batch that runs calls on this handler."""
+        return Batch(self, max_workers)
+
+    def process_request(self, method, data=None, retry_policy=None,
+                        stream=False):
         """Process request over HTTP to ubersmith instance.
 
             method: Ubersmith API method string
             data: dict of method arguments
+            retry_policy: RetryPolicy overriding the handler's for this call
+            stream: Don't read file responses until they're accessed, these
+                    aren't cached or coalesced
 
         """
         # make sure requested method is valid
         self._validate_request_method(method)
 
-        # attempt the request multiple times
-        attempts = 3
-        for i in range(attempts):
-            response = self._send_request(method, data)
+        key, cache = self._read_plan(method, data, stream)
+        if key is None:
+            try:
+                return self._request(method, data, retry_policy, stream)
+            finally:
+                self._invalidate(method, data)
+        resp = self._cached(key, cache)
+        if resp is not None:
+            return resp
+        if self.single_flight is None:
+            resp = self._request(method, data, retry_policy)
+        else:
+            leader = _Leader(lambda: self._request(method, data, retry_policy))
+            resp = self._share(self.single_flight.do(key, leader), leader)
+        if cache is not None:
+            cache.set(key, resp.response)
+        return resp
 
-            # handle case where ubersmith is 'updating token'
-            # see: https://github.com/jasonkeene/python-ubersmith/issues/1
-            if self._is_token_response(response):
-                if i < attempts - 1:
-                    # wait 2 secs before retrying request
-                    time.sleep(2)
-                    continue
-                else:
-                    raise UpdatingTokenResponse
-            break
+    def _read_plan(self, method, data, stream):
+        """Return (key, cache) of a request.
 
-        resp = BaseResponse(response)
+        key is None unless the request is a read that may be cached and
+        coalesced, cache is None unless it's cached for method.
+
+        """
+        if method not in READ_METHODS or stream:
+            return None, None
+        cache = self.cache if self.cache is not None and \
+            self.cache.ttl(method) else None
+        return request_key(method, data), cache
+
+    def _cached(self, key, cache):
+        """Return a new response of key's cached one or None."""
+        if cache is None:
+            return None
+        response = cache.get(key)
+        if response is None:
+            return None
+        return BaseResponse(response, self.json_decoder)
+
+    def _invalidate(self, method, data):
+        """Evict the cached reads a write may have changed."""
+        # even failed writes may have changed something
+        if method not in READ_METHODS and self.cache is not None:
+            self.cache.invalidate(request_key(method, data))
+
+    def _share(self, resp, leader):
+        """Return a coalesced response to one of the callers sharing it."""
+        if leader.led:
+            return resp
+        # followers get their own response to clean
+        return BaseResponse(resp.response, self.json_decoder)
+
+    def stream_request(self, method, data=None, retry_policy=None,
+                       chunk_size=DEFAULT_CHUNK_SIZE):
+        """Process request, yielding (key, value) pairs of the response data.
+
+            method: Ubersmith API method string
+            data: dict of method arguments
+            retry_policy: RetryPolicy overriding the handler's for this call
+            chunk_size: bytes to read from the response at a time
+
+        The response is parsed as it's read so only one item of the data is
+        held in memory.  Responses aren't cached or coalesced.  Exhaust or
+        close the returned generator to release the connection.
+
+        """
+        self._validate_request_method(method)
+        response, stream = self._request(method, data, retry_policy,
+                                         chunk_size=chunk_size)
+        return self._iter_stream(response, stream)
+
+    def _iter_stream(self, response, stream):
+        try:
+            for item in stream:
+                yield item
+            # status may only come after the data
+            self._check_status(stream.envelope)
+        finally:
+            response.close()
+
+    def _request(self, method, data, retry_policy, stream=False,
+                 chunk_size=None):
+        """Send the request, retrying failed attempts.
+
+        With stream the body is read when accessed.  If chunk_size is given
+        the JSON body is parsed as it's read and a (response,
+        ubersmith.stream.ResponseStream) pair is returned.
+
+        """
+        with self._span('ubersmith.request', method):
+            if self.metrics is None:
+                return self._retry_request(method, data, retry_policy,
+                                           stream, chunk_size)
+            return self._measure_request(method, data, retry_policy, stream,
+                                         chunk_size)
+
+    def _measure_request(self, method, data, retry_policy, stream,
+                         chunk_size):
+        started = time.time()
+        try:
+            result = self._retry_request(method, data, retry_policy, stream,
+                                         chunk_size)
+        except Exception as e:
+            self.metrics.on_request(method, time.time() - started, e, None,
+                                    None)
+            raise
+        self._report_request(method, started, result, stream, chunk_size)
+        return result
+
+    def _report_request(self, method, started, result, stream, chunk_size):
+        """Tell metrics about a request that succeeded."""
+        response = result[0] if chunk_size is not None else result.response
+        self.metrics.on_request(
+            method, time.time() - started, None, self._request_size(response),
+            self._response_size(response, stream or chunk_size is not None))
+
+    def _backoff(self, retry, method, e):
+        """Return seconds to wait before retrying, None to raise e."""
+        delay = retry.backoff(e)
+        if self.metrics is not None:
+            self.metrics.on_attempt_failed(method, e, delay)
+        return delay
+
+    def _retry_request(self, method, data, retry_policy, stream, chunk_size):
+        retry = (retry_policy or self.retry_policy).start(method)
+        # attempts share the FileFields, so retries send the whole file
+        data = wrap_files(data)
+        while True:
+            if self.rate_limiter is not None:
+                with self._span('ubersmith.wait', method):
+                    self.rate_limiter.acquire(method)
+            try:
+                with self.circuit_breaker or nullcontext():
+                    if chunk_size is not None:
+                        response = self._send_request(method, data,
+                                                      stream=True)
+                        with self._span('ubersmith.decode', method):
+                            return self._process_stream(response, chunk_size)
+                    if stream:
+                        response = self._send_request(method, data,
+                                                      stream=True)
+                    else:
+                        response = self._send_request(method, data)
+                    with self._span('ubersmith.decode', method):
+                        return self._process_response(response,
+                                                      self.json_decoder)
+            except Exception as e:
+                delay = self._backoff(retry, method, e)
+                if delay is None:
+                    raise
+            with self._span('ubersmith.wait', method):
+                time.sleep(delay)
+
+    @staticmethod
+    def _request_size(response):
+        """Return the size of the body sent for response or None."""
+        body = getattr(getattr(response, 'request', None), 'body', None)
+        if isinstance(body, MultipartEncoder):
+            return body.bytes_read
+        if isinstance(body, (six.binary_type, six.text_type)):
+            return len(body)
+        return None
+
+    @staticmethod
+    def _response_size(response, stream):
+        """Return the size of response's body or None if unknown."""
+        length = response.headers.get('content-length')
+        if isinstance(length, six.string_types) and length.isdigit():
+            return int(length)
+        if not stream:
+            content = getattr(response, 'content', None)
+            if isinstance(content, six.binary_type):
+                return len(content)
+        return None
+
+    @classmethod
+    def _process_response(cls, response, decoder=None):
+        """Wrap response and raise if ubersmith reported an error."""
+        cls._check_http(response)
+
+        resp = BaseResponse(response, decoder)
 
         # test for error in json response
         if response.headers.get('content-type') == 'application/json':
-            if not resp.json.get('status'):
-                if all([
-                    resp.json.get('error_code') == 1,
-                    resp.json.get('error_message') == u"We are currently "
-                        "undergoing maintenance, please check back shortly.",
-                ]):
-                    raise MaintenanceResponse(response=resp.json)
-                else:
-                    raise ResponseError(response=resp.json)
+            cls._check_status(resp.json)
         return resp
 
+    @classmethod
+    def _process_stream(cls, response, chunk_size):
+        """Start parsing response and raise if ubersmith reported an error."""
+        try:
+            cls._check_http(response)
+            if response.headers.get('content-type') != 'application/json':
+                raise ResponseError("Only JSON responses can be streamed.")
+            stream = ResponseStream(response.iter_content(chunk_size))
+            envelope = stream.read_envelope()
+            if 'status' in envelope:
+                cls._check_status(envelope)
+        except Exception:
+            response.close()
+            raise
+        return response, stream
+
+    @classmethod
+    def _check_http(cls, response):
+        # handle case where ubersmith is 'updating token'
+        # see: https://github.com/jasonkeene/python-ubersmith/issues/1
+        if cls._is_token_response(response):
+            raise UpdatingTokenResponse
+
+        status_code = getattr(response, 'status_code', None)
+        if isinstance(status_code, six.integer_types) and status_code >= 500:
+            raise ServerErrorResponse(status_code=status_code)
+
     @staticmethod
-    def _is_token_response(response):
-        return ('text/html' in response.headers.get('content-type', '') and
-                'Updating Token' in response.content)
+    def _check_status(resp_json):
+        if not resp_json.get('status'):
+            if all([
+                resp_json.get('error_code') == 1,
+                resp_json.get('error_message') == u"We are currently "
+                    "undergoing maintenance, please check back shortly.",
+            ]):
+                raise MaintenanceResponse(response=resp_json)
+            else:
+                raise ResponseError(response=resp_json)
 
-    def _send_request(self, method, data):
+    @staticmethod
+    def _is_token_response(response):
+        if 'text/html' not in response.headers.get('content-type', ''):
+            return False
+        if isinstance(response, requests.Response) and \
+                response._content is False:
+            # streamed and unread, e.g. a large HTML download
+            return b'Updating Token' in _peek(response, _TOKEN_PEEK_SIZE)
+        return 'Updating Token' in response.text
+
+    def _span(self, name, method):
+        """Return a context manager tracing a phase of a request."""
+        return self.tracer.start_as_current_span(
+            name, attributes={'ubersmith.method': method})
+
+    def _send_request(self, method, data, stream=False):
         url = append_qs(self.base_url, {'method': method})
-        data, files, headers = self._encode_data(data)
-        return self.session.post(url, data=data, files=files, headers=headers,
-                                 auth=(self.username, self.password),
-                                 verify=self.verify)
+        with self._span('ubersmith.encode', method):
+            data, files, headers = self._encode_data(data)
+            if files:
+                # stream uploads instead of letting requests build the body
+                data = MultipartEncoder(data, files, self.upload_callback)
+                files, headers = None, {'Content-Type': data.content_type}
+        with self._span('ubersmith.send', method) as span:
+            response = self.session.post(url, data=data, files=files,
+                                         headers=headers,
+                                         auth=(self.username, self.password),
+                                         verify=self.verify, stream=stream)
+            size = self._response_size(response, stream)
+            if size is not None:
+                span.set_attribute('ubersmith.response_bytes', size)
+            return response
 
     @staticmethod
     def _validate_request_method(method):
@@ -316,7 +717,7 @@ class RequestHandler(object):
         data = to_nested_php_args(data)
         files = dict([
             (key, value) for key, value in
-            data.items() if isinstance(value, file_type)])
+            data.items() if is_file_value(value)])
         for fname in files:
             del data[fname]
         return data, files or None, None
@@ -326,7 +727,7 @@ class RequestHandler(object):
         if name in set(m.split('.')[0] for m in METHODS):
             module_name = 'ubersmith.{0}'.format(name)
             module = __import__(module_name, fromlist=[''])
-            proxy = _ProxyModule(self, module)
+            proxy = self.proxy_class(self, module)
             # store proxy on handler so it doesn't have to be created again
             setattr(self, name, proxy)
             return proxy
@@ -336,18 +737,32 @@ class RequestHandler(object):
 
 class BaseResponse(object):
     """Wraps response object and emulates different types."""
-    def __init__(self, response):
+
+    timings = None  # ubersmith.profiling.Timings when profiling calls
+
+    def __init__(self, response, decoder=None):
         self.response = response  # requests' response object
+        self.decoder = decoder  # decodes bytes, None for response.json()
 
     @classmethod
     def from_cleaned(cls, response, cleaned):
-        resp = cls(response.response)
+        resp = cls(response.response, response.decoder)
+        if '_json' in response.__dict__:
+            resp._json = response._json
         resp.cleaned = cleaned
         return resp
 
     @property
     def json(self):
-        return self.response.json()
+        # decoded once, large list responses are expensive to parse
+        try:
+            return self._json
+        except AttributeError:
+            if self.decoder is None:
+                self._json = self.response.json()
+            else:
+                self._json = self.decoder(self.response.content)
+            return self._json
 
     @property
     def data(self):
@@ -383,8 +798,10 @@ class BaseResponse(object):
                         return super(MyJSONEncoder, self).default(o)
 
             json.dumps(my_response, cls=MyJSONEncoder)
+
+        Lazily cleaned records are returned as dicts.
         """
-        return self.data
+        return unlazy(self.data)
 
 
 @total_ordering
@@ -588,6 +1005,16 @@ class IntResponse(BaseResponse):
         return bool(self.data)
 
 
+class SavedFile(namedtuple('SavedFile', ['size', 'checksum'])):
+    """Result of FileResponse.save_to.
+
+        size: bytes written
+        checksum: hex digest of the file or None if not requested
+
+    """
+    __slots__ = ()
+
+
 class FileResponse(BaseResponse):
     @property
     def json(self):
@@ -595,6 +1022,8 @@ class FileResponse(BaseResponse):
 
     @property
     def data(self):
+        """Return the whole file, prefer iter_chunks or save_to for large
+        files."""
         return self.response.content
 
     @property
@@ -602,6 +1031,54 @@ class FileResponse(BaseResponse):
         disposition = self.response.headers.get('content-disposition')
         return get_filename(disposition)
 
+    def iter_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Yield the file in chunks of up to chunk_size bytes.
+
+        The connection is released once all chunks have been read.
+
+        """
+        try:
+            for chunk in self.response.iter_content(chunk_size):
+                if chunk:
+                    yield chunk
+        finally:
+            self.response.close()
+
+    def save_to(self, path_or_fileobj, chunk_size=DEFAULT_CHUNK_SIZE,
+                checksum=None):
+        """Write the file to a path or file object chunk by chunk.
+
+            path_or_fileobj: path to create or binary file object to write
+            chunk_size: bytes to read from the response at a time
+            checksum: hashlib algorithm name, e.g. 'sha256', to compute the
+                      file's digest with while writing
+
+        Returns a SavedFile.  A partially written path is removed if the
+        download fails.
+
+        """
+        digest = hashlib.new(checksum) if checksum is not None else None
+        if isinstance(path_or_fileobj, six.string_types):
+            try:
+                with open(path_or_fileobj, 'wb') as f:
+                    size = self._write_chunks(f, chunk_size, digest)
+            except BaseException:
+                if os.path.exists(path_or_fileobj):
+                    os.remove(path_or_fileobj)
+                raise
+        else:
+            size = self._write_chunks(path_or_fileobj, chunk_size, digest)
+        return SavedFile(size, digest.hexdigest() if digest else None)
+
+    def _write_chunks(self, f, chunk_size, digest):
+        size = 0
+        for chunk in self.iter_chunks(chunk_size):
+            f.write(chunk)
+            if digest is not None:
+                digest.update(chunk)
+            size += len(chunk)
+        return size
+
 
 def get_default_request_handler():
     """Return the default request handler."""
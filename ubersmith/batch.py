@@ -0,0 +1,131 @@
+"""Run many calls concurrently over a single request handler.
+
+    h = ubersmith.init(...)
+    for result in h.map('client.get', ({'client_id': i} for i in ids)):
+        if result.error is None:
+            print(result.result['email'])
+
+"""
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from ubersmith.exceptions import UbersmithError
+from ubersmith.utils import resolve_call
+
+__all__ = [
+    'DEFAULT_MAX_WORKERS',
+    'Batch',
+    'BatchResult',
+    'map_calls',
+]
+
+DEFAULT_MAX_WORKERS = 4
+
+
+class BatchResult(namedtuple('BatchResult', [
+        'index', 'method', 'kwargs', 'result', 'error'])):
+    """Outcome of a single call in a batch.
+
+        index: position of the call in the input
+        method: ubersmith method string
+        kwargs: arguments the call was made with
+        result: cleaned response or None if the call failed
+        error: UbersmithError raised by the call or None
+
+    """
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+def _method_name(call_func):
+    return call_func.call_class.method
+
+
+def _run(index, call_func, kwargs, errors):
+    try:
+        return BatchResult(index, _method_name(call_func), kwargs,
+                           call_func(**kwargs), None)
+    except errors as e:
+        return BatchResult(index, _method_name(call_func), kwargs, None, e)
+
+
+def _execute(calls, max_workers, ordered, errors):
+    """Yield BatchResults for (index, call_func, kwargs) tuples.
+
+    Only a bounded window of calls is submitted at a time so huge or lazy
+    inputs don't get materialized up front.
+
+    """
+    calls = iter(calls)
+    window = max_workers * 2
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    pending = deque()
+    try:
+        while True:
+            for call in calls:
+                pending.append(executor.submit(_run, *(call + (errors,))))
+                if len(pending) >= window:
+                    break
+            if not pending:
+                break
+            if ordered:
+                yield pending.popleft().result()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def map_calls(request_handler, method, kwargs_iter,
+              max_workers=DEFAULT_MAX_WORKERS, ordered=True,
+              errors=(UbersmithError,)):
+    """Call method once per kwargs dict on a bounded thread pool.
+
+        request_handler: handler whose session all calls share
+        method: ubersmith method string or call function
+        kwargs_iter: iterable of dicts of call arguments
+        max_workers: number of calls in flight at once
+        ordered: yield results in input order, else as they complete
+        errors: exception types reported per item instead of raised
+
+    """
+    call_func = resolve_call(request_handler, method)
+    calls = ((i, call_func, kwargs) for i, kwargs in enumerate(kwargs_iter))
+    return _execute(calls, max_workers, ordered, errors)
+
+
+class Batch(object):
+    """Collects calls to different methods and runs them concurrently."""
+
+    def __init__(self, request_handler, max_workers=DEFAULT_MAX_WORKERS,
+                 errors=(UbersmithError,)):
+        self.request_handler = request_handler
+        self.max_workers = max_workers
+        self.errors = errors
+        self.calls = []
+
+    def add(self, method, **kwargs):
+        """Queue a call to method, return its index in the batch."""
+        self.calls.append((len(self.calls),
+                           resolve_call(self.request_handler, method),
+                           kwargs))
+        return len(self.calls) - 1
+
+    def run(self, ordered=True):
+        """Yield a BatchResult for every queued call."""
+        return _execute(self.calls, self.max_workers, ordered, self.errors)
+
+    def results(self):
+        """Run the batch and return all BatchResults in input order."""
+        return list(self.run())
+
+    def __len__(self):
+        return len(self.calls)
@@ -0,0 +1,178 @@
+"""Circuit breaker that stops requests while Ubersmith is unavailable.
+
+After failure_threshold consecutive failures (maintenance, 5xx, timeouts
+and connection errors by default) the breaker opens and requests fail fast
+with CircuitOpenError.  Once reset_timeout has passed a single probe request
+is let through, closing the breaker if it succeeds or opening it again if
+it fails:
+
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30)
+    breaker.add_listener(lambda old, new, breaker: log(old, new))
+    h = RequestHandler(url, user, password, circuit_breaker=breaker)
+
+"""
+from collections import namedtuple
+import threading
+import time
+
+import requests
+
+from ubersmith.exceptions import (
+    CircuitOpenError,
+    MaintenanceResponse,
+    ServerErrorResponse,
+)
+
+__all__ = [
+    'CLOSED',
+    'OPEN',
+    'HALF_OPEN',
+    'BreakerStats',
+    'CircuitBreaker',
+]
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class BreakerStats(namedtuple('BreakerStats', [
+        'state', 'consecutive_failures', 'failures', 'successes', 'rejected',
+        'opened', 'opened_at'])):
+    """Snapshot of a circuit breaker.
+
+        state: CLOSED, OPEN or HALF_OPEN
+        consecutive_failures: failures since the last success
+        failures: failures recorded over the breaker's lifetime
+        successes: successes recorded over the breaker's lifetime
+        rejected: requests failed fast while open
+        opened: times the breaker has opened
+        opened_at: time.time() the breaker last opened or None
+
+    """
+    __slots__ = ()
+
+
+class CircuitBreaker(object):
+    """Thread safe circuit breaker, use as a context manager around requests.
+
+        failure_threshold: consecutive failures that open the breaker
+        reset_timeout: seconds to stay open before probing
+        failures: exception types that count as failures, other exceptions
+                  mean ubersmith answered and count as successes
+
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0,
+                 failures=(MaintenanceResponse, ServerErrorResponse,
+                           requests.Timeout, requests.ConnectionError)):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = tuple(failures)
+        self.listeners = []
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._probing = False
+        self._consecutive_failures = 0
+        self._failure_count = 0
+        self._success_count = 0
+        self._rejected = 0
+        self._opened = 0
+        self._opened_at = None
+
+    @property
+    def state(self):
+        return self._state
+
+    def add_listener(self, listener):
+        """Call listener(old_state, new_state, breaker) on transitions."""
+        self.listeners.append(listener)
+
+    def stats(self):
+        """Return a BreakerStats snapshot."""
+        with self._lock:
+            return BreakerStats(self._state, self._consecutive_failures,
+                                self._failure_count, self._success_count,
+                                self._rejected, self._opened,
+                                self._opened_at)
+
+    def before_request(self):
+        """Raise CircuitOpenError unless a request may be sent now."""
+        transition = None
+        with self._lock:
+            if self._state == OPEN:
+                retry_after = self._opened_at + self.reset_timeout - \
+                    time.time()
+                if retry_after > 0:
+                    self._rejected += 1
+                    raise CircuitOpenError(retry_after=retry_after)
+                transition = self._transition(HALF_OPEN)
+            if self._state == HALF_OPEN:
+                if self._probing:
+                    self._rejected += 1
+                    raise CircuitOpenError(retry_after=0)
+                self._probing = True
+        self._notify(transition)
+
+    def record_success(self):
+        transition = None
+        with self._lock:
+            self._success_count += 1
+            self._consecutive_failures = 0
+            self._probing = False
+            if self._state != CLOSED:
+                transition = self._transition(CLOSED)
+        self._notify(transition)
+
+    def record_failure(self):
+        transition = None
+        with self._lock:
+            self._failure_count += 1
+            self._consecutive_failures += 1
+            self._probing = False
+            if self._state == HALF_OPEN or (
+                    self._state == CLOSED and
+                    self._consecutive_failures >= self.failure_threshold):
+                transition = self._transition(OPEN)
+        self._notify(transition)
+
+    def reset(self):
+        """Close the breaker and forget consecutive failures."""
+        transition = None
+        with self._lock:
+            self._consecutive_failures = 0
+            self._probing = False
+            if self._state != CLOSED:
+                transition = self._transition(CLOSED)
+        self._notify(transition)
+
+    def _transition(self, state):
+        # must be called while holding self._lock
+        old, self._state = self._state, state
+        if state == OPEN:
+            self._opened += 1
+            self._opened_at = time.time()
+        return old, state
+
+    def _notify(self, transition):
+        if transition is not None:
+            for listener in self.listeners:
+                listener(transition[0], transition[1], self)
+
+    def __enter__(self):
+        self.before_request()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.record_success()
+        elif issubclass(exc_type, self.failures):
+            self.record_failure()
+        elif issubclass(exc_type, Exception):
+            # ubersmith answered, e.g. with a ResponseError
+            self.record_success()
+        else:
+            # interrupted, let another request probe
+            with self._lock:
+                self._probing = False
+        return False
@@ -0,0 +1,134 @@
+"""In-process response cache for read methods.
+
+Only methods with a TTL are cached.  TTLs can be set per method or per
+namespace, the most specific one wins:
+
+    cache = ResponseCache(ttls={
+        'uber.service_plan_list': 3600,
+        'device.type_list': 3600,
+        'client.get': 60,
+        'support': 300,
+    }, maxsize=1000)
+    h = RequestHandler(url, user, password, cache=cache)
+
+Writes invalidate cached reads in their namespace.  If the write has id
+arguments (client_id, device_id, ...) only entries with the same ids, or
+without those ids at all like lists, are evicted.  So client.update for
+client_id 1 evicts client.get for client_id 1 and client.list, but keeps
+client.get for client_id 2.
+
+"""
+from collections import namedtuple, OrderedDict
+import threading
+import time
+
+__all__ = [
+    'CacheStats',
+    'ResponseCache',
+]
+
+
+class CacheStats(namedtuple('CacheStats', [
+        'hits', 'misses', 'evictions', 'expirations', 'invalidations',
+        'size'])):
+    """Snapshot of cache usage.
+
+        hits: lookups answered from the cache
+        misses: lookups of cacheable methods that weren't
+        evictions: entries dropped to stay within maxsize
+        expirations: entries dropped because their TTL passed
+        invalidations: entries dropped because of writes
+        size: entries currently cached
+
+    """
+    __slots__ = ()
+
+
+def _is_id_field(name):
+    return name.endswith('id')
+
+
+class ResponseCache(object):
+    """Thread safe TTL/LRU cache of raw responses keyed by request key.
+
+        ttls: dict of method or namespace to seconds to cache for
+        default_ttl: seconds to cache other read methods, None to not
+        maxsize: max entries, least recently used ones are evicted
+
+    """
+
+    def __init__(self, ttls=None, default_ttl=None, maxsize=1024):
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def ttl(self, method):
+        """Return seconds to cache method for or None if not cached."""
+        if method in self.ttls:
+            return self.ttls[method]
+        return self.ttls.get(method.split('.', 1)[0], self.default_ttl)
+
+    def stats(self):
+        with self._lock:
+            return CacheStats(self.hits, self.misses, self.evictions,
+                              self.expirations, self.invalidations,
+                              len(self._entries))
+
+    def get(self, key):
+        """Return the cached value for a request key or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.time():
+                    self.hits += 1
+                    # mark as most recently used
+                    del self._entries[key]
+                    self._entries[key] = entry
+                    return value
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        """Cache value for a request key if its method has a TTL."""
+        ttl = self.ttl(key[0])
+        if not ttl:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time() + ttl, value)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Evict entries a write with request key may have made stale."""
+        method, args = key
+        namespace = method.split('.', 1)[0]
+        ids = dict((k, v) for k, v in args if _is_id_field(k))
+        with self._lock:
+            stale = []
+            for entry_key in self._entries:
+                entry_method, entry_args = entry_key
+                if entry_method.split('.', 1)[0] != namespace:
+                    continue
+                entry_ids = dict((k, v) for k, v in entry_args
+                                 if k in ids)
+                if all(ids[k] == v for k, v in entry_ids.items()):
+                    stale.append(entry_key)
+            for entry_key in stale:
+                del self._entries[entry_key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -1,4 +1,5 @@
 import copy
+import time
 
 from six import string_types
 
@@ -8,9 +9,13 @@ from ubersmith.api import (
     DictResponse,
     IntResponse,
     FileResponse,
+    RequestHandler,
     get_default_request_handler,
 )
+from ubersmith.clean import LazyRecord, clean as _clean
 from ubersmith.exceptions import ValidationError
+from ubersmith.paging import DEFAULT_PAGE_SIZE, paginate
+from ubersmith.tracing import NO_OP_TRACER
 
 __all__ = [
     # abstract call classes
@@ -33,6 +38,10 @@ class BaseCall(object):
     method = ''  # ubersmith method name, should be defined on child classes
     required_fields = []  # field names that should be present in request_data
     cleaner = None  # function to clean response (see ubersmith.clean)
+    copy_data = None  # deep copy data before cleaning (None: handler's)
+    retry_policy = None  # overrides the handler's (see ubersmith.retry)
+    stream = False  # read file responses as they're accessed
+    paging = None  # (offset, limit) argument names (see ubersmith.paging)
 
     def __init__(self, request_data=None, request_handler=None):
         """Setup call with provided request data and handler."""
@@ -43,14 +52,50 @@ class BaseCall(object):
 
     def render(self):
         """Validate, process, clean and return the result of the call."""
-        if not self.validate():
-            raise ValidationError
+        with self._span('ubersmith.call') as span:
+            with self._span('ubersmith.validate'):
+                valid = self.validate()
+            if not valid:
+                raise ValidationError
 
-        self.process_request()
-        self.clean()
+            self.process_request()
+            self.clean()
 
+        self.attach_timings(span)
         return self.response
 
+    def attach_timings(self, span):
+        """Put the timings of a profiled call span on the response."""
+        timings = getattr(span, 'timings', None)
+        if timings is not None:
+            self.response.timings = timings
+
+    def _span(self, name):
+        """Return a context manager tracing a phase of the call."""
+        tracer = self.request_handler.tracer if isinstance(
+            self.request_handler, RequestHandler) else NO_OP_TRACER
+        return tracer.start_as_current_span(
+            name, attributes={'ubersmith.method': self.method})
+
+    def iter(self):
+        """Validate and process the call, yield cleaned (key, value) pairs.
+
+        The response data is read, parsed and cleaned one item at a time
+        instead of all at once, for list methods with huge responses.
+
+        """
+        self._validate_iter()
+        items = self.request_handler.stream_request(
+            self.method, self.request_data, retry_policy=self.retry_policy)
+        return (self.clean_item(k, v) for k, v in items)
+
+    def _validate_iter(self):
+        if not self.validate():
+            raise ValidationError
+        if self.cleaner is not None and not isinstance(self.cleaner, _clean):
+            raise TypeError("{0} can't be cleaned item by item.".format(
+                self.method))
+
     def validate(self):
         """Validate request data before sending it out. Return True/False."""
         # check if required_fields aren't present
@@ -64,23 +109,62 @@ class BaseCall(object):
     def process_request(self):
         """Processing the call and set response_data."""
         self.response = self.request_handler.process_request(
-            self.method, self.request_data)
+            self.method, self.request_data, retry_policy=self.retry_policy,
+            stream=self.stream)
 
     def clean(self):
         """Clean response."""
+        metrics = self.request_handler.metrics if isinstance(
+            self.request_handler, RequestHandler) else None
+        with self._span('ubersmith.clean'):
+            if metrics is None:
+                return self._clean()
+            started = time.time()
+            self._clean()
+            metrics.on_clean(self.method, time.time() - started)
+
+    def _clean(self):
         if self.response.type == 'application/json':
-            cleaned = copy.deepcopy(self.response.data)
-            if self.cleaner is not None:
+            # cleaners build new containers and leave the decoded response
+            # alone, only what they don't clean is shared with response.json
+            cleaned = self.response.data
+            if self._copy_data():
+                with self._span('ubersmith.copy'):
+                    cleaned = copy.deepcopy(cleaned)
+            elif self.cleaner is None and isinstance(cleaned, (dict, list)):
+                # nothing builds a new container, don't hand out the
+                # response's own
+                cleaned = copy.copy(cleaned)
+            if isinstance(self.cleaner, _clean) and self._lazy():
+                cleaned = self.cleaner(cleaned, lazy=True)
+            elif self.cleaner is not None:
                 cleaned = self.cleaner(cleaned)
 
             typed_response = {
                 dict: DictResponse,
+                LazyRecord: DictResponse,
                 int: IntResponse,
             }.get(type(cleaned), BaseResponse)
             self.response = typed_response.from_cleaned(self.response, cleaned)
         else:
             self.response = FileResponse(self.response.response)
 
+    def _copy_data(self):
+        if self.copy_data is not None:
+            return self.copy_data
+        return isinstance(self.request_handler, RequestHandler) and \
+            self.request_handler.copy_data
+
+    def _lazy(self):
+        return isinstance(self.request_handler, RequestHandler) and \
+            self.request_handler.lazy
+
+    def clean_item(self, key, value):
+        """Clean one (key, value) pair of the response data."""
+        if self.cleaner is None:
+            return key, value
+        return self.cleaner.clean_item(key, value)
+
 
 def _get_call_class(method):
     """Find the call class for method if it exists else create one."""
@@ -113,6 +197,20 @@ class GenericCall(object):
     def __call__(self, **kwargs):
         return self.call_class(kwargs, self.request_handler).render()
 
+    def iter(self, **kwargs):
+        """Return an iterator of the call's cleaned (key, value) pairs."""
+        return self.call_class(kwargs, self.request_handler).iter()
+
+    def pages(self, limit=DEFAULT_PAGE_SIZE, prefetch=True, **kwargs):
+        """Return an iterator of cleaned (key, record) pairs over all pages.
+
+            limit: records to request per page
+            prefetch: request the next page while the current one is used
+
+        """
+        return paginate(self.call_class, kwargs, self.request_handler,
+                        limit, prefetch)
+
 
 def generate_generic_calls(base, ns):
     # get all valid methods with base
@@ -18,6 +18,7 @@ __all__ = [
     'PaymentMethodListCall',
     'InvoiceCountCall',
     'InvoicePaymentsCall',
+    'AvatarGetCall',
     'InvoiceGet',
     'InvoiceList',
     'CreditListCall',
@@ -53,6 +54,7 @@ class GetCall(BaseCall):
 
 class ListCall(BaseCall):
     method = _('list')
+    paging = ('offset', 'limit')
     cleaner = clean(dict, keys='int', values=_CLIENT_CLEANER)
 
 
@@ -75,9 +77,20 @@ class InvoicePaymentsCall(BaseCall):
     }))
 
 
+class AvatarGetCall(BaseCall):
+    method = _('avatar_get')
+    stream = True
+
+
 class InvoiceGet(BaseCall):
     method = _('invoice_get')
     required_fields = ['invoice_id']
+
+    @property
+    def stream(self):
+        # pdf, html, xml and csv invoices are returned as files
+        return self.request_data.get('format', 'json') != 'json'
+
     cleaner = clean(dict, values={
         'clientid': 'int',
         'invid': 'int',
@@ -90,6 +103,7 @@ class InvoiceGet(BaseCall):
 
 class InvoiceList(BaseCall):
     method = _('invoice_list')
+    paging = ('offset', 'limit')
     cleaner = clean(dict, keys='int', values=clean(dict, values={
         'clientid': 'int',
         'invid': 'int',
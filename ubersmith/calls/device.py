@@ -13,6 +13,7 @@ from ubersmith.utils import prepend_base
 __all__ = [
     'ConnectionListCall',
     'GetCall',
+    'IpGroupListCall',
     'ListCall',
     # 'ModuleGraphCall',
     'MonitorListCall',
@@ -75,8 +76,14 @@ class GetCall(BaseCall):
     cleaner = _DEVICE_CLEANER
 
 
+class IpGroupListCall(BaseCall):
+    method = _('ip_group_list')
+    paging = ('offset', 'limit')
+
+
 class ListCall(BaseCall):
     method = _('list')
+    paging = ('offset', 'limit')
     cleaner = clean(dict, keys='int', values=_DEVICE_CLEANER)
 
 
@@ -107,6 +114,7 @@ class ModuleGraphCall(BaseCall):
 class MonitorListCall(BaseCall):
     method = _('monitor_list')
     required_fields = ['protocol']
+    paging = ('offset', 'limit')
     cleaner = clean(dict, keys='int', values=clean(dict, values={
         'dev': 'int',
         'script_id': 'int',
@@ -40,6 +40,7 @@ class GetCall(BaseCall):
 
 class ListCall(BaseCall):
     method = _('list')
+    paging = ('offset', 'limit')
     cleaner = clean(dict, keys='int', values=clean(dict, values={
         'order_id': 'int',
         'priority': 'int',
@@ -6,13 +6,16 @@ ubersmith.calls.BaseCall.
 
 """
 
-# from ubersmith.calls import BaseCall, GroupCall
+from ubersmith.calls import BaseCall
 from ubersmith.utils import prepend_base
 
-__all__ = []
+__all__ = [
+    'OpportunityListCall',
+]
 
 _ = prepend_base(__name__.split('.')[-1])
 
 
-# class (BaseCall):
-#     method = _('')
+class OpportunityListCall(BaseCall):
+    method = _('opportunity_list')
+    paging = ('offset', 'limit')
@@ -6,13 +6,23 @@ ubersmith.calls.BaseCall.
 
 """
 
-# from ubersmith.calls import BaseCall, GroupCall
+from ubersmith.calls import BaseCall
 from ubersmith.utils import prepend_base
 
-__all__ = []
+__all__ = [
+    'TicketListCall',
+    'TicketPostListCall',
+]
 
 _ = prepend_base(__name__.split('.')[-1])
 
 
-# class (BaseCall):
-#     method = _('')
+class TicketListCall(BaseCall):
+    method = _('ticket_list')
+    paging = ('offset', 'limit')
+
+
+class TicketPostListCall(BaseCall):
+    method = _('ticket_post_list')
+    required_fields = ['ticket_id']
+    paging = ('offset', 'limit')
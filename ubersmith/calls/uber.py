@@ -12,10 +12,14 @@ from ubersmith.utils import prepend_base
 
 __all__ = [
     'ApiExportCall',
+    'AttachmentGetCall',
     'CheckLoginCall',
     'ClientWelcomeStatsCall',
     'MethodGetCall',
     'DocumentationCall',
+    'EventListCall',
+    'FileGetCall',
+    'MailListCall',
 ]
 
 _ = prepend_base(__name__.split('.')[-1])
@@ -24,6 +28,13 @@ _ = prepend_base(__name__.split('.')[-1])
 class ApiExportCall(BaseCall):
     method = _('api_export')
     required_fields = ['table']
+    stream = True
+
+
+class AttachmentGetCall(BaseCall):
+    method = _('attachment_get')
+    required_fields = ['attach_type', 'attach_id']
+    stream = True
 
 
 class CheckLoginCall(BaseCall):
@@ -56,3 +67,19 @@ class MethodGetCall(BaseCall):
 
 class DocumentationCall(BaseCall):
     method = _('documentation')
+    stream = True
+
+
+class EventListCall(BaseCall):
+    method = _('event_list')
+    paging = ('offset', 'limit')
+
+
+class FileGetCall(BaseCall):
+    method = _('file_get')
+    stream = True
+
+
+class MailListCall(BaseCall):
+    method = _('mail_list')
+    paging = ('offset', 'limit')
@@ -6,6 +6,10 @@ try:
     import __builtin__ as builtins
 except ImportError:  # pragma: no cover
     import builtins
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # pragma: no cover
+    from collections import MutableMapping
 
 import phpserialize
 
@@ -55,8 +59,205 @@ def int(val):
     return builtins.int(val)
 
 
+_MISSING = object()
+
+
+class LazyRecord(MutableMapping):
+    """Dict of a record that cleans each field when it's first read.
+
+    Cleaned fields are kept, so every field is cleaned at most once.  The
+    record's dict is shared with the response until the record is changed.
+    Equality, iteration and the rest of the dict interface work like they
+    do on the eagerly cleaned dict, use dict(record) for a real one.
+
+    """
+    __slots__ = ('_data', '_cleaned', '_cleaners', '_raises', '_owned')
+
+    def __init__(self, data, cleaners, raises=False, owned=False):
+        self._data = data  # fields as sent by ubersmith
+        self._cleaned = {}  # fields cleaned or set so far
+        self._cleaners = cleaners  # field -> cleaner
+        self._raises = raises
+        self._owned = owned  # if _data can be changed
+        if raises:
+            for key in cleaners:
+                if key not in data:
+                    raise KeyError(key)
+
+    def __getitem__(self, key):
+        cleaned = self._cleaned
+        if key in cleaned:
+            return cleaned[key]
+        value = self._data[key]
+        cleaner = self._cleaners.get(key)
+        if cleaner is None:
+            return value
+        try:
+            value = cleaner(value)
+        except KeyError:
+            # raised by nested cleaners, silenced like when cleaning eagerly
+            if self._raises:
+                raise
+        cleaned[key] = value
+        return value
+
+    def _own(self):
+        if not self._owned:
+            self._data = dict(self._data)
+            self._owned = True
+
+    def __setitem__(self, key, value):
+        self._own()
+        self._data[key] = self._cleaned[key] = value
+
+    def __delitem__(self, key):
+        self._own()
+        del self._data[key]
+        self._cleaned.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def copy(self):
+        return dict(self)
+
+    def __json__(self):
+        return unlazy(self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+def unlazy(value):
+    """Return value with its LazyRecords, nested ones too, as dicts."""
+    if isinstance(value, (dict, LazyRecord)):
+        return dict((k, unlazy(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return [unlazy(v) for v in value]
+    return value
+
+
+def _compile_spec(spec, lazy):
+    """Return a keys or values spec with its nested cleaners compiled."""
+    if isinstance(spec, clean):
+        return spec.compile(lazy)
+    if spec is None or callable(spec):
+        return spec
+    return dict((k, _compile_spec(v, lazy)) for k, v in spec.items())
+
+
+def _compile_keys(keys):
+    if callable(keys):
+        def clean_keys(val):
+            tmp = {}
+            for k, v in val.items():
+                tmp[keys(k)] = v
+            return tmp
+    else:
+        get_cleaner = keys.get
+
+        def clean_keys(val):
+            tmp = {}
+            for k, v in val.items():
+                cleaner = get_cleaner(k)
+                tmp[k if cleaner is None else cleaner(k)] = v
+            return tmp
+    return clean_keys
+
+
+def _compile_dict_values(values, raises):
+    if callable(values):
+        def clean_values(val):
+            for k, v in val.items():
+                val[k] = values(v)
+        return clean_values
+
+    cleaners = tuple(values.items())
+
+    def clean_values(val):
+        get = val.get
+        for k, cleaner in cleaners:
+            v = get(k, _MISSING)
+            if v is _MISSING:
+                if raises:
+                    raise KeyError(k)
+                continue
+            try:
+                val[k] = cleaner(v)
+            except KeyError:
+                # raised by nested cleaners, silenced like absent keys
+                if raises:
+                    raise
+    return clean_values
+
+
+def _compile_lazy_dict(keys, values, raises):
+    clean_keys = None if keys is None else _compile_keys(keys)
+
+    def clean_dict(val):
+        if clean_keys is not None:
+            val = clean_keys(val if type(val) is dict else dict(val))
+            return LazyRecord(val, values, raises, owned=True)
+        if type(val) is not dict:
+            return LazyRecord(dict(val), values, raises, owned=True)
+        return LazyRecord(val, values, raises)
+    return clean_dict
+
+
+def _compile_dict(keys, values, raises):
+    clean_keys = None if keys is None else _compile_keys(keys)
+    clean_values = None if values is None else \
+        _compile_dict_values(values, raises)
+
+    if clean_keys is None and clean_values is None:
+        return dict
+    if clean_values is None:
+        def clean_dict(val):
+            return clean_keys(val if type(val) is dict else dict(val))
+    elif clean_keys is None:
+        def clean_dict(val):
+            val = dict(val)
+            clean_values(val)
+            return val
+    else:
+        def clean_dict(val):
+            val = clean_keys(val if type(val) is dict else dict(val))
+            clean_values(val)
+            return val
+    return clean_dict
+
+
+def _compile_list(values, raises):
+    if values is None:
+        return list
+    if callable(values):
+        def clean_list(val):
+            return [values(element) for element in val]
+        return clean_list
+
+    cleaners = tuple(values.items())
+
+    def clean_list(val):
+        val = list(val)
+        for i, cleaner in cleaners:
+            try:
+                val[i] = cleaner(val[i])
+            except IndexError:
+                if raises:
+                    raise
+        return val
+    return clean_list
+
+
 class clean(object):
     def __init__(self, cleaner, keys=None, values=None, raises=False):
+        self._compiled = {}  # lazy -> compiled function, see compile()
         self.cleaner = cleaner if callable(cleaner) else _CLEANERS[cleaner]
         if keys is not None and not callable(keys):
             if type(keys) is dict:
@@ -75,64 +276,52 @@ class clean(object):
         self.values = values
         self.raises = raises
 
-    def __call__(self, val):
-        val = self.cleaner(val)
+    def __call__(self, val, lazy=False):
+        """Clean val, with lazy dicts of records become LazyRecords."""
+        try:
+            compiled = self._compiled[lazy]
+        except KeyError:
+            compiled = self._compiled[lazy] = self.compile(lazy)
+        return compiled(val)
+
+    def compile(self, lazy=False):
+        """Return a function cleaning values the way this cleaner does.
+
+        The spec is looked at once and turned into closures specialized to
+        it, nested cleaners included, instead of being interpreted on every
+        call.  Changes made to the spec afterwards aren't seen by the
+        returned function.
+
+        With lazy, dicts with cleaners for specific values are returned as
+        LazyRecords that clean those values when they're first read.
+
+        """
+        if self.cleaner is dict:
+            keys = _compile_spec(self.keys, lazy)
+            values = _compile_spec(self.values, lazy)
+            if lazy and values is not None and not callable(values):
+                return _compile_lazy_dict(keys, values, self.raises)
+            return _compile_dict(keys, values, self.raises)
         if self.cleaner is list:
-            val = self._clean_list(val)
-        elif self.cleaner is dict:
-            val = self._clean_dict(val)
-        return val
+            return _compile_list(_compile_spec(self.values, lazy),
+                                 self.raises)
+        return self.cleaner
 
-    def _clean_list(self, val):
-        # TODO: factor keys/values cleaning out to methods
-        # clean values
-        if self.values is not None:
-            if callable(self.values):
-                # apply cleaner to all elements
-                cleaner = self.values
-                for i, element in enumerate(val):
-                    val[i] = cleaner(element)
-            else:
-                # apply cleaners to specific values
-                for i, cleaner in self.values.items():
-                    try:
-                        val[i] = cleaner(val[i])
-                    except IndexError as e:
-                        if self.raises:
-                            raise e
-        return val
+    def clean_item(self, key, val):
+        """Clean one key/value of a dict or index/element of a list.
 
-    def _clean_dict(self, val):
-        # TODO: factor keys/values cleaning out to methods
-        # clean keys
-        if self.keys is not None:
-            tmp = {}
+        Returns the (key, value) pair as cleaning the whole dict or list
+        would, so containers can be cleaned as they're read.
+
+        """
+        if self.cleaner is dict and self.keys is not None:
             if callable(self.keys):
-                # apply cleaner to all keys
-                cleaner = self.keys
-                for k, v in val.items():
-                    tmp[cleaner(k)] = v
+                key = self.keys(key)
             else:
-                # apply cleaners to specific keys
-                for k, v in val.items():
-                    cleaner = self.keys.get(k, lambda x: x)
-                    tmp[cleaner(k)] = val[k]
-            val = tmp
-
-        # TODO: factor keys/values cleaning out to methods
-        # clean values
-        if self.values is not None:
+                key = self.keys.get(key, lambda x: x)(key)
+        if self.cleaner in (dict, list) and self.values is not None:
             if callable(self.values):
-                # apply cleaner to all elements
-                cleaner = self.values
-                for k, v in val.items():
-                    val[k] = cleaner(val[k])
-            else:
-                # apply cleaners to specific values
-                for k, cleaner in self.values.items():
-                    try:
-                        val[k] = cleaner(val[k])
-                    except KeyError as e:
-                        if self.raises:
-                            raise e
-        return val
+                val = self.values(val)
+            elif key in self.values:
+                val = self.values[key](val)
+        return key, val
@@ -1,5 +1,6 @@
 from six.moves import builtins
 import io
+import os
 
 
 # taken from functools.total_ordering
@@ -32,3 +33,26 @@ def total_ordering(cls):  # pragma: no cover
 
 
 file_type = file if hasattr(builtins, 'file') else io.IOBase
+
+try:
+    from contextlib import nullcontext
+except ImportError:  # pragma: no cover
+    class nullcontext(object):
+        """Context manager that does nothing, see contextlib.nullcontext."""
+        def __init__(self, enter_result=None):
+            self.enter_result = enter_result
+
+        def __enter__(self):
+            return self.enter_result
+
+        def __exit__(self, *exc_info):
+            return False
+
+try:
+    from os import replace
+except ImportError:  # pragma: no cover
+    def replace(src, dst):
+        """Rename src to dst even if dst exists, see os.replace."""
+        if os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
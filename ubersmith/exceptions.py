@@ -4,9 +4,12 @@ __all__ = [
     'UbersmithError',
     'RequestError',
     'ValidationError',
+    'CircuitOpenError',
+    'RateLimitExceeded',
     'ResponseError',
     'UpdatingTokenResponse',
     'MaintenanceResponse',
+    'ServerErrorResponse',
 ]
 
 
@@ -30,6 +33,32 @@ class ValidationError(RequestError):
     msg = "The request data was invalid for the Ubersmith request."
 
 
+class CircuitOpenError(RequestError):
+    """Exception raised instead of sending requests while a circuit is open.
+
+        retry_after: seconds until the circuit breaker lets a probe through
+
+    """
+    msg = "Circuit breaker is open, not sending requests to Ubersmith."
+
+    def __init__(self, msg=None, retry_after=None):
+        super(CircuitOpenError, self).__init__(msg)
+        self.retry_after = retry_after
+
+
+class RateLimitExceeded(RequestError):
+    """Exception raised when the client side rate limit has no budget left.
+
+        retry_after: seconds until a request would be allowed
+
+    """
+    msg = "Rate limit for requests to the Ubersmith API exceeded."
+
+    def __init__(self, msg=None, retry_after=None):
+        super(RateLimitExceeded, self).__init__(msg)
+        self.retry_after = retry_after
+
+
 class ResponseError(UbersmithError):
     """Exception for Ubersmith API Response.
 
@@ -54,3 +83,18 @@ class UpdatingTokenResponse(ResponseError):
 
 class MaintenanceResponse(ResponseError):
     msg = "Ubersmith is currently undergoing maintenance."
+
+
+class ServerErrorResponse(ResponseError):
+    """Exception for HTTP 5xx responses from Ubersmith.
+
+        status_code: HTTP status of the response
+
+    """
+    msg = "Ubersmith responded with a server error."
+
+    def __init__(self, msg=None, response=None, status_code=None):
+        super(ServerErrorResponse, self).__init__(msg, response)
+        self.status_code = status_code
+        if status_code is not None:
+            self.msg = '{0} HTTP {1}'.format(self.msg, status_code)
@@ -0,0 +1,195 @@
+"""Export big tables with uber.api_export in parallel partitions.
+
+An export is split into partitions, each one an uber.api_export request with
+extra arguments selecting part of the table.  Partitions are downloaded on a
+thread pool over one request handler and written straight to disk.  A
+checkpoint file records every finished partition so running the same export
+again after a crash only downloads what's missing:
+
+    exporter = ApiExporter('tickets', '/var/exports',
+                           partitions=id_ranges(1, 500000, 50000,
+                                                'ticket_id_min',
+                                                'ticket_id_max'))
+    for partition in exporter.run():
+        print(partition.path, partition.size)
+
+"""
+from collections import namedtuple
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+import json
+import os
+import threading
+
+from ubersmith.api import get_default_request_handler
+from ubersmith.batch import DEFAULT_MAX_WORKERS
+from ubersmith.calls.uber import ApiExportCall
+from ubersmith.compat import replace
+from ubersmith.exceptions import ValidationError
+
+__all__ = [
+    'ApiExporter',
+    'ExportPartition',
+    'id_ranges',
+    'offset_windows',
+]
+
+
+class ExportPartition(namedtuple('ExportPartition', [
+        'index', 'args', 'path', 'size', 'checksum'])):
+    """A finished partition of an export.
+
+        index: position of the partition in the export
+        args: extra uber.api_export arguments selecting the partition
+        path: file the partition was written to
+        size: bytes written
+        checksum: hex digest of the file or None
+
+    """
+    __slots__ = ()
+
+
+def offset_windows(total, size, offset_arg='offset', limit_arg='limit'):
+    """Return partition arguments covering total rows size rows at a time."""
+    if size < 1:
+        raise ValueError("size must be positive")
+    return [{offset_arg: offset, limit_arg: size}
+            for offset in range(0, total, size)]
+
+
+def id_ranges(start, stop, size, min_arg, max_arg):
+    """Return partition arguments covering ids start to stop inclusive,
+    size ids at a time."""
+    if size < 1:
+        raise ValueError("size must be positive")
+    return [{min_arg: low, max_arg: min(low + size - 1, stop)}
+            for low in range(start, stop + 1, size)]
+
+
+class ApiExporter(object):
+    """Downloads a table export partition by partition.
+
+        table: table to export, see uber.api_export
+        directory: where partition files and the checkpoint are written
+        partitions: list of dicts of extra arguments, one per partition, by
+                    default the whole table is exported as one partition
+        request_handler: handler whose session all partitions share
+        max_workers: number of partitions downloaded at once
+        gzip: ask ubersmith to gzip the files
+        order_by: field to order rows by
+        checksum: hashlib algorithm name to digest files with or None
+
+    uber.api_export only documents table, gzip and order_by, partition
+    arguments have to be ones your ubersmith install filters the export by.
+
+    """
+
+    def __init__(self, table, directory, partitions=None,
+                 request_handler=None, max_workers=DEFAULT_MAX_WORKERS,
+                 gzip=False, order_by=None, checksum='sha256'):
+        self.table = table
+        self.directory = directory
+        self.partitions = [dict(p) for p in partitions or [{}]]
+        self.request_handler = request_handler or \
+            get_default_request_handler()
+        self.max_workers = max_workers
+        self.checksum = checksum
+        self.request_data = {'table': table}
+        if gzip:
+            self.request_data['gzip'] = 1
+        if order_by is not None:
+            self.request_data['order_by'] = order_by
+        self._lock = threading.Lock()
+
+    @property
+    def checkpoint_path(self):
+        return os.path.join(self.directory,
+                            '{0}.checkpoint.json'.format(self.table))
+
+    def partition_path(self, index):
+        """Return the file partition index is written to."""
+        ext = '.csv.gz' if self.request_data.get('gzip') else '.csv'
+        return os.path.join(self.directory, '{0}.{1:05d}{2}'.format(
+            self.table, index, ext))
+
+    def _load_checkpoint(self):
+        """Return finished partitions recorded by an earlier run."""
+        try:
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+        except (IOError, OSError):
+            return {}
+        if checkpoint['request_data'] != self.request_data or \
+                checkpoint['partitions'] != self.partitions:
+            raise ValueError(
+                "{0} belongs to a different export, remove it to start "
+                "over.".format(self.checkpoint_path))
+        done = {}
+        for index, (size, checksum) in checkpoint['completed'].items():
+            index = int(index)
+            path = self.partition_path(index)
+            # files that went missing or changed are downloaded again
+            if os.path.exists(path) and os.path.getsize(path) == size:
+                done[index] = ExportPartition(
+                    index, self.partitions[index], path, size, checksum)
+        return done
+
+    def _save_checkpoint(self, done):
+        checkpoint = {
+            'request_data': self.request_data,
+            'partitions': self.partitions,
+            'completed': dict((str(p.index), [p.size, p.checksum])
+                              for p in done.values()),
+        }
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f, sort_keys=True)
+        replace(tmp_path, self.checkpoint_path)
+
+    def _download(self, index, done):
+        data = dict(self.request_data)
+        data.update(self.partitions[index])
+        response = ApiExportCall(data, self.request_handler).render()
+        path = self.partition_path(index)
+        # only complete files ever get the partition's name
+        tmp_path = path + '.part'
+        saved = response.save_to(tmp_path, checksum=self.checksum)
+        replace(tmp_path, path)
+        partition = ExportPartition(index, self.partitions[index], path,
+                                    saved.size, saved.checksum)
+        with self._lock:
+            done[index] = partition
+            self._save_checkpoint(done)
+        return partition
+
+    def pending(self):
+        """Return indexes of partitions not finished by an earlier run."""
+        done = self._load_checkpoint()
+        return [i for i in range(len(self.partitions)) if i not in done]
+
+    def run(self):
+        """Download every unfinished partition, return all ExportPartitions
+        in order.
+
+        The first failing partition's exception is raised once partitions
+        already downloading have finished, finished ones stay checkpointed.
+
+        """
+        if not ApiExportCall(self.request_data,
+                             self.request_handler).validate():
+            raise ValidationError
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        done = self._load_checkpoint()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = [executor.submit(self._download, i, done)
+                       for i in range(len(self.partitions)) if i not in done]
+            wait(futures, return_when=FIRST_EXCEPTION)
+            for future in futures:
+                future.cancel()
+        finally:
+            executor.shutdown(wait=True)
+        for future in futures:
+            if not future.cancelled() and future.exception() is not None:
+                raise future.exception()
+        return [done[i] for i in sorted(done)]
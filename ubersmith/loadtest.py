@@ -0,0 +1,358 @@
+"""Drive a handler with a mix of calls and check for regressions.
+
+Used by bin/loadtest, which runs calls against a base URL, or a local
+FakeUbersmith, and compares the results to a stored baseline:
+
+    bin/loadtest --fake --concurrency 16 --duration 30 --save run.json
+    bin/loadtest --fake --concurrency 16 --duration 30 --baseline run.json
+
+The same can be done from python:
+
+    result = LoadTest(h, concurrency=16, duration=30).run()
+    print(format_result(result))
+    regressions = compare(result, json.load(open('run.json')))
+
+"""
+from __future__ import print_function
+
+import argparse
+from collections import namedtuple
+import json
+import random
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+from ubersmith.api import RequestHandler
+from ubersmith.metrics import MetricsCollector
+from ubersmith.utils import resolve_call
+
+__all__ = [
+    'DEFAULT_MIX',
+    'LoadTest',
+    'LoadTestResult',
+    'MixEntry',
+    'compare',
+    'format_result',
+    'load_mix',
+    'main',
+]
+
+
+class MixEntry(namedtuple('MixEntry', ['method', 'weight', 'args'])):
+    """A call in the mix of a load test.
+
+        method: ubersmith method string
+        weight: how often the call is made relative to the others
+        args: dict of call arguments, a list value is a list of choices
+              one is picked from at random for every call
+
+    """
+    __slots__ = ()
+
+    def __new__(cls, method, weight=1, args=None):
+        return super(MixEntry, cls).__new__(cls, method, weight, args or {})
+
+
+# records the default FakeUbersmith serves
+DEFAULT_MIX = [
+    MixEntry('client.get', 10, {'client_id': list(range(1, 1001))}),
+    MixEntry('device.get', 5, {'device_id': list(range(1, 1001))}),
+    MixEntry('order.get', 3, {'order_id': list(range(1, 1001))}),
+    MixEntry('client.list', 1, {'limit': 100,
+                                'offset': list(range(0, 1000, 100))}),
+    MixEntry('device.list', 1, {'limit': 100,
+                                'offset': list(range(0, 1000, 100))}),
+]
+
+
+class LoadTestResult(namedtuple('LoadTestResult', [
+        'requests', 'errors', 'retries', 'duration', 'throughput', 'p50',
+        'p95', 'p99', 'error_rate', 'retry_rate', 'peak_rss'])):
+    """Results of a load test, latencies in seconds.
+
+        requests: calls made
+        errors: dict of exception names to the calls that failed with them
+        retries: attempts retried by the handler's retry policy
+        duration: seconds the test ran for
+        throughput: calls per second
+        p50, p95, p99: call latency percentiles
+        error_rate: fraction of calls that failed
+        retry_rate: retried attempts per call
+        peak_rss: peak resident memory of the process in bytes or None
+
+    """
+    __slots__ = ()
+
+
+def _percentile(values, fraction):
+    """Return the nearest-rank percentile of sorted values."""
+    if not values:
+        return 0.0
+    rank = int(round(fraction * len(values) + 0.5)) - 1
+    return values[min(max(rank, 0), len(values) - 1)]
+
+
+def _peak_rss():
+    if resource is None:  # pragma: no cover
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macOS
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class LoadTest(object):
+    """Makes calls from a mix on concurrent threads.
+
+        request_handler: handler to make the calls on
+        mix: list of MixEntries, DEFAULT_MIX by default
+        concurrency: calls in flight at once
+        rate: calls to start per second over all threads, as fast as
+              possible by default
+        duration: seconds to make calls for
+        requests: stop after this many calls instead
+        seed: seed picking calls and arguments
+
+    With a rate latencies are measured from when a call was due, calls
+    held up by slow ones still count the wait.
+
+    """
+
+    def __init__(self, request_handler, mix=None, concurrency=8, rate=None,
+                 duration=10.0, requests=None, seed=None):
+        self.request_handler = request_handler
+        self.mix = list(DEFAULT_MIX if mix is None else mix)
+        self.concurrency = concurrency
+        self.rate = rate
+        self.duration = duration
+        self.requests = requests
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _next(self):
+        """Return (due, method, kwargs) of the next call or None when done."""
+        with self._lock:
+            if self.requests is not None and self._started >= self.requests:
+                return None
+            if self.rate:
+                due = self._start + self._started / float(self.rate)
+            else:
+                due = time.time()
+            if self.requests is None and due >= self._end:
+                return None
+            self._started += 1
+            entry = self._random.choice(self._weighted)
+            kwargs = dict(
+                (k, self._random.choice(v) if isinstance(v, list) else v)
+                for k, v in entry.args.items())
+        return due, entry.method, kwargs
+
+    def _worker(self):
+        while True:
+            call = self._next()
+            if call is None:
+                return
+            due, method, kwargs = call
+            wait = due - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            error = None
+            try:
+                resolve_call(self.request_handler, method)(**kwargs)
+            except Exception as e:
+                # connection errors, timeouts and bugs count as well, a
+                # worker dying would stop the test short
+                error = type(e).__name__
+            latency = time.time() - due
+            with self._lock:
+                self._latencies.append(latency)
+                if error is not None:
+                    self._errors[error] = self._errors.get(error, 0) + 1
+
+    def run(self):
+        """Run the test and return a LoadTestResult."""
+        handler = self.request_handler
+        collector = MetricsCollector()
+        metrics = handler.metrics
+        handler.metrics = collector
+        self._weighted = [entry for entry in self.mix
+                          for _ in range(entry.weight)]
+        self._latencies, self._errors, self._started = [], {}, 0
+        self._start = time.time()
+        self._end = self._start + self.duration
+        threads = [threading.Thread(target=self._worker)
+                   for _ in range(self.concurrency)]
+        try:
+            for thread in threads:
+                thread.daemon = True
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            handler.metrics = metrics
+        duration = time.time() - self._start
+
+        latencies = sorted(self._latencies)
+        requests = len(latencies)
+        errors = sum(self._errors.values())
+        retries = sum(collector.retries.values())
+        return LoadTestResult(
+            requests=requests,
+            errors=dict(self._errors),
+            retries=retries,
+            duration=duration,
+            throughput=requests / duration if duration else 0.0,
+            p50=_percentile(latencies, .5),
+            p95=_percentile(latencies, .95),
+            p99=_percentile(latencies, .99),
+            error_rate=float(errors) / requests if requests else 0.0,
+            retry_rate=float(retries) / requests if requests else 0.0,
+            peak_rss=_peak_rss(),
+        )
+
+
+def format_result(result):
+    """Return a LoadTestResult as a human readable report."""
+    lines = [
+        'requests    {0}'.format(result.requests),
+        'duration    {0:.2f}s'.format(result.duration),
+        'throughput  {0:.1f}/s'.format(result.throughput),
+        'latency     p50 {0:.1f}ms  p95 {1:.1f}ms  p99 {2:.1f}ms'.format(
+            result.p50 * 1000, result.p95 * 1000, result.p99 * 1000),
+        'errors      {0:.2%}{1}'.format(result.error_rate, ''.join(
+            '  {0}: {1}'.format(k, v)
+            for k, v in sorted(result.errors.items()))),
+        'retries     {0:.2%}'.format(result.retry_rate),
+    ]
+    if result.peak_rss is not None:
+        lines.append('peak rss    {0:.1f}MB'.format(
+            result.peak_rss / 1024.0 / 1024))
+    return '\n'.join(lines) + '\n'
+
+
+# (field, higher is better)
+_COMPARED = [
+    ('throughput', True),
+    ('p50', False),
+    ('p95', False),
+    ('p99', False),
+    ('peak_rss', False),
+]
+
+
+def compare(result, baseline, tolerance=0.25, rate_tolerance=0.01):
+    """Return descriptions of how result regressed from baseline.
+
+        result: LoadTestResult of this run
+        baseline: dict of a stored LoadTestResult, see LoadTestResult._asdict
+        tolerance: fraction throughput, latencies and memory may get worse
+        rate_tolerance: how much error and retry rates may go up
+
+    """
+    regressions = []
+    for field, higher_is_better in _COMPARED:
+        old, new = baseline.get(field), getattr(result, field)
+        if not old or new is None:
+            continue
+        if higher_is_better:
+            regressed = new < old * (1 - tolerance)
+        else:
+            regressed = new > old * (1 + tolerance)
+        if regressed:
+            regressions.append('{0} went from {1:.4g} to {2:.4g}'.format(
+                field, old, new))
+    for field in ('error_rate', 'retry_rate'):
+        old, new = baseline.get(field) or 0.0, getattr(result, field)
+        if new > old + rate_tolerance:
+            regressions.append('{0} went from {1:.2%} to {2:.2%}'.format(
+                field, old, new))
+    return regressions
+
+
+def load_mix(path):
+    """Return the MixEntries of a JSON file.
+
+    The file holds a list of objects with method and optionally weight and
+    args keys, e.g. [{"method": "client.get", "weight": 5, "args":
+    {"client_id": [1001, 1002]}}].
+
+    """
+    with open(path) as f:
+        return [MixEntry(entry['method'], entry.get('weight', 1),
+                         entry.get('args')) for entry in json.load(f)]
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        description='Load test an Ubersmith API with a mix of calls.')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--url', help='base URL of the Ubersmith API')
+    target.add_argument('--fake', action='store_true',
+                        help='run against a local FakeUbersmith')
+    parser.add_argument('--username')
+    parser.add_argument('--password')
+    parser.add_argument('--mix', help='JSON file of the calls to make')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='calls in flight at once (default 8)')
+    parser.add_argument('--rate', type=float,
+                        help='calls to start per second')
+    parser.add_argument('--duration', type=float, default=10.0,
+                        help='seconds to run for (default 10)')
+    parser.add_argument('--requests', type=int,
+                        help='stop after this many calls instead')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds of latency added by --fake')
+    parser.add_argument('--token-rate', type=float, default=0.0,
+                        help='fraction of "Updating Token" from --fake')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of 500 responses from --fake')
+    parser.add_argument('--baseline',
+                        help='JSON results to compare against, exits with '
+                             '1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='fraction results may be worse than the '
+                             'baseline (default 0.25)')
+    parser.add_argument('--save', help='write the results as JSON to path')
+    return parser
+
+
+def main(argv=None):
+    """Entry point of bin/loadtest, returns the exit status."""
+    args = _parser().parse_args(argv)
+    mix = load_mix(args.mix) if args.mix else None
+    server = None
+    if args.fake:
+        from ubersmith.testing import FakeUbersmith
+        server = FakeUbersmith(
+            latency=args.latency, token_rate=args.token_rate,
+            error_rate=args.error_rate, seed=args.seed).start()
+        url = server.url
+    else:
+        url = args.url
+    try:
+        handler = RequestHandler(url, args.username, args.password,
+                                 pool_maxsize=max(args.concurrency, 1))
+        result = LoadTest(handler, mix, args.concurrency, args.rate,
+                          args.duration, args.requests, args.seed).run()
+    finally:
+        if server is not None:
+            server.stop()
+
+    print(format_result(result), end='')
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(result._asdict(), f, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for regression in regressions:
+            print('REGRESSION: ' + regression)
+        if regressions:
+            return 1
+    return 0
@@ -0,0 +1,194 @@
+"""Instrumentation hooks for request handlers.
+
+Handlers report every request, failed attempt and cleaning to a MetricsHook.
+MetricsCollector keeps them in memory and renders them in the Prometheus
+text format for scraping:
+
+    metrics = MetricsCollector()
+    h = RequestHandler(url, user, password, metrics=metrics)
+    ...
+    body = metrics.render()
+
+"""
+import bisect
+import threading
+
+from ubersmith.exceptions import MaintenanceResponse, UpdatingTokenResponse
+
+__all__ = [
+    'DEFAULT_BUCKETS',
+    'MetricsCollector',
+    'MetricsHook',
+]
+
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1.0, 2.5, 5.0, 10.0,
+                   30.0)
+
+
+class MetricsHook(object):
+    """Receives instrumentation events, every method does nothing."""
+
+    def on_request(self, method, duration, error, request_bytes,
+                   response_bytes):
+        """Called when a request is done, including all of its retries.
+
+            method: ubersmith method string
+            duration: seconds since the request was started
+            error: exception that failed the request or None
+            request_bytes: size of the last attempt's body or None
+            response_bytes: size of the response body or None if unknown,
+                            e.g. for streamed responses
+
+        """
+
+    def on_attempt_failed(self, method, error, delay):
+        """Called when an attempt failed.
+
+            method: ubersmith method string
+            error: exception of the attempt
+            delay: seconds waited before retrying or None if not retried
+
+        """
+
+    def on_clean(self, method, duration):
+        """Called after a call's response was cleaned."""
+
+
+class _Histogram(object):
+    def __init__(self, buckets):
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, buckets, value):
+        self.counts[bisect.bisect_left(buckets, value)] += 1
+        self.sum += value
+
+
+def _labels(**labels):
+    return '{' + ','.join('{0}="{1}"'.format(
+        k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for k, v in sorted(labels.items())) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsCollector(MetricsHook):
+    """Keeps per method metrics in memory.
+
+        buckets: upper bounds of latency histogram buckets in seconds
+        prefix: prepended to every metric name
+
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, prefix='ubersmith_'):
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget everything collected so far."""
+        with self._lock:
+            self.requests = {}  # (method, outcome) -> count
+            self.latency = {}  # method -> _Histogram
+            self.request_bytes = {}  # method -> bytes
+            self.response_bytes = {}  # method -> bytes
+            self.retries = {}  # (method, reason) -> count
+            self.token_wait = {}  # method -> seconds
+            self.maintenance = {}  # method -> count
+            self.clean_time = {}  # method -> _Histogram
+
+    @staticmethod
+    def _add(counter, key, value=1):
+        counter[key] = counter.get(key, 0) + value
+
+    def _observe(self, histograms, method, value):
+        if method not in histograms:
+            histograms[method] = _Histogram(self.buckets)
+        histograms[method].observe(self.buckets, value)
+
+    def on_request(self, method, duration, error, request_bytes,
+                   response_bytes):
+        outcome = 'ok' if error is None else type(error).__name__
+        with self._lock:
+            self._add(self.requests, (method, outcome))
+            self._observe(self.latency, method, duration)
+            if request_bytes is not None:
+                self._add(self.request_bytes, method, request_bytes)
+            if response_bytes is not None:
+                self._add(self.response_bytes, method, response_bytes)
+
+    def on_attempt_failed(self, method, error, delay):
+        with self._lock:
+            if isinstance(error, MaintenanceResponse):
+                self._add(self.maintenance, method)
+            if delay is None:
+                return
+            self._add(self.retries, (method, type(error).__name__))
+            if isinstance(error, UpdatingTokenResponse):
+                self._add(self.token_wait, method, delay)
+
+    def on_clean(self, method, duration):
+        with self._lock:
+            self._observe(self.clean_time, method, duration)
+
+    def _render_counter(self, lines, name, doc, counter, label_names):
+        name = self.prefix + name
+        lines.append('# HELP {0} {1}'.format(name, doc))
+        lines.append('# TYPE {0} counter'.format(name))
+        for key, value in sorted(counter.items()):
+            if not isinstance(key, tuple):
+                key = (key,)
+            lines.append('{0}{1} {2}'.format(
+                name, _labels(**dict(zip(label_names, key))), _number(value)))
+
+    def _render_histogram(self, lines, name, doc, histograms):
+        name = self.prefix + name
+        lines.append('# HELP {0} {1}'.format(name, doc))
+        lines.append('# TYPE {0} histogram'.format(name))
+        for method, histogram in sorted(histograms.items()):
+            count = 0
+            for bound, n in zip(self.buckets + ('+Inf',), histogram.counts):
+                count += n
+                le = bound if isinstance(bound, str) else _number(bound)
+                lines.append('{0}_bucket{1} {2}'.format(
+                    name, _labels(method=method, le=le), count))
+            lines.append('{0}_sum{1} {2}'.format(
+                name, _labels(method=method), _number(histogram.sum)))
+            lines.append('{0}_count{1} {2}'.format(
+                name, _labels(method=method), count))
+
+    def render(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            self._render_counter(
+                lines, 'requests_total', 'Requests by method and outcome.',
+                self.requests, ('method', 'outcome'))
+            self._render_histogram(
+                lines, 'request_duration_seconds',
+                'Request latency including retries.', self.latency)
+            self._render_counter(
+                lines, 'request_bytes_total', 'Request body bytes sent.',
+                self.request_bytes, ('method',))
+            self._render_counter(
+                lines, 'response_bytes_total',
+                'Response body bytes received.', self.response_bytes,
+                ('method',))
+            self._render_counter(
+                lines, 'retries_total', 'Retried attempts by failure.',
+                self.retries, ('method', 'reason'))
+            self._render_counter(
+                lines, 'token_wait_seconds_total',
+                'Seconds waited for ubersmith to update its token.',
+                self.token_wait, ('method',))
+            self._render_counter(
+                lines, 'maintenance_total',
+                'Attempts answered with a maintenance response.',
+                self.maintenance, ('method',))
+            self._render_histogram(
+                lines, 'clean_duration_seconds',
+                'Time spent cleaning responses.', self.clean_time)
+        return '\n'.join(lines) + '\n'
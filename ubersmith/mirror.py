@@ -0,0 +1,261 @@
+"""Local SQLite mirror of ubersmith lists for offline lookups.
+
+A Mirror copies list methods into a SQLite database and answers lookups by
+indexed fields without asking ubersmith:
+
+    mirror = Mirror('/var/lib/ubersmith.db')
+    mirror.refresh()
+    mirror.start(interval=300)  # keep refreshing in the background
+    devices = mirror.find('devices', clientid=1001)
+    client = mirror.find('clients', email='jdoe@example.com')
+
+Records are stored as they came from ubersmith and cleaned with the call's
+cleaner when read, so they look exactly like the records of the live call.
+
+"""
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import decimal
+import json
+import sqlite3
+import threading
+import time
+
+from ubersmith.api import get_default_request_handler
+from ubersmith.batch import DEFAULT_MAX_WORKERS
+from ubersmith.clean import LazyRecord, unlazy
+from ubersmith.utils import resolve_call, to_unix
+
+__all__ = [
+    'DEFAULT_TABLES',
+    'Mirror',
+    'MirrorTable',
+]
+
+
+class MirrorTable(namedtuple('MirrorTable', [
+        'method', 'indexes', 'args', 'per_client'])):
+    """A list method to mirror.
+
+        method: ubersmith list method
+        indexes: fields of the cleaned records that can be looked up by
+        args: dict of extra arguments sent with every request
+        per_client: argument to call the method with once per mirrored
+                    client id, for methods that require one
+
+    """
+    __slots__ = ()
+
+    def __new__(cls, method, indexes=(), args=None, per_client=None):
+        return super(MirrorTable, cls).__new__(
+            cls, method, tuple(indexes), args or {}, per_client)
+
+
+DEFAULT_TABLES = {
+    'clients': MirrorTable('client.list', [
+        'clientid', 'email', 'login', 'active']),
+    'devices': MirrorTable('device.list', [
+        'dev', 'clientid', 'rack_id', 'type_id', 'parent']),
+    'orders': MirrorTable('order.list', [
+        'order_id', 'client_id', 'order_status', 'order_queue_id']),
+    'services': MirrorTable('client.service_list', [
+        'packid', 'clientid', 'plan_id'], per_client='client_id'),
+    'ip_assignments': MirrorTable('device.ip_assignment_list', [
+        'assign_id', 'device_id', 'client_id', 'service_id']),
+}
+
+
+def _quote(name):
+    return '"{0}"'.format(name.replace('"', '""'))
+
+
+def _column_value(value):
+    """Return a cleaned value as something SQLite stores and compares."""
+    if isinstance(value, datetime.datetime):
+        return to_unix(value)
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (dict, list, LazyRecord)):
+        return json.dumps(unlazy(value), sort_keys=True)
+    return value
+
+
+class Mirror(object):
+    """SQLite copy of list methods.
+
+        path: database file, ':memory:' for a throwaway mirror
+        tables: dict of names to MirrorTables, DEFAULT_TABLES by default
+        request_handler: handler to fetch the lists with
+        max_workers: requests in flight at once for per_client tables
+
+    """
+
+    def __init__(self, path, tables=None, request_handler=None,
+                 max_workers=DEFAULT_MAX_WORKERS):
+        self.path = path
+        self.tables = dict(DEFAULT_TABLES if tables is None else tables)
+        self.request_handler = request_handler or \
+            get_default_request_handler()
+        self.max_workers = max_workers
+        self.last_error = None  # exception of the last failed refresh
+        self._lock = threading.RLock()
+        # sqlite3 commits before DDL statements on its own, transactions
+        # are begun explicitly so a table is replaced all at once
+        self._conn = sqlite3.connect(path, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS _mirror_refreshed '
+            '(name TEXT PRIMARY KEY, ts REAL)')
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _call(self, name):
+        """Return a call of a table's method, for its cleaner."""
+        table = self.tables[name]
+        call_func = resolve_call(self.request_handler, table.method)
+        return call_func.call_class(table.args, self.request_handler)
+
+    def _fetch(self, name):
+        """Return the (key, record) pairs of a table as sent by ubersmith."""
+        table = self.tables[name]
+
+        def fetch(extra):
+            data = dict(table.args)
+            data.update(extra)
+            return list(self.request_handler.stream_request(
+                table.method, data))
+
+        if table.per_client is None:
+            return fetch({})
+        client_ids = [key for key, _ in self._rows('clients')]
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            pages = executor.map(
+                fetch, ({table.per_client: i} for i in client_ids))
+            return [item for page in pages for item in page]
+        finally:
+            executor.shutdown(wait=True)
+
+    def refresh(self, names=None):
+        """Fetch tables, all by default, and replace their mirrored rows.
+
+        Tables are replaced in one transaction each, lookups never see
+        half a refresh.
+
+        """
+        # per client tables need the clients refreshed first
+        names = sorted(names or self.tables,
+                       key=lambda n: (self.tables[n].per_client is not None,
+                                      n))
+        for name in names:
+            items = self._fetch(name)
+            self._store(name, items)
+
+    def _store(self, name, items):
+        table = self.tables[name]
+        call = self._call(name)
+        columns = ''.join(', {0}'.format(_quote(c)) for c in table.indexes)
+        rows = []
+        for key, record in items:
+            cleaned = call.clean_item(key, record)[1]
+            if not isinstance(cleaned, dict):
+                cleaned = {}
+            rows.append([str(key), json.dumps(record)] + [
+                _column_value(cleaned.get(c)) for c in table.indexes])
+        with self._lock, self._conn:
+            self._conn.execute('BEGIN')
+            self._conn.execute('DROP TABLE IF EXISTS {0}'.format(
+                _quote(name)))
+            self._conn.execute(
+                'CREATE TABLE {0} (key TEXT PRIMARY KEY, record TEXT{1})'
+                .format(_quote(name), columns))
+            for column in table.indexes:
+                self._conn.execute('CREATE INDEX {0} ON {1} ({2})'.format(
+                    _quote('{0}_{1}'.format(name, column)), _quote(name),
+                    _quote(column)))
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO {0} VALUES ({1})'.format(
+                    _quote(name), ', '.join('?' * (len(table.indexes) + 2))),
+                rows)
+            self._conn.execute(
+                'INSERT OR REPLACE INTO _mirror_refreshed VALUES (?, ?)',
+                (name, time.time()))
+
+    def refreshed(self, name):
+        """Return when a table was last refreshed as a unix timestamp."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT ts FROM _mirror_refreshed WHERE name = ?',
+                (name,)).fetchone()
+        return row[0] if row else None
+
+    def _rows(self, name, where='', params=()):
+        if self.refreshed(name) is None:
+            raise LookupError("{0} hasn't been mirrored yet.".format(name))
+        with self._lock:
+            return self._conn.execute(
+                'SELECT key, record FROM {0}{1}'.format(_quote(name), where),
+                params).fetchall()
+
+    def find(self, name, **filters):
+        """Return cleaned records of a table by key, like the live call.
+
+        Filters are indexed fields and the values they must equal, a list
+        or tuple value matches any of its items.
+
+        """
+        table = self.tables[name]
+        clauses, params = [], []
+        for field, value in sorted(filters.items()):
+            if field not in table.indexes:
+                raise ValueError("{0} isn't indexed in {1}.".format(
+                    field, name))
+            values = value if isinstance(value, (list, tuple)) else [value]
+            clauses.append('{0} IN ({1})'.format(
+                _quote(field), ', '.join('?' * len(values))))
+            params.extend(_column_value(v) for v in values)
+        where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+        call = self._call(name)
+        return dict(call.clean_item(key, json.loads(record))
+                    for key, record in self._rows(name, where, params))
+
+    def get(self, name, key):
+        """Return the cleaned record of a table's key or None."""
+        rows = self._rows(name, ' WHERE key = ?', (str(key),))
+        if not rows:
+            return None
+        key, record = rows[0]
+        return self._call(name).clean_item(key, json.loads(record))[1]
+
+    def start(self, interval):
+        """Refresh every interval seconds in a background thread."""
+        if self._thread is not None:
+            raise RuntimeError("Mirror is already refreshing.")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, interval):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:
+                # keep serving the old rows and try again next time
+                self.last_error = e
+            self._stop.wait(interval)
+
+    def stop(self):
+        """Stop refreshing in the background."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        self._conn.close()
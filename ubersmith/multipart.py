@@ -0,0 +1,223 @@
+"""Streaming multipart/form-data bodies for file uploads.
+
+requests builds multipart bodies in memory.  A MultipartEncoder instead
+reads files chunk by chunk while the request is sent.  File arguments can be
+open files, generators of bytes or paths and other sources wrapped in a
+FileField:
+
+    h = RequestHandler(url, user, password,
+                       upload_callback=lambda sent, total: print(sent, total))
+    h.uber.file_add(file=FileField('/backups/big.tar.gz'), ...)
+
+"""
+import binascii
+import mimetypes
+import os
+import types
+
+from six import binary_type, string_types, text_type
+
+from ubersmith.compat import file_type
+from ubersmith.stream import DEFAULT_CHUNK_SIZE
+
+__all__ = [
+    'FileField',
+    'MultipartEncoder',
+    'is_file_value',
+    'wrap_files',
+]
+
+
+class FileField(object):
+    """A file to upload.
+
+        source: path, binary file object or iterable of bytes
+        filename: name sent for the file, defaults to the source's name
+        content_type: sent for the file, guessed from filename by default
+        length: bytes the source will produce, needed for iterables to
+                send a Content-Length instead of a chunked body
+
+    """
+
+    def __init__(self, source, filename=None, content_type=None,
+                 length=None):
+        self.source = source
+        if filename is None:
+            name = source if isinstance(source, string_types) else \
+                getattr(source, 'name', None)
+            if isinstance(name, string_types):
+                filename = os.path.basename(name)
+        self.filename = filename
+        self.content_type = content_type or (
+            filename and mimetypes.guess_type(filename)[0]) or \
+            'application/octet-stream'
+        self._start = None
+        self._consumed = False
+        if length is None:
+            length = self._length()
+        self.length = length
+
+    @property
+    def is_path(self):
+        return isinstance(self.source, string_types)
+
+    @property
+    def is_file(self):
+        return hasattr(self.source, 'read')
+
+    def _length(self):
+        if self.is_path:
+            return os.path.getsize(self.source)
+        if self.is_file:
+            try:
+                start = self.source.tell()
+                end = self.source.seek(0, os.SEEK_END) or self.source.tell()
+                self.source.seek(start)
+            except (AttributeError, IOError, OSError, ValueError):
+                # not seekable, e.g. a pipe
+                return None
+            self._start = start
+            return end - start
+        return None
+
+    def iter_chunks(self, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Yield the file's bytes, files are read from the start again on
+        every call so uploads can be retried."""
+        if self.is_path:
+            with open(self.source, 'rb') as f:
+                for chunk in iter(lambda: f.read(chunk_size), b''):
+                    yield chunk
+        elif self.is_file:
+            if self._start is not None:
+                self.source.seek(self._start)
+            for chunk in iter(lambda: self.source.read(chunk_size), b''):
+                yield chunk
+        else:
+            if self._consumed:
+                raise ValueError("{0!r} can only be uploaded once.".format(
+                    self.filename or self.source))
+            self._consumed = True
+            for chunk in self.source:
+                yield chunk
+
+
+def is_file_value(value):
+    """Return if an argument value should be uploaded as a file."""
+    return isinstance(value, (file_type, FileField, types.GeneratorType))
+
+
+def wrap_files(data):
+    """Return data with its file values wrapped in FileFields.
+
+    Wrap the arguments of a request once, before its first attempt, so
+    every attempt uploads the file from where it started and a generator
+    uploaded twice raises instead of sending nothing.
+
+    """
+    if isinstance(data, FileField):
+        return data
+    if is_file_value(data):
+        return FileField(data)
+    if isinstance(data, dict):
+        return dict((k, wrap_files(v)) for k, v in data.items())
+    if isinstance(data, (list, tuple)):
+        return type(data)(wrap_files(v) for v in data)
+    return data
+
+
+def _quote(value):
+    return value.replace('\\', '\\\\').replace('"', '%22') \
+        .replace('\r', '%0D').replace('\n', '%0A')
+
+
+class MultipartEncoder(object):
+    """File-like multipart/form-data body that is produced as it's read.
+
+        fields: dict of argument names to values
+        files: dict of argument names to file values (see is_file_value)
+        callback: called with (bytes_sent, total) as the body is read, total
+                  is None when the size of a file isn't known
+        chunk_size: bytes to read from files at a time
+        boundary: multipart boundary, random by default
+
+    When every file's length is known the encoder has a len attribute, so
+    requests sends a Content-Length, otherwise the body is sent chunked.
+
+    """
+
+    def __init__(self, fields, files, callback=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE, boundary=None):
+        self.boundary = boundary or \
+            binascii.hexlify(os.urandom(16)).decode('ascii')
+        self.content_type = 'multipart/form-data; boundary={0}'.format(
+            self.boundary)
+        self.callback = callback
+        self.chunk_size = chunk_size
+        self.bytes_read = 0
+        self._parts = []
+        for name, value in sorted(fields.items()):
+            if not isinstance(value, binary_type):
+                value = text_type(value).encode('utf-8')
+            self._parts.append((self._header(name), value))
+        for name, value in sorted(files.items()):
+            if not isinstance(value, FileField):
+                value = FileField(value)
+            self._parts.append((self._header(name, value), value))
+        self._footer = '--{0}--\r\n'.format(self.boundary).encode('ascii')
+        self.total = self._total()
+        if self.total is not None:
+            self.len = self.total
+        self._body = self._iter_body()
+        self._buf = b''
+
+    def _header(self, name, field=None):
+        lines = ['--{0}'.format(self.boundary)]
+        disposition = u'Content-Disposition: form-data; name="{0}"'.format(
+            _quote(text_type(name)))
+        if field is not None:
+            disposition += u'; filename="{0}"'.format(
+                _quote(text_type(field.filename or name)))
+        lines.append(disposition)
+        if field is not None:
+            lines.append(u'Content-Type: {0}'.format(field.content_type))
+        return (u'\r\n'.join(lines) + u'\r\n\r\n').encode('utf-8')
+
+    def _total(self):
+        total = len(self._footer)
+        for header, value in self._parts:
+            length = value.length if isinstance(value, FileField) else \
+                len(value)
+            if length is None:
+                return None
+            total += len(header) + length + 2
+        return total
+
+    def _iter_body(self):
+        for header, value in self._parts:
+            yield header
+            if isinstance(value, FileField):
+                for chunk in value.iter_chunks(self.chunk_size):
+                    yield chunk
+            else:
+                yield value
+            yield b'\r\n'
+        yield self._footer
+
+    def read(self, size=-1):
+        """Return up to size bytes of the body, all of it if size < 0."""
+        while size < 0 or len(self._buf) < size:
+            try:
+                self._buf += next(self._body)
+            except StopIteration:
+                break
+        if size < 0:
+            size = len(self._buf)
+        data, self._buf = self._buf[:size], self._buf[size:]
+        if data:
+            self.bytes_read += len(data)
+            if self.callback is not None:
+                self.callback(self.bytes_read, self.total)
+        return data
+
+    def __iter__(self):
+        return iter(lambda: self.read(self.chunk_size), b'')
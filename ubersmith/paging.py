@@ -0,0 +1,99 @@
+"""Iterate over every record of list methods page by page.
+
+Call classes that support paging name their offset and limit arguments with
+a paging attribute.  Their call functions get a pages() method that fetches
+one page at a time, prefetching the next page while the current one is
+consumed:
+
+    for ticket_id, ticket in h.support.ticket_list.pages(limit=500):
+        ...
+
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from ubersmith.exceptions import ValidationError
+from ubersmith.utils import isdict
+
+__all__ = [
+    'DEFAULT_PAGE_SIZE',
+    'paginate',
+]
+
+DEFAULT_PAGE_SIZE = 500
+
+
+def _items(page, offset):
+    """Return (key, record) pairs of a cleaned page."""
+    data = page.data if hasattr(page, 'data') else page
+    if isdict(data):
+        return list(data.items())
+    if data:
+        return [(offset + i, record) for i, record in enumerate(data)]
+    return []
+
+
+def paginate(call_class, request_data=None, request_handler=None,
+             limit=DEFAULT_PAGE_SIZE, prefetch=True):
+    """Return an iterator of (key, record) pairs over every page of a call.
+
+        call_class: BaseCall subclass with a paging attribute
+        request_data: dict of arguments sent with every page
+        request_handler: handler to send the requests with
+        limit: records to request per page
+        prefetch: request the next page while the current one is consumed
+
+    Pages are requested until one has fewer than limit records or repeats
+the records of the one before.
+
+    """
+    if not call_class.paging:
+        raise TypeError("{0} doesn't support paging.".format(
+            call_class.method))
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    request_data = dict(request_data or {})
+    if not call_class(request_data, request_handler).validate():
+        raise ValidationError
+    return _pages(call_class, request_data, request_handler, limit, prefetch)
+
+
+def _pages(call_class, request_data, request_handler, limit, prefetch):
+    offset_arg, limit_arg = call_class.paging
+
+    def fetch(offset):
+        data = dict(request_data)
+        data[offset_arg] = offset
+        data[limit_arg] = limit
+        return _items(call_class(data, request_handler).render(), offset)
+
+    executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+    next_page = None
+    offset = int(request_data.get(offset_arg) or 0)
+    try:
+        items = fetch(offset)
+        previous = None
+        while True:
+            records = [record for _, record in items]
+            if records == previous:
+                # ubersmith ignored the offset and sent the same page again
+                return
+            previous = records
+            # a short page is the last one, a long one means ubersmith
+            # ignored the limit and returned everything
+            last = len(items) != limit
+            if not last and executor is not None:
+                next_page = executor.submit(fetch, offset + limit)
+            for item in items:
+                yield item
+            if last:
+                return
+            offset += limit
+            if next_page is not None:
+                items, next_page = next_page.result(), None
+            else:
+                items = fetch(offset)
+    finally:
+        if next_page is not None:
+            next_page.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False)
@@ -0,0 +1,129 @@
+"""HTTP connection pooling with statistics for RequestHandler sessions."""
+from collections import namedtuple
+import socket
+import threading
+
+import requests
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
+# the urllib3 requests uses, older requests vendor their own copy
+from requests.packages.urllib3.connectionpool import (
+    HTTPConnectionPool,
+    HTTPSConnectionPool,
+)
+from requests.packages.urllib3.exceptions import HTTPError
+
+__all__ = [
+    'DEFAULT_POOLSIZE',
+    'PoolStats',
+    'PooledAdapter',
+]
+
+
+class PoolStats(namedtuple('PoolStats', [
+        'pools', 'connections', 'in_use', 'idle', 'requests', 'waits'])):
+    """Snapshot of connection pool usage.
+
+        pools: number of per host pools
+        connections: connections opened over the pools' lifetime
+        in_use: connections currently checked out for a request
+        idle: open connections waiting in the pools to be reused
+        requests: requests sent over the pools
+        waits: times a request found no idle connection and no free slot,
+               it then either blocked (pool_block) or opened an extra
+               connection that is discarded afterwards
+
+    """
+    __slots__ = ()
+
+
+class _StatsPoolMixin(object):
+    """Tracks checked out connections and waits on a urllib3 pool."""
+
+    def __init__(self, *args, **kwargs):
+        super(_StatsPoolMixin, self).__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.in_use = 0
+        self.waits = 0
+
+    def _get_conn(self, timeout=None):
+        with self._stats_lock:
+            if self.pool is not None and self.pool.empty():
+                self.waits += 1
+        conn = super(_StatsPoolMixin, self)._get_conn(timeout)
+        with self._stats_lock:
+            self.in_use += 1
+        return conn
+
+    def _put_conn(self, conn):
+        with self._stats_lock:
+            self.in_use -= 1
+        super(_StatsPoolMixin, self)._put_conn(conn)
+
+    @property
+    def idle(self):
+        if self.pool is None:
+            return 0
+        with self.pool.mutex:
+            return sum(1 for conn in self.pool.queue
+                       if conn is not None and conn.sock is not None)
+
+
+class _StatsHTTPConnectionPool(_StatsPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _StatsHTTPSConnectionPool(_StatsPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools report usage statistics."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(PooledAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _StatsHTTPConnectionPool,
+            'https': _StatsHTTPSConnectionPool,
+        }
+
+    def _pools(self):
+        pools = self.poolmanager.pools
+        with pools.lock:
+            return [pools[key] for key in pools.keys()]
+
+    def stats(self):
+        """Return PoolStats summed over every host pool."""
+        pools = [p for p in self._pools() if isinstance(p, _StatsPoolMixin)]
+        return PoolStats(
+            pools=len(pools),
+            connections=sum(p.num_connections for p in pools),
+            in_use=sum(p.in_use for p in pools),
+            idle=sum(p.idle for p in pools),
+            requests=sum(p.num_requests for p in pools),
+            waits=sum(p.waits for p in pools),
+        )
+
+    def connection_pool(self, url, verify=True):
+        """Return the pool requests to url would be sent over."""
+        if hasattr(self, 'get_connection_with_tls_context'):
+            request = requests.Request('POST', url).prepare()
+            return self.get_connection_with_tls_context(request, verify)
+        return self.get_connection(url)  # pragma: no cover
+
+    def warm_up(self, url, connections, verify=True):
+        """Open connections to url ahead of time, return how many opened."""
+        pool = self.connection_pool(url, verify)
+        opened = []
+        try:
+            for _ in range(min(connections, self._pool_maxsize)):
+                conn = pool._get_conn()
+                opened.append(conn)
+                if conn.sock is None:
+                    conn.connect()
+        except (socket.error, HTTPError):
+            # stop warming up, connections that failed reconnect on use
+            pass
+        finally:
+            for conn in opened:
+                pool._put_conn(conn)
+        return sum(1 for conn in opened if conn.sock is not None)
@@ -0,0 +1,279 @@
+"""Per call timing breakdowns without a tracing backend.
+
+With a ProfilingTracer on the handler every call's response gets a timings
+attribute with the time spent in each phase of the call:
+
+    h = RequestHandler(url, user, password, tracer=ProfilingTracer())
+    invoices = h.client.invoice_list(client_id=1001)
+    print(invoices.timings.network, invoices.timings.clean)
+
+profile() does the same for a block of calls and aggregates the timings
+into a report:
+
+    with profile(h) as report:
+        h.client.invoice_list(client_id=1001)
+        h.device.list()
+    print(report.render())
+
+"""
+from collections import namedtuple
+from contextlib import contextmanager
+import threading
+import time
+
+try:
+    import tracemalloc
+except ImportError:  # pragma: no cover
+    tracemalloc = None
+
+from ubersmith.tracing import NO_OP_TRACER, _ContextLocal
+
+__all__ = [
+    'MethodProfile',
+    'ProfileReport',
+    'ProfilingTracer',
+    'Timings',
+    'profile',
+]
+
+# spans of ubersmith.tracing and the Timings field they're added to
+_PHASES = {
+    'ubersmith.wait': 'queue_wait',
+    'ubersmith.encode': 'encode',
+    'ubersmith.send': 'network',
+    'ubersmith.decode': 'decode',
+    'ubersmith.copy': 'copy',
+    'ubersmith.clean': 'clean',
+}
+
+
+class Timings(namedtuple('Timings', [
+        'method', 'total', 'queue_wait', 'encode', 'network',
+        'bytes_received', 'decode', 'copy', 'clean', 'peak_memory'])):
+    """Where the time of a call went, in seconds.
+
+        method: ubersmith method string
+        total: whole call from validation to cleaning
+        queue_wait: waiting for the rate limiter and between retries
+        encode: encoding arguments
+        network: sending the request and receiving the response
+        bytes_received: size of the response body or None if unknown
+        decode: decoding the JSON response
+        copy: copying the response data before cleaning, see
+              RequestHandler's copy_data
+        clean: running the cleaners
+        peak_memory: bytes allocated at the peak of the call above what was
+                     allocated when it started, None unless tracing memory
+
+    """
+    __slots__ = ()
+
+
+class _Profile(object):
+    def __init__(self, method, memory):
+        self.method = method
+        self.phases = dict((field, 0.0) for field in _PHASES.values())
+        self.bytes_received = None
+        self.memory = memory
+        self.start = time.time()
+        if memory:
+            self.memory_start = tracemalloc.get_traced_memory()[0]
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+
+    def finish(self):
+        peak = None
+        if self.memory:
+            peak = max(tracemalloc.get_traced_memory()[1] -
+                       self.memory_start, 0)
+        phases = self.phases
+        return Timings(
+            self.method, time.time() - self.start, phases['queue_wait'],
+            phases['encode'], phases['network'], self.bytes_received,
+            phases['decode'], phases['copy'],
+            # copying is nested in cleaning
+            max(phases['clean'] - phases['copy'], 0.0), peak)
+
+
+class _ProfiledSpan(object):
+    """Span of the wrapped tracer that remembers the response size."""
+
+    def __init__(self, span, profile):
+        self.span = span
+        self.profile = profile
+        self.timings = None
+
+    def set_attribute(self, key, value):
+        if key == 'ubersmith.response_bytes' and self.profile is not None:
+            self.profile.bytes_received = \
+                (self.profile.bytes_received or 0) + value
+        self.span.set_attribute(key, value)
+
+    def record_exception(self, exception):
+        self.span.record_exception(exception)
+
+
+class ProfilingTracer(object):
+    """Tracer that times the phases of calls.
+
+        tracer: tracer spans are passed on to, none by default
+        memory: also trace the peak memory of calls with tracemalloc,
+                tracemalloc is process wide so concurrent calls share peaks
+        callback: called with the Timings of every finished call
+
+    """
+
+    def __init__(self, tracer=NO_OP_TRACER, memory=False, callback=None):
+        if memory and tracemalloc is None:
+            raise ValueError("tracemalloc isn't available.")
+        self.tracer = tracer
+        self.memory = memory
+        self.callback = callback
+        self._memory_lock = threading.Lock()
+        self._memory_calls = 0
+        self._started_tracemalloc = False
+        self._current = _ContextLocal('ubersmith_profile')
+
+    def _start_memory(self):
+        with self._memory_lock:
+            if self._memory_calls == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            self._memory_calls += 1
+
+    def _stop_memory(self):
+        with self._memory_lock:
+            self._memory_calls -= 1
+            if self._memory_calls == 0 and self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+
+    @contextmanager
+    def start_as_current_span(self, name, attributes=None):
+        with self.tracer.start_as_current_span(name, attributes) as span:
+            if name == 'ubersmith.call':
+                with self._profile_call(span, attributes) as profiled:
+                    yield profiled
+                return
+            profile = self._current.get()
+            started = time.time()
+            try:
+                yield _ProfiledSpan(span, profile)
+            finally:
+                if profile is not None and name in _PHASES:
+                    profile.phases[_PHASES[name]] += time.time() - started
+
+    @contextmanager
+    def _profile_call(self, span, attributes):
+        if self.memory:
+            self._start_memory()
+        profile = _Profile((attributes or {}).get('ubersmith.method'),
+                           self.memory)
+        profiled = _ProfiledSpan(span, profile)
+        token = self._current.set(profile)
+        try:
+            yield profiled
+        finally:
+            self._current.reset(token)
+            profiled.timings = profile.finish()
+            if self.memory:
+                self._stop_memory()
+            if self.callback is not None:
+                self.callback(profiled.timings)
+
+
+class MethodProfile(namedtuple('MethodProfile', [
+        'method', 'calls', 'total', 'mean', 'max', 'queue_wait', 'encode',
+        'network', 'bytes_received', 'decode', 'copy', 'clean',
+        'peak_memory'])):
+    """Timings of a method aggregated over a ProfileReport.
+
+        method: ubersmith method string
+        calls: number of calls
+        total: seconds spent in all calls
+        mean: average seconds per call
+        max: seconds of the slowest call
+        queue_wait, encode, network, decode, copy, clean: seconds spent in
+            each phase over all calls
+        bytes_received: bytes received over all calls
+        peak_memory: highest peak_memory of the calls or None
+
+    """
+    __slots__ = ()
+
+
+class ProfileReport(object):
+    """Collects the Timings of calls, see profile()."""
+
+    _SUMMED = ('queue_wait', 'encode', 'network', 'decode', 'copy', 'clean')
+
+    def __init__(self):
+        self.timings = []
+        self._lock = threading.Lock()
+
+    def add(self, timings):
+        with self._lock:
+            self.timings.append(timings)
+
+    def summary(self, sort_by='total'):
+        """Return a MethodProfile per method, the largest sort_by first."""
+        methods = {}
+        with self._lock:
+            for t in self.timings:
+                methods.setdefault(t.method, []).append(t)
+        profiles = []
+        for method, timings in methods.items():
+            total = sum(t.total for t in timings)
+            peaks = [t.peak_memory for t in timings
+                     if t.peak_memory is not None]
+            sums = dict((field, sum(getattr(t, field) for t in timings))
+                        for field in self._SUMMED)
+            profiles.append(MethodProfile(
+                method=method, calls=len(timings), total=total,
+                mean=total / len(timings), max=max(t.total for t in timings),
+                bytes_received=sum(t.bytes_received or 0 for t in timings),
+                peak_memory=max(peaks) if peaks else None, **sums))
+        return sorted(profiles,
+                      key=lambda p: (-(getattr(p, sort_by) or 0), p.method))
+
+    def render(self, sort_by='total'):
+        """Return the summary as a text table, times in milliseconds."""
+        columns = ('method', 'calls', 'total', 'mean', 'max', 'queue_wait',
+                   'encode', 'network', 'decode', 'copy', 'clean',
+                   'bytes_received', 'peak_memory')
+        rows = [columns]
+        for p in self.summary(sort_by):
+            row = []
+            for column in columns:
+                value = getattr(p, column)
+                if value is None:
+                    value = '-'
+                elif isinstance(value, float):
+                    value = '{0:.1f}'.format(value * 1000)
+                row.append(str(value))
+            rows.append(row)
+        widths = [max(len(row[i]) for row in rows)
+                  for i in range(len(columns))]
+        return '\n'.join(
+            '  '.join(cell.ljust(width) if i == 0 else cell.rjust(width)
+                      for i, (cell, width) in enumerate(zip(row, widths)))
+            for row in rows) + '\n'
+
+
+@contextmanager
+def profile(request_handler, memory=False):
+    """Profile the calls made on request_handler within the block.
+
+        request_handler: handler whose calls to profile
+        memory: also trace peak memory with tracemalloc
+
+    Yields a ProfileReport.  The handler's tracer keeps receiving spans.
+
+    """
+    report = ProfileReport()
+    tracer = request_handler.tracer
+    request_handler.tracer = ProfilingTracer(tracer, memory, report.add)
+    try:
+        yield report
+    finally:
+        request_handler.tracer = tracer
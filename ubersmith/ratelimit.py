@@ -0,0 +1,120 @@
+"""Client side rate limiting of requests to Ubersmith.
+
+A RateLimiter holds token buckets for a global rate and for any number of
+method, namespace or namespace:kind keys.  A request has to get a token from
+every bucket that applies to its method:
+
+    limiter = RateLimiter(rate=20, limits={
+        'client:write': 2,  # client.* methods that change data
+        'uber:read': 50,    # uber.* methods that only read data
+        'device.reboot': (1, 5),  # rate and burst
+    })
+    h = RequestHandler(url, user, password, rate_limiter=limiter)
+
+A limiter can be shared by handlers on many threads and by asyncio handlers.
+
+"""
+import threading
+import time
+
+from ubersmith.exceptions import RateLimitExceeded
+
+__all__ = [
+    'RateLimiter',
+    'TokenBucket',
+]
+
+
+class TokenBucket(object):
+    """Token bucket refilled at rate tokens per second up to burst tokens.
+
+    Not thread safe on its own, RateLimiter serializes access.
+
+    """
+
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1, rate))
+        self.tokens = self.burst
+        self.updated = time.time()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now, tokens=1):
+        """Return seconds until tokens are available."""
+        self._refill(now)
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+    def take(self, tokens=1):
+        """Take tokens, the balance goes negative for reserved tokens."""
+        self.tokens -= tokens
+
+
+class RateLimiter(object):
+    """Rate limits requests globally and per method namespace.
+
+        rate: global requests per second, None for no global limit
+        burst: requests allowed at once for the global limit
+        limits: dict of key to rate or (rate, burst), keys are a method
+                ('client.update'), a namespace ('client') or a namespace
+                and kind ('client:read', 'client:write')
+        block: wait for budget, otherwise raise RateLimitExceeded
+        max_wait: raise RateLimitExceeded instead of waiting longer
+
+    """
+
+    def __init__(self, rate=None, burst=None, limits=None, block=True,
+                 max_wait=None):
+        self.block = block
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._global = TokenBucket(rate, burst) if rate is not None else None
+        self._buckets = {}
+        for key, limit in (limits or {}).items():
+            if not isinstance(limit, (tuple, list)):
+                limit = (limit,)
+            self._buckets[key] = TokenBucket(*limit)
+
+    def _keys(self, method):
+        from ubersmith.api import READ_METHODS
+        namespace = method.split('.', 1)[0]
+        kind = 'read' if method in READ_METHODS else 'write'
+        return (method, namespace, '{0}:{1}'.format(namespace, kind))
+
+    def buckets(self, method):
+        """Return the buckets that apply to method."""
+        buckets = [self._buckets[k] for k in self._keys(method)
+                   if k in self._buckets]
+        if self._global is not None:
+            buckets.append(self._global)
+        return buckets
+
+    def reserve(self, method):
+        """Reserve a request for method, return seconds to wait before it.
+
+        Raises RateLimitExceeded, without reserving, if the limiter doesn't
+        block or the wait would exceed max_wait.
+
+        """
+        buckets = self.buckets(method)
+        with self._lock:
+            now = time.time()
+            wait = max([b.wait_time(now) for b in buckets] or [0.0])
+            if wait > 0 and (not self.block or (
+                    self.max_wait is not None and wait > self.max_wait)):
+                raise RateLimitExceeded(retry_after=wait)
+            for bucket in buckets:
+                bucket.take()
+        return wait
+
+    def acquire(self, method):
+        """Block until a request for method is allowed."""
+        wait = self.reserve(method)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
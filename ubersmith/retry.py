@@ -0,0 +1,179 @@
+"""Retry policies for requests to Ubersmith.
+
+A RetryPolicy decides which failures are retried, how long to wait between
+attempts and when to give up.  Handlers take a policy for every request and
+call classes can override it with their retry_policy attribute:
+
+    policy = RetryPolicy(max_attempts=5, max_elapsed=60)
+    h = RequestHandler(url, user, password, retry_policy=policy)
+
+"""
+import random
+import time
+
+import requests
+
+from ubersmith.exceptions import (
+    MaintenanceResponse,
+    ServerErrorResponse,
+    UpdatingTokenResponse,
+)
+
+__all__ = [
+    'RetryPolicy',
+    'RetryState',
+    'NO_RETRY',
+]
+
+# kinds of failure a policy classifies exceptions into
+TOKEN = 'token'
+MAINTENANCE = 'maintenance'
+CONNECT_TIMEOUT = 'connect_timeout'
+TIMEOUT = 'timeout'
+CONNECTION = 'connection'
+SERVER_ERROR = 'server_error'
+EXCEPTION = 'exception'
+
+# these failures mean ubersmith never processed the request
+_ALWAYS_SAFE = frozenset([TOKEN, MAINTENANCE, CONNECT_TIMEOUT])
+
+
+class RetryPolicy(object):
+    """Exponential backoff with jitter over classified failures.
+
+        max_attempts: total attempts including the first one
+        backoff: seconds to wait before the first retry
+        multiplier: backoff growth factor between retries
+        max_backoff: upper bound for a single wait
+        jitter: fraction of each wait that is randomized, 0 to disable
+        max_elapsed: give up rather than wait past this many seconds since
+                     the first attempt, None for no budget
+        token: retry "Updating Token" responses
+        maintenance: retry MaintenanceResponses
+        timeouts: retry timeouts of safe methods
+        connection_errors: retry connection errors of safe methods
+        statuses: HTTP statuses retried for safe methods
+        exceptions: extra exception types retried for safe methods
+        backoffs: dict of failure kind to first backoff, overriding backoff
+        safe_methods: methods safe to retry after ubersmith may have
+                      processed them, defaults to ubersmith.api.READ_METHODS
+
+    Token updates, maintenance and connect timeouts are retried for every
+    method as the request never reached ubersmith.  Other failures are only
+    retried for safe methods.
+
+    """
+
+    def __init__(self, max_attempts=3, backoff=0.5, multiplier=2.0,
+                 max_backoff=8.0, jitter=0.5, max_elapsed=30.0, token=True,
+                 maintenance=False, timeouts=True, connection_errors=True,
+                 statuses=(500, 502, 503, 504), exceptions=(), backoffs=None,
+                 safe_methods=None):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.multiplier = multiplier
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.max_elapsed = max_elapsed
+        self.retried = set(kind for kind, enabled in [
+            (TOKEN, token),
+            (MAINTENANCE, maintenance),
+            (CONNECT_TIMEOUT, timeouts),
+            (TIMEOUT, timeouts),
+            (CONNECTION, connection_errors),
+            (SERVER_ERROR, bool(statuses)),
+            (EXCEPTION, bool(exceptions)),
+        ] if enabled)
+        self.statuses = frozenset(statuses)
+        self.exceptions = tuple(exceptions)
+        self.backoffs = dict(backoffs or {})
+        self._safe_methods = safe_methods
+
+    @property
+    def safe_methods(self):
+        if self._safe_methods is None:
+            from ubersmith.api import READ_METHODS
+            return READ_METHODS
+        return self._safe_methods
+
+    def start(self, method):
+        """Return a RetryState to track the attempts of one request."""
+        return RetryState(self, method)
+
+    def is_safe(self, method):
+        """Return if method can be retried after ubersmith received it."""
+        return method in self.safe_methods
+
+    def classify(self, exception):
+        """Return the kind of failure exception is or None if not retried."""
+        if isinstance(exception, UpdatingTokenResponse):
+            # see: https://github.com/jasonkeene/python-ubersmith/issues/1
+            return TOKEN
+        if isinstance(exception, MaintenanceResponse):
+            return MAINTENANCE
+        if isinstance(exception, ServerErrorResponse):
+            if exception.status_code in self.statuses:
+                return SERVER_ERROR
+            return None
+        if isinstance(exception, requests.ConnectTimeout):
+            return CONNECT_TIMEOUT
+        if isinstance(exception, requests.Timeout):
+            return TIMEOUT
+        if isinstance(exception, requests.ConnectionError):
+            return CONNECTION
+        if self.exceptions and isinstance(exception, self.exceptions):
+            return EXCEPTION
+        return None
+
+    def should_retry(self, kind, method):
+        """Return if a failure of kind for method should be retried."""
+        if kind not in self.retried:
+            return False
+        return kind in _ALWAYS_SAFE or self.is_safe(method)
+
+    def delay(self, kind, retry):
+        """Return seconds to wait before the retry-th retry (from 1)."""
+        backoff = self.backoffs.get(kind, self.backoff)
+        delay = min(self.max_backoff, backoff * self.multiplier ** (retry - 1))
+        if self.jitter:
+            delay -= delay * self.jitter * random.random()
+        return delay
+
+
+class RetryState(object):
+    """Tracks attempts of a single request under a RetryPolicy."""
+
+    def __init__(self, policy, method):
+        self.policy = policy
+        self.method = method
+        self.attempts = 0
+        self.started = time.time()
+        self.history = []  # (kind, delay) for every retry
+
+    @property
+    def retries(self):
+        return len(self.history)
+
+    def backoff(self, exception):
+        """Return seconds to wait before retrying or None to give up.
+
+        Should be called once for every failed attempt.
+
+        """
+        self.attempts += 1
+        policy = self.policy
+        kind = policy.classify(exception)
+        if kind is None or not policy.should_retry(kind, self.method):
+            return None
+        if self.attempts >= policy.max_attempts:
+            return None
+        delay = policy.delay(kind, self.attempts)
+        if policy.max_elapsed is not None:
+            elapsed = time.time() - self.started
+            if elapsed + delay > policy.max_elapsed:
+                return None
+        self.history.append((kind, delay))
+        return delay
+
+
+NO_RETRY = RetryPolicy(max_attempts=1)
@@ -0,0 +1,81 @@
+"""Coalescing of identical requests that are in flight at the same time.
+
+The first caller for a key (the leader) runs the request, callers arriving
+with the same key while it is in flight (followers) wait for and share the
+leader's result or exception.
+
+"""
+from collections import namedtuple
+import threading
+
+__all__ = [
+    'CoalesceStats',
+    'SingleFlight',
+]
+
+
+class CoalesceStats(namedtuple('CoalesceStats', [
+        'leaders', 'coalesced', 'in_flight'])):
+    """Snapshot of request coalescing.
+
+        leaders: requests that were actually sent
+        coalesced: requests that waited on a leader instead of being sent
+        in_flight: leaders currently running
+
+    """
+    __slots__ = ()
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """Thread safe request coalescing."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def stats(self):
+        with self._lock:
+            return CoalesceStats(self.leaders, self.coalesced,
+                                 len(self._calls))
+
+    def do(self, key, func):
+        """Return func(), or the result of an in flight call for key."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if leader:
+            return self._lead(key, call, func)
+        return self._follow(call)
+
+    def _lead(self, key, call, func):
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    @staticmethod
+    def _follow(call):
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
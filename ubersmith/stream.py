@@ -0,0 +1,243 @@
+"""Incremental parsing of ubersmith JSON responses.
+
+List methods return every record in one JSON object under "data".  A
+ResponseStream reads the body chunk by chunk and yields the records one at
+a time so only a single record is held in memory:
+
+    stream = ResponseStream(response.iter_content(65536))
+    stream.read_envelope()  # {'status': True, 'error_code': None, ...}
+    for key, record in stream:
+        ...
+
+Without chunks the body is fed to the stream as it arrives instead, e.g.
+from an event loop:
+
+    stream = ResponseStream(None)
+    stream.feed(chunk)  # then stream.feed_eof() at the end
+    for key, record in stream.parsed():
+        ...
+
+"""
+import codecs
+import json
+import re
+
+__all__ = [
+    'DEFAULT_CHUNK_SIZE',
+    'ResponseStream',
+]
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r'\s*')
+_NUMBER = re.compile(r'-?[0-9][-+0-9.eE]*|-$')
+
+# parser state restored when a fed stream runs out of data mid item
+_STATE = ('_buf', '_pos', '_pending', '_eof', '_started', '_streaming',
+          '_streamed', '_close', '_index', 'done')
+
+
+class _MoreData(Exception):
+    """Raised when a fed stream needs the next chunk to parse further."""
+
+
+class ResponseStream(object):
+    """Parses a JSON object body read from an iterable of byte chunks.
+
+        chunks: iterable of bytes, e.g. requests' response.iter_content(),
+                or None to feed the body to the stream
+        key: name of the member whose items are streamed
+        encoding: encoding of the body
+
+    Members other than key are collected into envelope.  Iterating yields
+    (key, value) pairs of an object or (index, value) pairs of an array.
+
+    """
+
+    def __init__(self, chunks, key='data', encoding='utf-8'):
+        self.chunks = iter(chunks) if chunks is not None else None
+        self.key = key
+        self.envelope = {}
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._json = json.JSONDecoder()
+        self._buf = u''
+        self._pos = 0
+        self._eof = False
+        self._started = False  # opening brace consumed
+        self._streaming = False  # positioned at the key's value
+        self._streamed = False  # the key's value has been iterated
+        self._close = None  # closing character of the key's value
+        self._index = 0  # items of the key's value parsed
+        self._pending = u''  # decoded text fed but not yet read
+        self._fed_eof = False
+        self.done = False  # parsed() reached the end of the body
+
+    def feed(self, chunk):
+        """Add the next chunk of the body of a stream without chunks."""
+        self._pending += self._decoder.decode(chunk)
+
+    def feed_eof(self):
+        """Mark the end of the body of a stream without chunks."""
+        self._pending += self._decoder.decode(b'', True)
+        self._fed_eof = True
+
+    def _read(self):
+        """Append the next chunk to the buffer, return False at EOF."""
+        if self._eof:
+            return False
+        # drop what has been parsed so the buffer stays small
+        self._buf = self._buf[self._pos:]
+        self._pos = 0
+        if self.chunks is None:
+            if self._pending:
+                self._buf += self._pending
+                self._pending = u''
+                return True
+            if not self._fed_eof:
+                raise _MoreData
+            self._eof = True
+            return False
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self._eof = True
+            self._buf += self._decoder.decode(b'', True)
+            return False
+        self._buf += self._decoder.decode(chunk)
+        return True
+
+    def _peek(self):
+        """Skip whitespace and return the next character, '' at EOF."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._read():
+                return u''
+
+    def _expect(self, chars):
+        char = self._peek()
+        if not char or char not in chars:
+            raise ValueError("Expected one of {0!r} at {1!r}".format(
+                chars, self._buf[self._pos:self._pos + 20] or 'end of body'))
+        self._pos += 1
+        return char
+
+    def _value(self):
+        """Decode the next complete JSON value."""
+        self._peek()
+        while True:
+            number = _NUMBER.match(self._buf, self._pos)
+            if number and number.end() == len(self._buf) and self._read():
+                # a number may continue in the next chunk, e.g. 1. or 1e
+                continue
+            try:
+                value, end = self._json.raw_decode(self._buf, self._pos)
+            except ValueError:
+                if not self._read():
+                    raise
+                continue
+            self._pos = end
+            return value
+
+    def read_envelope(self):
+        """Parse members up to the streamed one, return the envelope.
+
+        Members that follow the streamed one are added to the envelope once
+        iteration is complete.
+
+        """
+        if not self._started:
+            self._expect(u'{')
+            self._started = True
+            self._members(first=True)
+        return self.envelope
+
+    def _members(self, first):
+        """Parse members into envelope until the key's value or the end."""
+        while True:
+            if self._peek() == u'}':
+                self._pos += 1
+                return
+            if not first:
+                self._expect(u',')
+            first = False
+            if self._peek() != u'"':
+                self._expect(u'"')  # raises with the unexpected character
+            name = self._value()
+            self._expect(u':')
+            if name == self.key and not self._streamed and \
+                    self._peek() in (u'{', u'['):
+                self._streaming = True
+                return
+            self.envelope[name] = self._value()
+
+    def __iter__(self):
+        while True:
+            item = self._next_item()
+            if item is None:
+                return
+            yield item
+
+    def _next_item(self):
+        """Parse the next (key, value) pair, None once the body is done."""
+        self.read_envelope()
+        if not self._streaming:
+            return None
+        if self._close is None:
+            self._close = u'}' if self._expect(u'{[') == u'{' else u']'
+        if self._peek() == self._close:
+            self._pos += 1
+            self._streaming = False
+            self._streamed = True
+            # pick up members after the streamed one
+            self._members(first=False)
+            return None
+        if self._index:
+            self._expect(u',')
+        if self._close == u'}':
+            key = self._value()
+            self._expect(u':')
+        else:
+            key = self._index
+        value = self._value()
+        self._index += 1
+        return key, value
+
+    def _attempt(self, parse):
+        """Return parse(), rewinding the parser if the data fed runs out.
+
+        parse can then be retried once the next chunk has been fed.
+
+        """
+        state = [getattr(self, name) for name in _STATE]
+        try:
+            return parse()
+        except _MoreData:
+            for name, value in zip(_STATE, state):
+                setattr(self, name, value)
+            raise
+
+    def try_read_envelope(self):
+        """Return read_envelope(), or None if more must be fed first."""
+        try:
+            return self._attempt(self.read_envelope)
+        except _MoreData:
+            return None
+
+    def parsed(self):
+        """Yield the (key, value) pairs completed by the data fed so far.
+
+        Returns when the next chunk is needed or, with done set, once the
+        whole body has been parsed.
+
+        """
+        while not self.done:
+            try:
+                item = self._attempt(self._next_item)
+            except _MoreData:
+                return
+            if item is None:
+                self.done = True
+                return
+            yield item
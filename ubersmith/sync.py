@@ -0,0 +1,212 @@
+"""Incrementally sync ubersmith lists into another system.
+
+A SyncEngine remembers what it saw of each source on the last sync and
+passes a ChangeSet of inserted, updated and deleted records to a sink:
+
+    def sink(changes):
+        for order_id, order in changes.inserted.items():
+            ...
+
+    engine = SyncEngine(sink, state_path='/var/lib/ubersmith-sync.json')
+    engine.sync()
+
+Sources whose method can filter by timestamp only fetch records past the
+source's high-water mark, the rest are fetched whole and compared against
+hashes of the records seen last time.  Timestamp filters can't tell about
+deletions or changes to older records, so every full_every syncs such
+sources are fetched whole too.
+
+"""
+from collections import namedtuple
+import datetime
+import hashlib
+import json
+import os
+
+from ubersmith.api import get_default_request_handler
+from ubersmith.clean import LazyRecord, unlazy
+from ubersmith.compat import replace
+from ubersmith.paging import DEFAULT_PAGE_SIZE
+from ubersmith.utils import resolve_call, to_unix
+
+__all__ = [
+    'DEFAULT_FULL_EVERY',
+    'DEFAULT_SOURCES',
+    'ChangeSet',
+    'SyncEngine',
+    'SyncSource',
+]
+
+DEFAULT_FULL_EVERY = 12
+
+
+class ChangeSet(namedtuple('ChangeSet', [
+        'source', 'inserted', 'updated', 'deleted', 'full'])):
+    """Changes to a source since the last sync.
+
+        source: name of the source
+        inserted: dict of new records by id
+        updated: dict of changed records by id
+        deleted: list of ids of records that are gone
+        full: if the whole source was fetched, only then deleted is known
+
+    """
+    __slots__ = ()
+
+    @property
+    def changed(self):
+        return bool(self.inserted or self.updated or self.deleted)
+
+
+class SyncSource(namedtuple('SyncSource', [
+        'method', 'ts_field', 'since_arg', 'args'])):
+    """A list method to sync.
+
+        method: ubersmith list method supporting paging
+        ts_field: record field the high-water mark is kept from
+        since_arg: argument filtering the list to records after a unix
+                   timestamp, compared against ts_field
+        args: dict of extra arguments sent with every request
+
+    """
+    __slots__ = ()
+
+    def __new__(cls, method, ts_field=None, since_arg=None, args=None):
+        return super(SyncSource, cls).__new__(
+            cls, method, ts_field, since_arg, args or {})
+
+
+DEFAULT_SOURCES = {
+    'clients': SyncSource('client.list'),
+    'devices': SyncSource('device.list'),
+    'orders': SyncSource('order.list', 'ts', 'min_ts'),
+    'tickets': SyncSource('support.ticket_list', 'timestamp', 'begin'),
+}
+
+
+def _unix(value):
+    """Return a record's timestamp as an int, None if it has none."""
+    if isinstance(value, datetime.datetime):
+        return to_unix(value)
+    try:
+        return int(float(value)) or None
+    except (TypeError, ValueError):
+        return None
+
+
+def _hash(record):
+    return hashlib.sha1(json.dumps(
+        record, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class SyncEngine(object):
+    """Tracks sources and emits ChangeSets to a sink.
+
+        sink: callable receiving a ChangeSet for every source that changed
+        sources: dict of names to SyncSources, DEFAULT_SOURCES by default
+        request_handler: handler to fetch the lists with
+        state_path: JSON file state is kept in between runs, in memory only
+                    by default
+        full_every: fetch timestamp filtered sources whole every this many
+                    syncs, never if 0
+        page_size: records to request per page
+
+    State is only saved once the sink returned, a sink that raises gets the
+    same changes again on the next sync.
+
+    """
+
+    def __init__(self, sink, sources=None, request_handler=None,
+                 state_path=None, full_every=DEFAULT_FULL_EVERY,
+                 page_size=DEFAULT_PAGE_SIZE):
+        self.sink = sink
+        self.sources = dict(DEFAULT_SOURCES if sources is None else sources)
+        self.request_handler = request_handler or \
+            get_default_request_handler()
+        self.state_path = state_path
+        self.full_every = full_every
+        self.page_size = page_size
+        self.state = self._load_state()
+
+    def _load_state(self):
+        if self.state_path is None or not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path) as f:
+            state = json.load(f)
+        # ids are stored as pairs so int ids stay ints
+        for source_state in state.values():
+            source_state['hashes'] = dict(
+                (k, v) for k, v in source_state['hashes'])
+        return state
+
+    def _save_state(self):
+        if self.state_path is None:
+            return
+        state = dict((name, {
+            'mark': s['mark'],
+            'syncs': s['syncs'],
+            'hashes': sorted(s['hashes'].items(), key=lambda kv: str(kv[0])),
+        }) for name, s in self.state.items())
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        replace(tmp_path, self.state_path)
+
+    def mark(self, name):
+        """Return the high-water mark of a source as a unix timestamp."""
+        return self.state.get(name, {}).get('mark')
+
+    def _records(self, source, since=None):
+        call_func = resolve_call(self.request_handler, source.method)
+        kwargs = dict(source.args)
+        if since is not None:
+            kwargs[source.since_arg] = since
+        return call_func.pages(limit=self.page_size, **kwargs)
+
+    def sync_source(self, name):
+        """Sync one source, return its ChangeSet."""
+        source = self.sources[name]
+        state = self.state.get(name, {'mark': None, 'syncs': 0, 'hashes': {}})
+        full = not source.since_arg or state['mark'] is None or \
+            bool(self.full_every and
+                 (state['syncs'] + 1) % self.full_every == 0)
+        # records stamped in the mark's second may have arrived after the
+        # last sync, fetch them again and let the hashes sort them out
+        since = None if full else state['mark'] - 1
+
+        hashes = {} if full else dict(state['hashes'])
+        inserted, updated = {}, {}
+        mark = state['mark']
+        for key, record in self._records(source, since):
+            if isinstance(record, LazyRecord):
+                # hashed as JSON and handed to sinks that may dump it too
+                record = unlazy(record)
+            digest = _hash(record)
+            old = state['hashes'].get(key)
+            if old is None:
+                inserted[key] = record
+            elif old != digest:
+                updated[key] = record
+            hashes[key] = digest
+            if source.ts_field is not None:
+                ts = _unix(record.get(source.ts_field))
+                if ts is not None and (mark is None or ts > mark):
+                    mark = ts
+        deleted = sorted(set(state['hashes']) - set(hashes), key=str) \
+            if full else []
+
+        changes = ChangeSet(name, inserted, updated, deleted, full)
+        if changes.changed:
+            self.sink(changes)
+        self.state[name] = {
+            'mark': mark,
+            'syncs': state['syncs'] + 1,
+            'hashes': hashes,
+        }
+        self._save_state()
+        return changes
+
+    def sync(self, names=None):
+        """Sync sources, all by default, return their ChangeSets."""
+        return [self.sync_source(name)
+                for name in sorted(names or self.sources)]
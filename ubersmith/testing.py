@@ -0,0 +1,436 @@
+"""Local stand-in for an Ubersmith server, for load and performance testing.
+
+FakeUbersmith answers the same ?method= POST requests RequestHandler sends
+with generated records and can inject the failures of a real Ubersmith:
+
+    with FakeUbersmith(clients=100000, latency=0.02) as server:
+        h = RequestHandler(server.url)
+        clients = h.client.list(limit=1000)
+        server.token_rate = 0.1  # answer a tenth with "Updating Token"
+        ...
+
+Records are generated as they're served, lists of a million records only
+take the memory of the page being written.
+
+"""
+from collections import namedtuple
+import base64
+import json
+import random
+import threading
+import time
+
+import six
+from six.moves import BaseHTTPServer, socketserver
+from six.moves.urllib.parse import parse_qs, urlparse
+
+from ubersmith.api import METHODS
+from ubersmith.exceptions import ResponseError
+
+__all__ = [
+    'FAULTS',
+    'FakeList',
+    'FakeUbersmith',
+    'client_record',
+    'device_record',
+    'order_record',
+]
+
+FAULTS = ('token', 'maintenance', 'error')
+
+MAINTENANCE_MESSAGE = (u"We are currently undergoing maintenance, please "
+                       u"check back shortly.")
+
+TOKEN_PAGE = (b'<html><head><title>Updating Token</title></head><body>'
+              b'<p>Updating Token, please wait...</p></body></html>')
+
+# records serialized into each chunk of a streamed list
+_CHUNK_RECORDS = 500
+
+_EPOCH = 1312304629
+
+
+class FakeList(namedtuple('FakeList', ['count', 'record'])):
+    """Records of a list method, generated as they're served.
+
+        count: number of records
+        record: callable returning the (key, record) pair of an index
+
+    Lists are paged with the offset and limit arguments.
+
+    """
+    __slots__ = ()
+
+
+def client_record(i):
+    """Return a client.list/client.get shaped record."""
+    return {
+        'clientid': str(i),
+        'first': u'First {0}'.format(i),
+        'last': u'Last {0}'.format(i),
+        'company': u'Company {0}'.format(i),
+        'listed_company': u'Company {0}'.format(i),
+        'email': 'client{0}@example.com'.format(i),
+        'login': 'client{0}'.format(i),
+        'address': '{0} Main St'.format(i),
+        'city': 'Springfield',
+        'state': 'IL',
+        'zip': '62701',
+        'country': 'US',
+        'phone': '555-{0:04d}'.format(i % 10000),
+        'active': '1',
+        'balance': '{0}.00'.format(i % 1000),
+        'created': str(_EPOCH + i),
+        'latest_inv': str(_EPOCH + i * 60),
+        'login_failures': '0',
+        'discount': '0',
+        'tax_exempt': '0',
+        'datesend': '1',
+        'grace_due': '0',
+    }
+
+
+def device_record(i, clients=1):
+    """Return a device.list/device.get shaped record."""
+    return {
+        'dev': str(i),
+        'clientid': str(i % clients + 1),
+        'label': 'server{0}.example.com'.format(i),
+        'dev_desc': 'server{0}.example.com'.format(i),
+        'type': 'Dedicated Server',
+        'type_id': '12',
+        'devtype_group': 'Servers',
+        'devtype_group_id': '2',
+        'parent': '0',
+        'location': 'Rack {0}'.format(i % 40),
+        'rack_id': str(i % 40),
+        'owner': str(i),
+        'owner_type': 'PACKAGE',
+        'active': '1',
+        'up': '4',
+        'warn': '0',
+        'down': '1',
+        'total': '5',
+    }
+
+
+def order_record(i, clients=1, steps=5):
+    """Return an order.get shaped record, order.list has no progress."""
+    return {
+        'order_id': str(i),
+        'hash': '{0:05x}-{1:05x}'.format(i, i * 7919 % 0xfffff),
+        'client_id': str(i % clients + 1),
+        'order_status': '30',
+        'order_queue_id': '8',
+        'order_form_id': '0',
+        'opportunity_id': '0',
+        'priority': '1',
+        'total': '{0}.00'.format(i % 1000),
+        'ts': str(_EPOCH + i),
+        'activity': str(_EPOCH + i),
+        'owner': '',
+        'listed_company': '',
+        'signature': '',
+        'info': {'coupon_ids': None, 'coupon_credits': None, 'taxes': None},
+        'progress': dict((str(step), {
+            'ts': str(_EPOCH + i + step * 60),
+            'order_step_id': str(30 + step),
+            'admin': 'admin',
+        }) for step in range(steps)),
+    }
+
+
+def _error(code, message):
+    return ResponseError(response={
+        'status': False,
+        'error_code': code,
+        'error_message': message,
+        'data': '',
+    })
+
+
+def _get(count, record, arg, name):
+    def handler(args):
+        try:
+            i = int(args.get(arg, ''))
+        except ValueError:
+            raise _error(1, u'Invalid {0} specified.'.format(name))
+        if not 1 <= i <= count:
+            raise _error(1, u'Invalid {0} specified.'.format(name))
+        return record(i)
+    return handler
+
+
+def _default_methods(clients, devices, orders):
+    """Return the handlers of the methods FakeUbersmith serves by default."""
+    def device(i):
+        return device_record(i, clients)
+
+    def order(i):
+        return order_record(i, clients)
+
+    def order_list(i):
+        record = order(i + 1)
+        del record['progress']
+        return record['order_id'], record
+
+    return {
+        'client.list': lambda args: FakeList(
+            clients, lambda i: (str(i + 1), client_record(i + 1))),
+        'client.get': _get(clients, client_record, 'client_id', 'client_id'),
+        'client.count': lambda args: clients,
+        'device.list': lambda args: FakeList(
+            devices, lambda i: (str(i + 1), device(i + 1))),
+        'device.get': _get(devices, device, 'device_id', 'device_id'),
+        'order.list': lambda args: FakeList(orders, order_list),
+        'order.get': _get(orders, order, 'order_id', 'order_id'),
+        'uber.check_login': lambda args: True,
+        'uber.method_list': lambda args: dict(METHODS),
+    }
+
+
+class _Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep connections alive like ubersmith
+    disable_nagle_algorithm = True  # headers and body are written apart
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.server.fake.handle(self)
+
+    do_GET = do_POST
+
+    def read_args(self):
+        length = int(self.headers.get('content-length') or 0)
+        body = self.rfile.read(length) if length else b''
+        content_type = self.headers.get('content-type') or ''
+        if not content_type.startswith('application/x-www-form-urlencoded'):
+            # uploads aren't parsed, their other arguments are ignored too
+            return {}
+        return dict((k, v[-1]) for k, v in parse_qs(
+            body.decode('utf-8'), keep_blank_values=True).items())
+
+    def send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_chunked(self, content_type, chunks):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for chunk in chunks:
+            if chunk:
+                self.wfile.write('{0:x}\r\n'.format(len(chunk)).encode(
+                    'ascii') + chunk + b'\r\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+
+def _json(value):
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+class FakeUbersmith(object):
+    """Ubersmith API server on localhost serving generated records.
+
+        clients: number of clients served by the client methods
+        devices: number of devices served by the device methods
+        orders: number of orders served by the order methods
+        methods: dict of extra method handlers, each is called with a dict
+                 of the request's arguments and returns the response data,
+                 a FakeList or raises a ResponseError with the response
+        username: require basic auth with username and password
+        password: see username
+        latency: seconds every request waits before being answered
+        jitter: up to this many extra seconds of random latency
+        token_rate: fraction of requests answered with "Updating Token"
+        maintenance_rate: fraction answered with a maintenance response
+        error_rate: fraction answered with error_status
+        error_status: HTTP status of injected errors
+        seed: seed of the random faults and jitter
+        host: address to listen on
+        port: port to listen on, a free one by default
+
+    Latency and fault rates can be changed while the server is running.
+    inject() queues faults for the next requests for deterministic tests.
+
+    """
+
+    def __init__(self, clients=10000, devices=10000, orders=10000,
+                 methods=None, username=None, password=None, latency=0.0,
+                 jitter=0.0, token_rate=0.0, maintenance_rate=0.0,
+                 error_rate=0.0, error_status=500, seed=None,
+                 host='127.0.0.1', port=0):
+        self.methods = _default_methods(clients, devices, orders)
+        self.methods.update(methods or {})
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.jitter = jitter
+        self.token_rate = token_rate
+        self.maintenance_rate = maintenance_rate
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.host = host
+        self.port = port
+        self.calls = {}  # method -> requests received
+        self.faults = {}  # fault -> responses injected
+        self._random = random.Random(seed)
+        self._injected = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        """Base URL to pass to RequestHandler."""
+        return 'http://{0}:{1}/api/2.0/'.format(self.host, self.port)
+
+    def start(self):
+        """Start serving in a background thread."""
+        if self._server is not None:
+            raise RuntimeError("FakeUbersmith is already running.")
+        self._server = _Server((self.host, self.port), _Handler)
+        self._server.fake = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        kwargs={'poll_interval': 0.05})
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the listening socket."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def inject(self, fault, count=1):
+        """Answer the next count requests with fault, one of FAULTS."""
+        if fault not in FAULTS:
+            raise ValueError("Unknown fault {0!r}.".format(fault))
+        with self._lock:
+            self._injected.extend([fault] * count)
+
+    def reset(self):
+        """Forget the calls and faults counted so far."""
+        with self._lock:
+            self.calls = {}
+            self.faults = {}
+
+    def _next_fault(self):
+        with self._lock:
+            if self._injected:
+                return self._injected.pop(0)
+            roll = self._random.random()
+            for fault, rate in [('token', self.token_rate),
+                                ('maintenance', self.maintenance_rate),
+                                ('error', self.error_rate)]:
+                if roll < rate:
+                    return fault
+                roll -= rate
+            return None
+
+    def _delay(self):
+        with self._lock:
+            extra = self._random.uniform(0, self.jitter) if self.jitter \
+                else 0.0
+        return self.latency + extra
+
+    def _authorized(self, request):
+        if self.username is None:
+            return True
+        expected = base64.b64encode('{0}:{1}'.format(
+            self.username, self.password or '').encode('utf-8'))
+        return request.headers.get('authorization') == \
+            'Basic ' + expected.decode('ascii')
+
+    def handle(self, request):
+        args = request.read_args()
+        query = parse_qs(urlparse(request.path).query)
+        method = query.get('method', [''])[-1]
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+
+        delay = self._delay()
+        if delay > 0:
+            time.sleep(delay)
+
+        if not self._authorized(request):
+            return request.send(401, 'text/html', b'Unauthorized')
+
+        fault = self._next_fault()
+        if fault is not None:
+            with self._lock:
+                self.faults[fault] = self.faults.get(fault, 0) + 1
+            return self._send_fault(request, fault)
+
+        handler = self.methods.get(method)
+        if handler is None:
+            return self._send_error(request, _error(
+                3, u'Invalid method "{0}".'.format(method)))
+        try:
+            data = handler(args)
+        except ResponseError as e:
+            return self._send_error(request, e)
+        if isinstance(data, FakeList):
+            return request.send_chunked(
+                'application/json', self._list_chunks(data, args))
+        request.send(200, 'application/json', _json({
+            'status': True,
+            'error_code': None,
+            'error_message': '',
+            'data': data,
+        }))
+
+    def _send_fault(self, request, fault):
+        if fault == 'token':
+            request.send(200, 'text/html; charset=UTF-8', TOKEN_PAGE)
+        elif fault == 'maintenance':
+            self._send_error(request, _error(1, MAINTENANCE_MESSAGE))
+        else:
+            request.send(self.error_status, 'text/html',
+                         b'<html><body>Internal Server Error</body></html>')
+
+    @staticmethod
+    def _send_error(request, error):
+        request.send(200, 'application/json', _json(getattr(
+            error, 'response', None) or {
+                'status': False, 'error_code': 1,
+                'error_message': six.text_type(error), 'data': ''}))
+
+    @staticmethod
+    def _list_chunks(fake_list, args):
+        try:
+            offset = max(int(args.get('offset') or 0), 0)
+            limit = int(args.get('limit') or fake_list.count)
+        except ValueError:
+            offset, limit = 0, fake_list.count
+        stop = min(offset + max(limit, 0), fake_list.count)
+        yield b'{"status":true,"error_code":null,"error_message":"",' \
+              b'"data":{'
+        for start in range(offset, stop, _CHUNK_RECORDS):
+            pieces = []
+            for i in range(start, min(start + _CHUNK_RECORDS, stop)):
+                key, record = fake_list.record(i)
+                pieces.append(_json(six.text_type(key)) + b':' +
+                              _json(record))
+            yield (b',' if start > offset else b'') + b','.join(pieces)
+        yield b'}}'
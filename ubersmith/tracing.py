@@ -0,0 +1,181 @@
+"""Tracing spans for the phases of a call.
+
+Handlers take a tracer with the start_as_current_span interface of
+OpenTelemetry tracers, so one from opentelemetry.trace.get_tracer() can be
+passed in directly.  Calls are traced as nested spans:
+
+    ubersmith.call
+        ubersmith.validate
+        ubersmith.request
+            ubersmith.encode
+            ubersmith.send
+            ubersmith.decode
+        ubersmith.clean
+
+Nothing is traced by default.  InMemoryTracer keeps finished spans in a
+list, for tests and quick profiling:
+
+    tracer = InMemoryTracer()
+    h = RequestHandler(url, user, password, tracer=tracer)
+    h.client.invoice_list(client_id=1001)
+    for span in tracer.spans:
+        print(span.name, span.duration)
+
+"""
+from collections import namedtuple
+from contextlib import contextmanager
+import itertools
+import threading
+import time
+
+try:
+    from contextvars import ContextVar
+except ImportError:  # pragma: no cover
+    ContextVar = None
+
+__all__ = [
+    'NO_OP_TRACER',
+    'FinishedSpan',
+    'InMemoryTracer',
+    'NoOpTracer',
+]
+
+
+class _NoOpSpan(object):
+    def set_attribute(self, key, value):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+
+class NoOpTracer(object):
+    """Tracer that records nothing."""
+
+    _span = _NoOpSpan()
+
+    @contextmanager
+    def start_as_current_span(self, name, attributes=None):
+        yield self._span
+
+
+NO_OP_TRACER = NoOpTracer()
+
+
+class FinishedSpan(namedtuple('FinishedSpan', [
+        'name', 'span_id', 'parent_id', 'start', 'end', 'attributes',
+        'error'])):
+    """A span recorded by InMemoryTracer.
+
+        name: name of the span, e.g. 'ubersmith.send'
+        span_id: id unique within the tracer
+        parent_id: span_id of the enclosing span or None
+        start: time.time() the span started
+        end: time.time() the span ended
+        attributes: dict of attributes set on the span
+        error: exception that ended the span or None
+
+    """
+    __slots__ = ()
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+
+class _Span(object):
+    def __init__(self, name, span_id, parent_id, attributes):
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.error = None
+        self.start = time.time()
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_exception(self, exception):
+        self.error = exception
+
+    def finish(self):
+        return FinishedSpan(self.name, self.span_id, self.parent_id,
+                            self.start, time.time(), self.attributes,
+                            self.error)
+
+
+class _ContextLocal(object):
+    """Value local to the current asyncio task, or thread before 3.7.
+
+        name: name of the ContextVar
+
+    set returns a token to pass to reset to restore the previous value.
+
+    """
+
+    def __init__(self, name):
+        if ContextVar is not None:
+            self._var = ContextVar(name, default=None)
+        else:  # pragma: no cover
+            self._local = threading.local()
+
+    def get(self):
+        if ContextVar is not None:
+            return self._var.get()
+        return getattr(self._local, 'value', None)  # pragma: no cover
+
+    def set(self, value):
+        if ContextVar is not None:
+            return self._var.set(value)
+        previous = self.get()  # pragma: no cover
+        self._local.value = value  # pragma: no cover
+        return previous  # pragma: no cover
+
+    def reset(self, token):
+        if ContextVar is not None:
+            self._var.reset(token)
+        else:  # pragma: no cover
+            self._local.value = token
+
+
+class InMemoryTracer(object):
+    """Tracer that keeps finished spans in its spans list."""
+
+    def __init__(self):
+        self.spans = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # spans nest per thread and per asyncio task
+        self._current = _ContextLocal('ubersmith_span')
+
+    @contextmanager
+    def start_as_current_span(self, name, attributes=None):
+        parent = self._current.get()
+        with self._lock:
+            span_id = next(self._ids)
+        span = _Span(name, span_id,
+                     parent.span_id if parent is not None else None,
+                     attributes)
+        token = self._current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            self._current.reset(token)
+            finished = span.finish()
+            with self._lock:
+                self.spans.append(finished)
+
+    def clear(self):
+        with self._lock:
+            self.spans = []
+
+    def children(self, span):
+        """Return the spans directly nested in span."""
+        return [s for s in self.spans if s.parent_id == span.span_id]
+
+    def find(self, name):
+        """Return the finished spans with name."""
+        return [s for s in self.spans if s.name == name]
@@ -16,12 +16,18 @@ except ImportError:
     from urllib.parse import urlsplit
     from urllib.parse import urlunsplit
 
+import time
+
 from six import string_types, text_type
 
 __all__ = [
     'append_qs',
     'urlencode_unicode',
     'to_nested_php_args',
+    'request_key',
+    'resolve_call',
+    'to_unix',
+    'get_json_decoder',
     'prepend_base',
     'isdict',
     'islist',
@@ -138,6 +144,54 @@ def to_nested_php_args(data, prefix_key=None):
     return new_data
 
 
+def request_key(method, data=None):
+    """Return a hashable key for a request of method with data.
+
+    Requests that would send the same arguments get the same key.
+
+    """
+    args = to_nested_php_args(data) if data else []
+    items = args.items() if isdict(args) else args
+    return method, tuple(sorted((k, text_type(v)) for k, v in items))
+
+
+def resolve_call(request_handler, method):
+    """Return the call function for method bound to request_handler.
+
+    method can be an ubersmith method string or a call function.
+
+    """
+    if callable(method):
+        return method.handler(request_handler)
+    call_base, call_name = method.split('.', 1)
+    return getattr(getattr(request_handler, call_base), call_name)
+
+
+def to_unix(value):
+    """Return a cleaned timestamp, a naive local datetime, as an int."""
+    return int(time.mktime(value.timetuple()))
+
+
+def get_json_decoder(decoder):
+    """Return a callable that decodes a JSON body from bytes.
+
+    decoder can be a callable, None to use the response's own json() method,
+    or the name of a module with a loads function such as 'json', 'orjson',
+    'ujson' or 'simplejson'.
+
+    """
+    if decoder is None or callable(decoder):
+        return decoder
+    if isstr(decoder):
+        try:
+            module = __import__(decoder)
+        except ImportError:
+            raise ValueError(
+                "JSON decoder {0!r} is not installed.".format(decoder))
+        return module.loads
+    raise TypeError("decoder must be a callable or module name.")
+
+
 def prepend_base(base):
     """Return a callable that will prepend the base of a method string."""
     return lambda call: '.'.join((base, call))